@@ -18,8 +18,9 @@ provider "aws" {
 module "dynamodb" {
   source = "../../modules/dynamodb"
 
-  project_name = var.project_name
-  enable_pitr  = var.enable_pitr
+  project_name       = var.project_name
+  enable_pitr        = var.enable_pitr
+  create_cache_table = var.enable_shared_embedding_cache
 }
 
 # S3 Buckets for KB data and vectors
@@ -36,22 +37,23 @@ module "s3" {
 module "lambda" {
   source = "../../modules/lambda"
 
-  project_name           = var.project_name
-  model_id               = var.bedrock_model_id
-  s3_vectors_bucket_name = module.s3.vector_bucket_name
-  s3_vectors_index_name  = var.s3_vectors_index_name
-  bedrock_embed_model    = var.bedrock_embed_model
-  sessions_table_name    = module.dynamodb.sessions_table_name
-  messages_table_name    = module.dynamodb.messages_table_name
-  analytics_table_name   = module.dynamodb.analytics_table_name
-  dynamodb_table_arns    = module.dynamodb.table_arns
-  api_gateway_arn        = module.api_gateway.execution_arn
-  use_container_image    = false
-  kb_version             = var.kb_version
-  timeout                = var.lambda_timeout
-  memory_size            = var.lambda_memory_size
-  log_level              = var.log_level
-  log_retention_days     = var.log_retention_days
+  project_name               = var.project_name
+  model_id                   = var.bedrock_model_id
+  s3_vectors_bucket_name     = module.s3.vector_bucket_name
+  s3_vectors_index_name      = var.s3_vectors_index_name
+  bedrock_embed_model        = var.bedrock_embed_model
+  sessions_table_name        = module.dynamodb.sessions_table_name
+  messages_table_name        = module.dynamodb.messages_table_name
+  analytics_table_name       = module.dynamodb.analytics_table_name
+  dynamodb_table_arns        = module.dynamodb.table_arns
+  embedding_cache_table_name = module.dynamodb.cache_table_name
+  api_gateway_arn            = module.api_gateway.execution_arn
+  use_container_image        = false
+  kb_version                 = var.kb_version
+  timeout                    = var.lambda_timeout
+  memory_size                = var.lambda_memory_size
+  log_level                  = var.log_level
+  log_retention_days         = var.log_retention_days
 }
 
 # API Gateway for REST API
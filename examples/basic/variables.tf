@@ -70,6 +70,12 @@ variable "enable_pitr" {
   default     = false
 }
 
+variable "enable_shared_embedding_cache" {
+  description = "Create a DynamoDB table shared by all Lambda instances for query embeddings"
+  type        = bool
+  default     = false
+}
+
 # API Gateway Configuration
 variable "api_stage_name" {
   description = "API Gateway stage name"
@@ -116,3 +116,29 @@ resource "aws_dynamodb_table" "analytics" {
     Name = "${var.project_name}-analytics"
   }
 }
+
+# Cache Table - Shared query embedding cache (optional)
+resource "aws_dynamodb_table" "cache" {
+  count        = var.create_cache_table ? 1 : 0
+  name         = "${var.project_name}-cache"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    enabled        = true
+    attribute_name = "expire_at"
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name = "${var.project_name}-cache"
+  }
+}
@@ -28,11 +28,21 @@ output "analytics_table_arn" {
   value       = aws_dynamodb_table.analytics.arn
 }
 
+output "cache_table_name" {
+  description = "Name of the cache DynamoDB table (empty if not created)"
+  value       = var.create_cache_table ? aws_dynamodb_table.cache[0].name : ""
+}
+
+output "cache_table_arn" {
+  description = "ARN of the cache DynamoDB table (empty if not created)"
+  value       = var.create_cache_table ? aws_dynamodb_table.cache[0].arn : ""
+}
+
 output "table_arns" {
   description = "List of all DynamoDB table ARNs"
-  value = [
+  value = concat([
     aws_dynamodb_table.sessions.arn,
     aws_dynamodb_table.messages.arn,
     aws_dynamodb_table.analytics.arn
-  ]
+  ], aws_dynamodb_table.cache[*].arn)
 }
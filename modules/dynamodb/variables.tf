@@ -8,3 +8,9 @@ variable "enable_pitr" {
   type        = bool
   default     = false
 }
+
+variable "create_cache_table" {
+  description = "Create the shared cache table (query embedding cache)"
+  type        = bool
+  default     = false
+}
@@ -0,0 +1,153 @@
+"""
+Cold-start benchmark for the Lambda handler
+Measures init duration (module import) and first/second request latency in fresh interpreters
+
+AWS calls are answered by botocore Stubbers on real clients, so client
+construction, request serialization and response parsing are included -
+only the network is not. Nothing leaves the machine.
+
+Usage:
+    python3 benchmarks/cold_start.py --runs 20
+    python3 benchmarks/cold_start.py --runs 20 --json cold_start.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+from common import add_import_paths, latency_summary, write_json
+
+# Environment of a typical deployment; no tables, so only Bedrock + S3 Vectors are used
+CHILD_ENV = {
+    'MODEL_ID': 'anthropic.claude-3-5-sonnet-20241022-v2:0',
+    'AWS_REGION': 'eu-central-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'METRICS_MODE': 'off',
+    'EMBEDDING_DIMENSIONS': '256',
+}
+
+
+def chat_event(question: str) -> dict:
+    return {'httpMethod': 'POST', 'body': json.dumps({'messages': [{'role': 'user', 'content': question}]})}
+
+
+def stub_clients(requests: int):
+    """Attach Stubbers with canned responses for ``requests`` chat requests"""
+    from botocore.response import StreamingBody
+    from botocore.stub import Stubber
+    import aws_clients
+
+    bedrock = Stubber(aws_clients.get_client('bedrock-runtime'))
+    s3vectors = Stubber(aws_clients.get_client('s3vectors'))
+
+    for i in range(requests):
+        payload = json.dumps({'embedding': [0.01 * ((i + j) % 7) for j in range(256)]}).encode('utf-8')
+        bedrock.add_response('invoke_model', {
+            'body': StreamingBody(io.BytesIO(payload), len(payload)),
+            'contentType': 'application/json'
+        })
+        s3vectors.add_response('query_vectors', {
+            'vectors': [
+                {'key': f'c_{n}', 'distance': 0.2 + 0.1 * n,
+                 'metadata': {'text': f'Document {n} about opening hours and prices.', 'source': f'doc{n}.md',
+                              'chunk_index': str(n), 'start': str(n * 1000), 'end': str(n * 1000 + 45)}}
+                for n in range(5)
+            ],
+            'distanceMetric': 'cosine'
+        })
+        bedrock.add_response('converse', {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': 'We are open from 9 to 5.'}]}},
+            'stopReason': 'end_turn',
+            'usage': {'inputTokens': 420, 'outputTokens': 9, 'totalTokens': 429},
+            'metrics': {'latencyMs': 1}
+        })
+
+    bedrock.activate()
+    s3vectors.activate()
+    return bedrock, s3vectors
+
+
+def run_child() -> dict:
+    """One cold start: import, a 400 error, then two chat requests"""
+    add_import_paths()
+
+    start = time.perf_counter()
+    import lambda_function
+    import aws_clients
+    import_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    response = lambda_function.lambda_handler({'httpMethod': 'POST', 'body': '{"messages": []}'}, None)
+    validation_ms = (time.perf_counter() - start) * 1000
+    assert response['statusCode'] == 400, response
+    clients_after_validation = aws_clients.created_services()
+
+    start = time.perf_counter()
+    stubbers = stub_clients(requests=2)
+    client_init_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for question in ('When are you open?', 'How much does it cost?'):
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(chat_event(question), None)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response['statusCode'] == 200, response
+
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()
+
+    return {
+        'import_ms': import_ms,
+        'validation_error_ms': validation_ms,
+        'clients_created_by_validation_error': clients_after_validation,
+        'client_init_ms': client_init_ms,
+        'first_request_ms': timings[0],
+        'second_request_ms': timings[1],
+    }
+
+
+def summarize(samples) -> dict:
+    summary = {}
+    for name in ('import_ms', 'validation_error_ms', 'client_init_ms', 'first_request_ms', 'second_request_ms'):
+        summary[name] = latency_summary([sample[name] for sample in samples])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark (stubbed AWS clients)')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters to start (default: 10)')
+    parser.add_argument('--json', type=Path, metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child()))
+        return
+
+    env = {**os.environ, **CHILD_ENV}
+    samples = []
+    for run in range(args.runs):
+        result = subprocess.run([sys.executable, __file__, '--child'], env=env, capture_output=True,
+                                text=True, check=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    summary = summarize(samples)
+    lazy = all(not sample['clients_created_by_validation_error'] for sample in samples)
+
+    print(f"Cold starts: {args.runs}")
+    for name, stats in summary.items():
+        print(f"  {name:<22} p50 {stats['p50']:>8.2f} ms   p95 {stats['p95']:>8.2f} ms   max {stats['max']:>8.2f} ms")
+    print(f"  AWS clients created by a 400 response: {'none' if lazy else 'yes'}")
+
+    if args.json:
+        write_json(args.json, {'runs': args.runs, 'summary': summary, 'lazy_clients': lazy, 'samples': samples})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import sys
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, List, Iterable
+
+LAMBDA_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = LAMBDA_DIR / 'src'
+
+
+def add_import_paths():
+    """Make the Lambda sources (and the index builder) importable"""
+    for path in (str(SRC_DIR), str(LAMBDA_DIR)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def percentile(values: Iterable[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0..100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """count / mean / p50 / p90 / p95 / p99 / max of latencies in milliseconds"""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(statistics.fmean(values), 2),
+        'p50': round(percentile(values, 50), 2),
+        'p90': round(percentile(values, 90), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'max': round(max(values), 2),
+    }
+
+
+def write_json(path: Path, data: Dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    print(f"Results written to {path}")
+
+
+# Upper bucket bounds in milliseconds (last bucket: everything above)
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+def histogram(values: List[float], buckets: List[float] = HISTOGRAM_BUCKETS_MS) -> List[List]:
+    """[[upper_bound_ms, count], ...] with 'inf' as the overflow bucket; empty buckets are kept"""
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        counts[index] += 1
+    return [[bound, count] for bound, count in zip(list(buckets) + ['inf'], counts)]
+
+
+def format_histogram(name: str, buckets: List[List], width: int = 40) -> str:
+    """Text histogram (leading/trailing empty buckets omitted)"""
+    used = [i for i, (_, count) in enumerate(buckets) if count]
+    if not used:
+        return f"{name}: no samples"
+    peak = max(count for _, count in buckets)
+    lines = [f"{name}:"]
+    for bound, count in buckets[used[0]:used[-1] + 1]:
+        label = f"<= {bound} ms" if bound != 'inf' else f"> {buckets[-2][0]} ms"
+        lines.append(f"  {label:>12} {'#' * max(1 if count else 0, round(count / peak * width)):<{width}} {count}")
+    return '\n'.join(lines)
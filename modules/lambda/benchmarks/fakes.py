@@ -0,0 +1,424 @@
+"""
+Local stand-ins for the AWS APIs the Lambda uses, with injectable latency and throttling
+Bedrock Converse/ConverseStream + Titan embeddings + Rerank, S3 Vectors query_vectors, DynamoDB tables
+
+The fakes replace the boto3 clients in aws_clients (install()), so they sit
+below the application code but above botocore: SDK retries are modeled here
+(Faults.max_attempts, exponential backoff with jitter) instead of by botocore.
+"""
+
+import io
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+from botocore.exceptions import ClientError
+
+# Retry behaviour of the real clients (aws_clients.AWS_MAX_ATTEMPTS, backoff base)
+DEFAULT_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.05  # seconds
+RETRY_MAX_DELAY = 2.0
+
+SAMPLE_SENTENCES = [
+    'Unsere Supportzeiten sind Montag bis Freitag von 9 bis 17 Uhr.',
+    'Das Basic-Paket enthält 10 GB Speicher und eine Domain.',
+    'Backups werden täglich erstellt und 30 Tage aufbewahrt.',
+    'Die Kündigungsfrist beträgt einen Monat zum Monatsende.',
+    'Alle Rechenzentren stehen in Frankfurt am Main.',
+    'SSL-Zertifikate werden automatisch erneuert.',
+    'Der Umzug bestehender Websites ist im Pro-Paket kostenlos.',
+    'Rechnungen werden monatlich per E-Mail versendet.',
+]
+
+
+class TokenBucket:
+    """
+    Requests-per-second limit (a service quota), optionally shared between processes
+
+    ``shared`` is (multiprocessing.Array('d', 2), multiprocessing.Lock()) from
+    shared_state(); without it the bucket is local to this process.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, shared: Optional[Tuple[Any, Any]] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        if shared is None:
+            self._state = [self.burst, time.time()]
+            self._lock = threading.Lock()
+        else:
+            self._state, self._lock = shared
+
+    @staticmethod
+    def shared_state(ctx, burst: float):
+        """State for a bucket shared by worker processes (create in the parent)"""
+        return ctx.Array('d', [burst, time.time()]), ctx.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.time()
+            tokens = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate)
+            self._state[1] = now
+            if tokens < 1.0:
+                self._state[0] = tokens
+                return False
+            self._state[0] = tokens - 1.0
+            return True
+
+
+class Faults:
+    """
+    Injected behaviour for one fake API: latency, random throttling, a rate limit, SDK-style retries
+
+    Args:
+        latency_ms: Mean service latency per call
+        jitter_ms: Uniform +/- jitter around the mean
+        throttle_rate: Probability that a call is throttled regardless of load
+        limiter: TokenBucket modeling the service quota (throttles when empty)
+        max_attempts: Attempts per call before the ThrottlingException surfaces (1 = no retries)
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, throttle_rate: float = 0.0,
+                 limiter: Optional[TokenBucket] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.limiter = limiter
+        self.max_attempts = max(1, max_attempts)
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def sleep(self, milliseconds: float):
+        if milliseconds > 0:
+            time.sleep(milliseconds / 1000)
+
+    def service_latency(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+
+    def _throttled(self) -> bool:
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return True
+        return self.limiter is not None and not self.limiter.try_acquire()
+
+    def call(self, operation: str, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` after the injected latency; throttled attempts are retried with backoff"""
+        with self._lock:
+            self.calls += 1
+        for attempt in range(self.max_attempts):
+            if not self._throttled():
+                self.sleep(self.service_latency())
+                return fn()
+            with self._lock:
+                self.throttled += 1
+            if attempt < self.max_attempts - 1:
+                time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+        with self._lock:
+            self.failed += 1
+        raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation)
+
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls, 'throttled': self.throttled, 'failed': self.failed}
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    """Deterministic unit vector for a text"""
+    values = []
+    seed = hashlib.sha256(text.encode('utf-8')).digest()
+    while len(values) < dimensions:
+        seed = hashlib.sha256(seed).digest()
+        values.extend(byte / 127.5 - 1.0 for byte in seed)
+    values = values[:dimensions]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class FakeBedrockRuntime:
+    """
+    bedrock-runtime: invoke_model (Titan embeddings), converse, converse_stream
+
+    Model latency = model_faults latency (time to first token) + output_tokens * ms_per_token.
+    """
+
+    def __init__(self, embed_faults: Faults, model_faults: Faults, output_tokens: int = 150,
+                 ms_per_token: float = 0.0, dimensions: int = 1024):
+        self.embed_faults = embed_faults
+        self.model_faults = model_faults
+        self.output_tokens = output_tokens
+        self.ms_per_token = ms_per_token
+        self.dimensions = dimensions
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        request = json.loads(body)
+        dimensions = request.get('dimensions', self.dimensions)
+
+        def respond():
+            payload = json.dumps({'embedding': fake_embedding(request['inputText'], dimensions),
+                                  'inputTextTokenCount': len(request['inputText']) // 4})
+            return {'body': io.BytesIO(payload.encode('utf-8')), 'contentType': 'application/json'}
+
+        return self.embed_faults.call('InvokeModel', respond)
+
+    def _input_tokens(self, params: Dict[str, Any]) -> int:
+        chars = sum(len(block.get('text', '')) for block in params.get('system', []))
+        for message in params.get('messages', []):
+            chars += sum(len(block.get('text', '')) for block in message.get('content', []))
+        return chars // 4
+
+    def _words(self) -> List[str]:
+        words = ' '.join(SAMPLE_SENTENCES).split()
+        return [words[i % len(words)] + ' ' for i in range(self.output_tokens)]
+
+    def _usage(self, params: Dict[str, Any]) -> Dict[str, int]:
+        input_tokens = self._input_tokens(params)
+        return {'inputTokens': input_tokens, 'outputTokens': self.output_tokens,
+                'totalTokens': input_tokens + self.output_tokens}
+
+    def converse(self, **params) -> Dict[str, Any]:
+        def respond():
+            self.model_faults.sleep(self.output_tokens * self.ms_per_token)
+            return {
+                'output': {'message': {'role': 'assistant', 'content': [{'text': ''.join(self._words()).strip()}]}},
+                'stopReason': 'end_turn',
+                'usage': self._usage(params),
+                'metrics': {'latencyMs': 0}
+            }
+
+        return self.model_faults.call('Converse', respond)
+
+    def converse_stream(self, **params) -> Dict[str, Any]:
+        def events():
+            yield {'messageStart': {'role': 'assistant'}}
+            for word in self._words():
+                self.model_faults.sleep(self.ms_per_token)
+                yield {'contentBlockDelta': {'contentBlockIndex': 0, 'delta': {'text': word}}}
+            yield {'contentBlockStop': {'contentBlockIndex': 0}}
+            yield {'messageStop': {'stopReason': 'end_turn'}}
+            yield {'metadata': {'usage': self._usage(params), 'metrics': {'latencyMs': 0}}}
+
+        return self.model_faults.call('ConverseStream', lambda: {'stream': events()})
+
+
+class FakeBedrockAgentRuntime:
+    """
+    bedrock-agent-runtime: rerank (term overlap between query and each source, 0..1)
+    """
+
+    def __init__(self, faults: Faults):
+        self.faults = faults
+
+    def rerank(self, queries: List[Dict], sources: List[Dict], rerankingConfiguration: Dict, **kwargs) -> Dict:
+        query_terms = set(queries[0]['textQuery']['text'].lower().split())
+        limit = rerankingConfiguration['bedrockRerankingConfiguration'].get('numberOfResults', len(sources))
+
+        def respond():
+            results = []
+            for index, source in enumerate(sources):
+                terms = set(source['inlineDocumentSource']['textDocument']['text'].lower().split())
+                results.append({'index': index, 'relevanceScore': len(query_terms & terms) / (len(query_terms) or 1)})
+            results.sort(key=lambda result: result['relevanceScore'], reverse=True)
+            return {'results': results[:limit]}
+
+        return self.faults.call('Rerank', respond)
+
+
+class FakeS3Vectors:
+    """
+    s3vectors: query_vectors over a synthetic corpus (same vector -> same results), get_index
+    """
+
+    def __init__(self, faults: Faults, corpus_size: int = 2000, text_chars: int = 800, documents: int = 100):
+        self.faults = faults
+        self.corpus_size = corpus_size
+        self.text_chars = text_chars
+        self.documents = max(1, documents)
+
+    def _chunk(self, n: int, distance: float) -> Dict[str, Any]:
+        text = ''
+        while len(text) < self.text_chars:
+            text += SAMPLE_SENTENCES[(n + len(text)) % len(SAMPLE_SENTENCES)] + ' '
+        chunk_index = n // self.documents
+        return {
+            'key': f'chunk_{n:06d}',
+            'distance': distance,
+            'metadata': {
+                'text': text[:self.text_chars],
+                'source': f'doc{n % self.documents:04d}.md',
+                'section': f'Abschnitt {chunk_index}',
+                'chunk_index': str(chunk_index),
+                'start': str(chunk_index * self.text_chars),
+                'end': str((chunk_index + 1) * self.text_chars)
+            }
+        }
+
+    def query_vectors(self, queryVector: Dict[str, Any], topK: int, **kwargs) -> Dict[str, Any]:
+        digest = hashlib.sha256(json.dumps(queryVector['float32'][:8]).encode('utf-8')).digest()
+        first = int.from_bytes(digest[:4], 'big') % self.corpus_size
+
+        def respond():
+            return {
+                'vectors': [self._chunk((first + i * 7) % self.corpus_size, round(0.15 + 0.05 * i, 4))
+                            for i in range(topK)],
+                'distanceMetric': 'cosine'
+            }
+
+        return self.faults.call('QueryVectors', respond)
+
+    def get_index(self, indexName: str, **kwargs) -> Dict[str, Any]:
+        return self.faults.call('GetIndex', lambda: {'index': {'indexName': indexName, 'dataType': 'float32'}})
+
+
+class FakeBatchWriter:
+    def __init__(self, table: 'FakeTable'):
+        self.table = table
+        self._items = []
+
+    def put_item(self, Item: Dict[str, Any]):
+        self._items.append(Item)
+        if len(self._items) >= 25:
+            self._send()
+
+    def _send(self):
+        items, self._items = self._items, []
+        if items:
+            self.table.faults.call('BatchWriteItem', lambda: [self.table._store(item) for item in items])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._send()
+        return False
+
+
+class FakeTable:
+    """
+    In-memory DynamoDB table: get_item, put_item, update_item, query, scan, batch_writer, load
+
+    query() understands boto3 Key conditions (eq/lt/lte/gt/gte/between/begins_with, &);
+    update_item() applies SET and ADD clauses - ConditionExpressions are not evaluated.
+    """
+
+    def __init__(self, name: str, key_names: Tuple[str, ...], faults: Faults):
+        self.name = name
+        self.key_names = key_names
+        self.faults = faults
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def _key(self, values: Dict[str, Any]) -> Tuple:
+        return tuple(values[name] for name in self.key_names)
+
+    def _store(self, item: Dict[str, Any]):
+        with self._lock:
+            self.items[self._key(item)] = dict(item)
+
+    def put_item(self, Item: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        return self.faults.call('PutItem', lambda: self._store(Item) or {})
+
+    def get_item(self, Key: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        def respond():
+            with self._lock:
+                item = self.items.get(self._key(Key))
+            return {'Item': dict(item)} if item else {}
+
+        return self.faults.call('GetItem', respond)
+
+    def update_item(self, Key: Dict[str, Any], UpdateExpression: str,
+                    ExpressionAttributeValues: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        values = ExpressionAttributeValues or {}
+
+        def respond():
+            with self._lock:
+                item = self.items.setdefault(self._key(Key), dict(Key))
+                for action, clause in re.findall(r'(SET|ADD)\s+(.*?)(?=\s+(?:SET|ADD)\s|$)', UpdateExpression):
+                    for assignment in clause.split(','):
+                        if action == 'SET':
+                            name, placeholder = [part.strip() for part in assignment.split('=')]
+                            item[name] = values[placeholder]
+                        else:
+                            name, placeholder = assignment.split()
+                            item[name] = item.get(name, 0) + values[placeholder]
+            return {}
+
+        return self.faults.call('UpdateItem', respond)
+
+    def _matches(self, item: Dict[str, Any], condition) -> bool:
+        expression = condition.get_expression()
+        operator, operands = expression['operator'], expression['values']
+        if operator == 'AND':
+            return all(self._matches(item, operand) for operand in operands)
+        value = item.get(operands[0].name)
+        if value is None:
+            return False
+        if operator == 'BETWEEN':
+            return operands[1] <= value <= operands[2]
+        if operator == 'begins_with':
+            return str(value).startswith(operands[1])
+        return {
+            '=': value == operands[1], '<': value < operands[1], '<=': value <= operands[1],
+            '>': value > operands[1], '>=': value >= operands[1]
+        }[operator]
+
+    def query(self, KeyConditionExpression, ScanIndexForward: bool = True, Limit: Optional[int] = None,
+              **kwargs) -> Dict[str, Any]:
+        def respond():
+            with self._lock:
+                items = [dict(item) for item in self.items.values() if self._matches(item, KeyConditionExpression)]
+            if len(self.key_names) > 1:
+                items.sort(key=lambda item: item[self.key_names[1]], reverse=not ScanIndexForward)
+            items = items[:Limit] if Limit else items
+            return {'Items': items, 'Count': len(items)}
+
+        return self.faults.call('Query', respond)
+
+    def scan(self, Limit: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        def respond():
+            with self._lock:
+                items = [dict(item) for item in self.items.values()]
+            items = items[:Limit] if Limit else items
+            return {'Items': items, 'Count': len(items)}
+
+        return self.faults.call('Scan', respond)
+
+    def batch_writer(self, **kwargs) -> FakeBatchWriter:
+        return FakeBatchWriter(self)
+
+    def load(self):
+        """Table.load() - DescribeTable"""
+        self.faults.call('DescribeTable', lambda: None)
+
+
+class FakeDynamoDB:
+    """
+    dynamodb resource: Table(name) for the tables given as {name: key attribute names}
+    Unknown tables fail like missing ones do.
+    """
+
+    def __init__(self, faults: Faults, key_schemas: Dict[str, Tuple[str, ...]]):
+        self.faults = faults
+        self.tables = {name: FakeTable(name, tuple(keys), faults) for name, keys in key_schemas.items()}
+
+    def Table(self, name: str) -> FakeTable:
+        if name not in self.tables:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException',
+                                         'Message': f'Requested resource not found: {name}'}}, 'DescribeTable')
+        return self.tables[name]
+
+
+def install(bedrock: FakeBedrockRuntime, s3vectors: FakeS3Vectors, dynamodb: Optional[FakeDynamoDB] = None,
+            agent_runtime: Optional[FakeBedrockAgentRuntime] = None):
+    """Make aws_clients hand out the fakes instead of boto3 clients"""
+    import aws_clients
+
+    aws_clients.set_client('bedrock-runtime', bedrock)
+    aws_clients.set_client('s3vectors', s3vectors)
+    if dynamodb is not None:
+        aws_clients.set_resource('dynamodb', dynamodb)
+    if agent_runtime is not None:
+        aws_clients.set_client('bedrock-agent-runtime', agent_runtime)
@@ -0,0 +1,356 @@
+"""
+End-to-end load test for lambda_handler with local AWS stand-ins (benchmarks/fakes.py)
+Reports throughput, per-stage latency histograms and the memory high-water mark
+
+Every worker is a separate process handling one request at a time - like a
+Lambda execution environment - so in-process caches, clients and memory are
+per worker, and --concurrency corresponds to the function's concurrency.
+Rate limits (--model-rps, --embed-rps) are shared by all workers like an
+account quota; throttled calls are retried with backoff before they fail.
+
+Any Lambda environment variable set in the shell (e.g. RETRIEVAL_MODE,
+RESPONSE_CACHE_ENABLED, MULTI_QUERY_RETRIEVAL) is passed to the workers.
+
+Usage:
+    python3 benchmarks/load_test.py --requests 200 --concurrency 1,4,16
+    python3 benchmarks/load_test.py --concurrency 8,32 --model-rps 10 --stream-ratio 0.5 --json load.json
+    python3 benchmarks/load_test.py --time-scale 0.1   # all injected latencies x0.1 (quick runs)
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import resource
+import traceback
+import multiprocessing
+from pathlib import Path
+from typing import Dict, List, Any
+
+import fakes
+from common import add_import_paths, latency_summary, histogram, format_histogram, write_json
+
+ANALYTICS_TABLE = 'loadtest-analytics'
+SESSIONS_TABLE = 'loadtest-sessions'
+MESSAGES_TABLE = 'loadtest-messages'
+
+QUESTIONS = [
+    'Wann ist der Support erreichbar?',
+    'Was kostet das Basic-Paket?',
+    'Wie lange werden Backups aufbewahrt?',
+    'Welche Kündigungsfrist gilt?',
+    'Wo stehen eure Rechenzentren?',
+    'Werden SSL-Zertifikate automatisch erneuert?',
+    'Ist der Umzug meiner Website kostenlos?',
+    'Wie bekomme ich meine Rechnung?',
+    'Kann ich später vom Basic- ins Pro-Paket wechseln?',
+    'Gibt es eine Geld-zurück-Garantie?',
+]
+FOLLOW_UPS = ['Und im Pro-Paket?', 'Gilt das auch am Wochenende?', 'Kannst du das genauer erklären?',
+              'Was muss ich dafür tun?', 'Gibt es Ausnahmen?']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test lambda_handler against local AWS fakes')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level (default: 200)')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated worker counts (default: 1,4,16)')
+    parser.add_argument('--stream-ratio', type=float, default=0.0, help='Share of "stream": true requests')
+    parser.add_argument('--max-turns', type=int, default=3, help='Longest conversation (user turns) per request')
+    parser.add_argument('--repeat-ratio', type=float, default=0.3,
+                        help='Share of requests asking one of a few hot questions (cache behaviour)')
+    parser.add_argument('--sessions', type=int, default=0,
+                        help='Use N server-side sessions (requests send only the new turn; stored per worker)')
+    parser.add_argument('--seed', type=int, default=42)
+
+    faults = parser.add_argument_group('injected latency and throttling')
+    faults.add_argument('--embed-latency-ms', type=float, default=25.0, help='Titan embedding latency')
+    faults.add_argument('--vector-latency-ms', type=float, default=30.0, help='S3 Vectors query latency')
+    faults.add_argument('--rerank-latency-ms', type=float, default=150.0, help='Bedrock Rerank latency')
+    faults.add_argument('--dynamodb-latency-ms', type=float, default=8.0, help='DynamoDB call latency')
+    faults.add_argument('--model-latency-ms', type=float, default=500.0, help='Converse time to first token')
+    faults.add_argument('--ms-per-token', type=float, default=15.0, help='Converse generation time per token')
+    faults.add_argument('--output-tokens', type=int, default=150, help='Tokens per model answer')
+    faults.add_argument('--jitter', type=float, default=0.2, help='Latency jitter as a share of the mean')
+    faults.add_argument('--throttle-rate', type=float, default=0.0, help='Random throttling probability per call')
+    faults.add_argument('--model-rps', type=float, default=0.0, help='Shared Converse quota in req/s (0 = none)')
+    faults.add_argument('--embed-rps', type=float, default=0.0, help='Shared embedding quota in req/s (0 = none)')
+    faults.add_argument('--max-attempts', type=int, default=4, help='Attempts per throttled call (SDK retries)')
+    faults.add_argument('--time-scale', type=float, default=1.0, help='Multiply all injected latencies')
+
+    parser.add_argument('--no-analytics', action='store_true', help='Run without the analytics table')
+    parser.add_argument('--json', type=Path, metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep the handler\'s log output')
+    return parser.parse_args()
+
+
+def build_event(index: int, args) -> Dict[str, Any]:
+    """API Gateway proxy event with an OpenAI-format chat request (deterministic per index)"""
+    rng = random.Random(args.seed * 100003 + index)
+    hot = rng.random() < args.repeat_ratio
+    messages = [{'role': 'system', 'content': 'Du bist der freundliche Support-Assistent eines Hosting-Anbieters.'}]
+
+    turns = 1 if hot or args.sessions else rng.randint(1, max(1, args.max_turns))
+    for turn in range(turns):
+        if turn == 0:
+            question = QUESTIONS[rng.randrange(3)] if hot else rng.choice(QUESTIONS)
+        else:
+            question = rng.choice(FOLLOW_UPS)
+        messages.append({'role': 'user', 'content': question})
+        if turn < turns - 1:
+            messages.append({'role': 'assistant', 'content': 'Gerne! ' + ' '.join(rng.sample(QUESTIONS, 2))})
+
+    body = {
+        'model': 'claude-3-5-sonnet',
+        'messages': messages,
+        'temperature': 0.7,
+        'max_tokens': 1000,
+        'stream': rng.random() < args.stream_ratio
+    }
+    if args.sessions:
+        body['session_id'] = f'loadtest-session-{index % args.sessions:04d}'
+    return {
+        'httpMethod': 'POST',
+        'path': '/v1/chat/completions',
+        'headers': {'Content-Type': 'application/json'},
+        'requestContext': {'requestId': f'load-{index}'},
+        'body': json.dumps(body)
+    }
+
+
+class InvocationContext:
+    def __init__(self, request_id: str):
+        self.aws_request_id = request_id
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def worker_environment(args) -> Dict[str, str]:
+    env = {
+        'MODEL_ID': os.environ.get('MODEL_ID', 'anthropic.claude-3-5-sonnet-20241022-v2:0'),
+        'AWS_REGION': os.environ.get('AWS_REGION', 'eu-central-1'),
+        'AWS_ACCESS_KEY_ID': 'loadtest',
+        'AWS_SECRET_ACCESS_KEY': 'loadtest',
+        'METRICS_MODE': 'off',
+        'WARMUP_ON_INIT': 'false',
+    }
+    if not args.no_analytics:
+        env['ANALYTICS_TABLE'] = ANALYTICS_TABLE
+    if args.sessions:
+        env.update({'SESSIONS_ENABLED': 'true', 'SESSIONS_TABLE': SESSIONS_TABLE, 'MESSAGES_TABLE': MESSAGES_TABLE})
+    return env
+
+
+def worker(worker_id: int, args, quotas, counter, barrier, results):
+    """One execution environment: import, install fakes, then take requests until none are left"""
+    try:
+        if not args.verbose:
+            sys.stdout = sys.stderr = open(os.devnull, 'w')
+        os.environ.update(worker_environment(args))
+        add_import_paths()
+        random.seed(args.seed + worker_id)
+        rss_start = max_rss_mb()
+        scale = args.time_scale
+
+        def faults(latency_ms: float, quota=None, rate: float = 0.0) -> fakes.Faults:
+            limiter = fakes.TokenBucket(rate, shared=quota) if quota is not None else None
+            return fakes.Faults(latency_ms * scale, latency_ms * scale * args.jitter, args.throttle_rate,
+                                limiter, args.max_attempts)
+
+        embed_faults = faults(args.embed_latency_ms, quotas.get('embed'), args.embed_rps)
+        model_faults = faults(args.model_latency_ms, quotas.get('model'), args.model_rps)
+        vector_faults = faults(args.vector_latency_ms)
+        rerank_faults = faults(args.rerank_latency_ms)
+        dynamodb_faults = faults(args.dynamodb_latency_ms)
+
+        init_start = time.perf_counter()
+        import lambda_function
+        import metrics
+        init_ms = (time.perf_counter() - init_start) * 1000
+
+        fakes.install(
+            fakes.FakeBedrockRuntime(embed_faults, model_faults, args.output_tokens, args.ms_per_token * scale),
+            fakes.FakeS3Vectors(vector_faults),
+            fakes.FakeDynamoDB(dynamodb_faults, {ANALYTICS_TABLE: ('event_id', 'timestamp'),
+                                                 SESSIONS_TABLE: ('session_id',),
+                                                 MESSAGES_TABLE: ('session_id', 'timestamp')}),
+            fakes.FakeBedrockAgentRuntime(rerank_faults)
+        )
+
+        stage_samples = {}
+        counts = {}
+
+        def collect(request_metrics):
+            for name, value in request_metrics.timings.items():
+                stage_samples.setdefault(name, []).append(value)
+            for name, value in request_metrics.counts.items():
+                counts[name] = counts.get(name, 0) + value
+
+        metrics.add_listener(collect)
+        rss_init = max_rss_mb()
+        barrier.wait()
+
+        latencies, statuses = [], {}
+        while True:
+            with counter.get_lock():
+                index = counter.value
+                if index >= args.requests:
+                    break
+                counter.value += 1
+            event = build_event(index, args)
+            start = time.perf_counter()
+            response = lambda_function.lambda_handler(event, InvocationContext(f'load-{index}'))
+            latencies.append((time.perf_counter() - start) * 1000)
+            status = response['statusCode']
+            if status == 200 and response['headers'].get('Content-Type') == 'text/event-stream' \
+                    and '"error"' in response['body']:
+                status = 500  # error reported in-band in the SSE body
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        lambda_function.drain_background()
+        if lambda_function.analytics_buffer:
+            lambda_function.analytics_buffer.flush()
+
+        results.put({
+            'worker': worker_id,
+            'init_ms': init_ms,
+            'latencies': latencies,
+            'statuses': statuses,
+            'stages': stage_samples,
+            'counts': counts,
+            'memory_mb': {'start': rss_start, 'after_init': rss_init, 'peak': max_rss_mb()},
+            'faults': {'embed': embed_faults.stats(), 'model': model_faults.stats(),
+                       'vector': vector_faults.stats(), 'rerank': rerank_faults.stats(),
+                       'dynamodb': dynamodb_faults.stats()}
+        })
+    except BaseException:
+        barrier.abort()
+        results.put({'worker': worker_id, 'error': traceback.format_exc()})
+
+
+def run_level(args, concurrency: int) -> Dict[str, Any]:
+    """Run --requests requests with ``concurrency`` worker processes"""
+    ctx = multiprocessing.get_context('spawn')
+    quotas = {}
+    if args.model_rps > 0:
+        quotas['model'] = fakes.TokenBucket.shared_state(ctx, burst=max(1.0, args.model_rps))
+    if args.embed_rps > 0:
+        quotas['embed'] = fakes.TokenBucket.shared_state(ctx, burst=max(1.0, args.embed_rps))
+
+    counter = ctx.Value('i', 0)
+    barrier = ctx.Barrier(concurrency + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(i, args, quotas, counter, barrier, results))
+                 for i in range(concurrency)]
+    for process in processes:
+        process.start()
+
+    try:
+        barrier.wait()
+    except Exception:
+        pass  # a worker failed during init; its error is in the results
+    start = time.perf_counter()
+    worker_results = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    errors = [result['error'] for result in worker_results if 'error' in result]
+    if errors:
+        raise RuntimeError(f"Worker failed:\n{errors[0]}")
+    return summarize_level(concurrency, elapsed, worker_results)
+
+
+def summarize_level(concurrency: int, elapsed: float, worker_results: List[Dict]) -> Dict[str, Any]:
+    latencies = [value for result in worker_results for value in result['latencies']]
+    stages, counts, statuses, fault_stats = {}, {}, {}, {}
+    for result in worker_results:
+        for name, values in result['stages'].items():
+            stages.setdefault(name, []).extend(values)
+        for name, value in result['counts'].items():
+            counts[name] = counts.get(name, 0) + value
+        for code, value in result['statuses'].items():
+            statuses[code] = statuses.get(code, 0) + value
+        for service, stats in result['faults'].items():
+            totals = fault_stats.setdefault(service, {})
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'statuses': statuses,
+        'latency_ms': latency_summary(latencies),
+        'latency_histogram': histogram(latencies),
+        'stages': {name: {'summary': latency_summary(values), 'histogram': histogram(values)}
+                   for name, values in sorted(stages.items())},
+        'counts': counts,
+        'faults': fault_stats,
+        'init_ms': latency_summary([result['init_ms'] for result in worker_results]),
+        'memory_mb': {
+            'start': max(result['memory_mb']['start'] for result in worker_results),
+            'after_init': max(result['memory_mb']['after_init'] for result in worker_results),
+            'peak': max(result['memory_mb']['peak'] for result in worker_results)
+        }
+    }
+
+
+def suggested_memory_mb(peak_mb: float, headroom: float = 1.25) -> int:
+    """Smallest Lambda memory setting (64 MB steps, >= 128) above the peak plus headroom"""
+    return max(128, int(math.ceil(peak_mb * headroom / 64)) * 64)
+
+
+def print_level(level: Dict[str, Any]):
+    latency = level['latency_ms']
+    memory = level['memory_mb']
+    print(f"\n=== Concurrency {level['concurrency']}: {level['requests']} requests in {level['duration_s']} s "
+          f"-> {level['throughput_rps']} req/s")
+    print(f"  status codes: {json.dumps(level['statuses'])}")
+    print(f"  latency: p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+          f"max {latency['max']} ms")
+    for service, stats in level['faults'].items():
+        if stats['throttled']:
+            print(f"  {service}: {stats['throttled']} throttled attempts, {stats['failed']} failed calls "
+                  f"of {stats['calls']}")
+    print(f"  memory per worker: {memory['start']} MB at start, {memory['after_init']} MB after init, "
+          f"{memory['peak']} MB peak -> suggested Lambda memory >= {suggested_memory_mb(memory['peak'])} MB")
+    print(f"  init (import lambda_function): p50 {level['init_ms']['p50']} ms")
+    for name, stage in level['stages'].items():
+        summary = stage['summary']
+        print(format_histogram(f"  {name} (p50 {summary['p50']} ms, p95 {summary['p95']} ms, n={summary['count']})",
+                               stage['histogram'], width=30))
+
+
+def main():
+    args = parse_args()
+    add_import_paths()
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    report = {'config': {name: str(value) if isinstance(value, Path) else value
+                         for name, value in vars(args).items()}, 'levels': []}
+    for concurrency in levels:
+        level = run_level(args, concurrency)
+        print_level(level)
+        report['levels'].append(level)
+
+    print("\nSummary:")
+    for level in report['levels']:
+        errors = sum(count for code, count in level['statuses'].items() if code != '200')
+        print(f"  concurrency {level['concurrency']:>3}: {level['throughput_rps']:>8.2f} req/s   "
+              f"p95 {level['latency_ms']['p95']:>9.1f} ms   errors {errors:>4}   "
+              f"peak memory {level['memory_mb']['peak']} MB")
+
+    if args.json:
+        write_json(args.json, report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Compact vector storage benchmark: memory footprint vs. recall loss
+Runs the same queries against a local index in float32, float16 and int8 storage
+(two-phase scan + float32 rescoring) and compares with exact float32 search
+
+Vectors:
+    --content-dir DIR   build a throwaway local index from markdown with the real builder
+                        (fully offline with --provider hashing)
+    --index-dir DIR     use an existing local index (build_s3_vectors_index.py --export-local)
+    --synthetic N       N clustered random vectors of --dimensions (no embedding at all)
+
+Queries are stored vectors plus Gaussian noise (--noise), i.e. "a question close to
+some chunk"; recall@k is the share of the exact float32 top-k that a configuration returns.
+
+Usage:
+    python3 benchmarks/quantization_benchmark.py --synthetic 100000 --dimensions 1024 --rescore-factors 1,2,4
+    python3 benchmarks/quantization_benchmark.py --content-dir ../../knowledge-base --provider hashing \\
+        --json quantization.json
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Dict, List, Any
+
+from common import add_import_paths, latency_summary, write_json
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Memory vs. recall of float16 / int8 local vector storage')
+    parser.add_argument('--content-dir', type=Path, help='Build a temporary local index from this markdown dir')
+    parser.add_argument('--index-dir', type=Path, help='Existing local index directory')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='Use N synthetic vectors')
+    parser.add_argument('--provider', choices=['bedrock', 'hashing'], help='Embedding provider (--content-dir)')
+    parser.add_argument('--dimensions', type=int, help='Embedding / synthetic vector dimensions')
+    parser.add_argument('--clusters', type=int, default=200, help='Clusters of the synthetic vectors (default: 200)')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries (default: 200)')
+    parser.add_argument('--noise', type=float, default=0.5,
+                        help='Query noise relative to the vector norm (default: 0.5)')
+    parser.add_argument('--top-k', type=int, default=10, help='Results per query (default: 10)')
+    parser.add_argument('--rescore-factors', default='1,4',
+                        help='Comma-separated shortlist factors (shortlist = top-k x factor, default: 1,4)')
+    parser.add_argument('--seed', type=int, default=7, help='Random seed (default: 7)')
+    parser.add_argument('--json', type=Path, metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep the builder\'s log output')
+    args = parser.parse_args()
+    if sum(bool(source) for source in (args.content_dir, args.index_dir, args.synthetic)) != 1:
+        parser.error('exactly one of --content-dir, --index-dir or --synthetic is required')
+    return args
+
+
+def build_index(args, workdir: Path) -> Path:
+    """Chunk, embed and export a float32 local index with the real builder code"""
+    if args.provider:
+        os.environ['EMBEDDING_PROVIDER'] = args.provider
+    if args.dimensions is not None:
+        os.environ['EMBEDDING_DIMENSIONS'] = str(args.dimensions)
+    import build_s3_vectors_index as builder
+
+    chunks = builder.chunk_documents(args.content_dir)
+    builder.export_local_index(chunks, workdir / 'index', workers=8)
+    return workdir / 'index'
+
+
+def synthetic_index(args, workdir: Path) -> Path:
+    """Clustered random vectors (embeddings are far from uniform) written as a float32 local index"""
+    import numpy as np
+    from local_vector_store import LocalIndexWriter
+
+    rng = np.random.default_rng(args.seed)
+    dimension = args.dimensions or 1024
+    centers = rng.standard_normal((args.clusters, dimension)).astype(np.float32)
+    writer = LocalIndexWriter(str(workdir / 'index'), args.synthetic, dimension)
+    for start in range(0, args.synthetic, 10000):
+        count = min(10000, args.synthetic - start)
+        block = centers[rng.integers(0, args.clusters, count)] + rng.standard_normal((count, dimension)) * 0.6
+        for offset, vector in enumerate(block):
+            row = start + offset
+            writer.write(row, f'v{row}', vector, {'source': f'synthetic/{row % args.clusters}.md'})
+    writer.close()
+    return workdir / 'index'
+
+
+def make_queries(vectors, args) -> List[Any]:
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed + 1)
+    rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    base = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+    noise = rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1]) * args.noise
+    return list(base + noise)
+
+
+def run_configuration(store, queries: List[Any], truth: List[set], top_k: int) -> Dict[str, Any]:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.query(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & {result['key'] for result in results}) / len(expected))
+    return {
+        'recall_at_k': round(sum(recalls) / len(recalls), 4),
+        'min_recall': round(min(recalls), 4),
+        'latency_ms': latency_summary(latencies)
+    }
+
+
+def run(args, index_dir: Path) -> Dict[str, Any]:
+    from local_vector_store import LocalVectorStore, STORAGE_TYPES
+
+    exact = LocalVectorStore(str(index_dir), storage='float32')
+    queries = make_queries(exact.vectors, args)
+    truth = [{result['key'] for result in exact.query(query, args.top_k)} for query in queries]
+    float32_bytes = exact.scan_bytes()
+
+    factors = [int(f) for f in args.rescore_factors.split(',') if f.strip()]
+    configurations = []
+    for storage in STORAGE_TYPES:
+        for factor in ([1] if storage == 'float32' else factors):
+            store = exact if storage == 'float32' else LocalVectorStore(str(index_dir), storage=storage,
+                                                                        rescore_factor=factor)
+            result = run_configuration(store, queries, truth, args.top_k)
+            configurations.append({
+                'storage': storage,
+                'rescore_factor': factor if storage != 'float32' else None,
+                'scan_bytes': store.scan_bytes(),
+                'memory_reduction': round(float32_bytes / store.scan_bytes(), 2),
+                **result
+            })
+    return {
+        'vectors': len(exact),
+        'dimension': exact.dimension,
+        'queries': len(queries),
+        'top_k': args.top_k,
+        'configurations': configurations
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['vectors']} vectors x {report['dimension']} dims, {report['queries']} queries, "
+          f"recall@{report['top_k']} vs. exact float32")
+    print(f"{'storage':<9} {'rescore':>7} {'scan MB':>9} {'reduction':>9} {'recall':>7} {'min':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for c in report['configurations']:
+        factor = f"x{c['rescore_factor']}" if c['rescore_factor'] else '-'
+        print(f"{c['storage']:<9} {factor:>7} {c['scan_bytes'] / 1e6:>9.2f} {c['memory_reduction']:>8.2f}x "
+              f"{c['recall_at_k']:>7.3f} {c['min_recall']:>6.2f} {c['latency_ms']['p50']:>8.2f} "
+              f"{c['latency_ms']['p95']:>8.2f}")
+
+
+def main():
+    args = parse_args()
+    add_import_paths()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        output = sys.stdout if args.verbose else open(os.devnull, 'w')
+        with contextlib.redirect_stdout(output):
+            if args.index_dir:
+                index_dir = args.index_dir
+            elif args.synthetic:
+                index_dir = synthetic_index(args, workdir)
+            else:
+                index_dir = build_index(args, workdir)
+            report = run(args, index_dir)
+
+    print_report(report)
+    if args.json:
+        write_json(args.json, report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Offline retrieval benchmark: latency, throughput and quality (recall@k, MRR)
+Runs a labeled query set through build_contextual_query + retrieval + format_context
+
+Backends:
+    --content-dir DIR   build a throwaway local index from markdown (chunking and
+                        embedding settings as flags) - fully offline with --provider hashing
+    --index-dir DIR     use an existing local index (build_s3_vectors_index.py --export-local)
+    (neither)           whatever the environment configures (e.g. live S3 Vectors + Bedrock)
+
+Golden set (JSON):
+    {"queries": [{"id": "hours", "query": "Wann habt ihr offen?", "relevant": ["kontakt.md"]},
+                 {"id": "follow-up", "messages": [{"role": "user", "content": "..."}, ...],
+                  "relevant": ["preise.md"]}]}
+    "relevant" lists source paths (or vector keys) that count as a hit.
+
+Usage:
+    python3 benchmarks/retrieval_benchmark.py --golden golden.json --content-dir ../../knowledge-base \\
+        --provider hashing --chunk-tokens 200 --top-k 5 --concurrency 1,4,16 --json results.json
+    python3 benchmarks/retrieval_benchmark.py ... --baseline results.json   # exit code 1 on regression
+    (exit code 2 if the baseline ran with another --mode / --multi-query / --top-k / backend)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any
+
+from common import add_import_paths, latency_summary, write_json
+
+# Run settings a baseline must share to be comparable (index build settings may differ -
+# comparing chunking or embedding options is what the baseline is for)
+COMPARABLE_CONFIG = ('mode', 'multi_query', 'top_k', 'vector_backend')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Retrieval latency/quality benchmark')
+    parser.add_argument('--golden', type=Path, required=True, help='Labeled query set (JSON)')
+    parser.add_argument('--content-dir', type=Path, help='Build a temporary local index from this markdown dir')
+    parser.add_argument('--index-dir', type=Path, help='Existing local index directory')
+    parser.add_argument('--provider', choices=['bedrock', 'hashing'], help='Embedding provider')
+    parser.add_argument('--dimensions', type=int, help='Embedding dimensions')
+    parser.add_argument('--chunk-tokens', type=int, default=200, help='Chunk size when building (default: 200)')
+    parser.add_argument('--chunk-overlap', type=int, default=30, help='Chunk overlap when building (default: 30)')
+    parser.add_argument('--mode', choices=['vector', 'hybrid'], default='vector', help='Retrieval mode')
+    parser.add_argument('--multi-query', action='store_true', help='One sub-query per user turn')
+    parser.add_argument('--top-k', type=int, default=5, help='Results per query (default: 5)')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--iterations', type=int, default=3, help='Passes over the query set per level')
+    parser.add_argument('--json', type=Path, metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep the retriever\'s per-query log output')
+    parser.add_argument('--baseline', type=Path, help='Earlier --json results to compare against')
+    parser.add_argument('--max-latency-regression', type=float, default=0.2,
+                        help='Allowed relative p95 latency increase vs. baseline (default: 0.2)')
+    parser.add_argument('--max-quality-drop', type=float, default=0.02,
+                        help='Allowed absolute recall@k / MRR drop vs. baseline (default: 0.02)')
+    return parser.parse_args()
+
+
+def configure_environment(args, workdir: Path):
+    """Set the retriever's configuration before its modules are imported"""
+    os.environ.setdefault('MODEL_ID', 'benchmark')
+    os.environ['METRICS_MODE'] = 'off'
+    os.environ['EMBEDDING_CACHE_SIZE'] = '0'  # measure embedding cost on every query
+    os.environ['RETRIEVAL_MODE'] = args.mode
+    if args.provider:
+        os.environ['EMBEDDING_PROVIDER'] = args.provider
+    if args.dimensions is not None:
+        os.environ['EMBEDDING_DIMENSIONS'] = str(args.dimensions)
+    if args.content_dir or args.index_dir:
+        os.environ['VECTOR_BACKEND'] = 'local'
+        os.environ['LOCAL_INDEX_DIR'] = str(args.index_dir or workdir / 'index')
+    if args.content_dir:
+        os.environ['BM25_INDEX_PATH'] = str(workdir / 'bm25.json.gz')
+
+
+def build_index(args, workdir: Path) -> Dict[str, Any]:
+    """Chunk, embed and export a local index (and BM25 artifact) with the real builder code"""
+    import build_s3_vectors_index as builder
+
+    start = time.perf_counter()
+    chunks = builder.chunk_documents(args.content_dir, args.chunk_tokens, args.chunk_overlap)
+    builder.write_bm25_index(chunks, workdir / 'bm25.json.gz')
+    builder.export_local_index(chunks, workdir / 'index', workers=8)
+    return {
+        'chunks': len(chunks),
+        'build_seconds': round(time.perf_counter() - start, 2),
+        'embed_model': builder.embedding_provider.model_id,
+        'chunk_tokens': args.chunk_tokens,
+        'chunk_overlap': args.chunk_overlap
+    }
+
+
+def load_golden_set(path: Path) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    cases = data['queries'] if isinstance(data, dict) else data
+    for i, case in enumerate(cases):
+        case.setdefault('id', str(i))
+        if 'messages' not in case:
+            case['messages'] = [{'role': 'user', 'content': case['query']}]
+    return cases
+
+
+def run_query(case: Dict, top_k: int, multi_query: bool) -> Dict:
+    """Retrieve for one case the way the handler does; returns latency and ranked hits"""
+    import lambda_function
+    import s3_vectors_retriever as retriever
+
+    start = time.perf_counter()
+    if multi_query:
+        documents = retriever.retrieve_documents_multi(lambda_function.build_sub_queries(case['messages']), top_k)
+    else:
+        query = lambda_function.build_contextual_query(case['messages'], max_messages=5)
+        documents = retriever.retrieve_documents(query, top_k)
+    context = retriever.format_context(documents)
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'latency_ms': latency_ms,
+        'hits': [(document['source'], document['key']) for document in documents],
+        'context_chars': len(context)
+    }
+
+
+def quality(cases: List[Dict], results: List[Dict], top_k: int) -> Dict[str, float]:
+    """recall@k (share of relevant items found) and MRR (1 / rank of the first relevant hit)"""
+    recalls, reciprocal_ranks = [], []
+    per_query = {}
+    for case, result in zip(cases, results):
+        relevant = set(case.get('relevant', []))
+        if not relevant:
+            continue
+        found, first_rank = set(), None
+        for rank, (source, key) in enumerate(result['hits'][:top_k], start=1):
+            match = relevant & {source, key}
+            if match:
+                found |= match
+                first_rank = first_rank or rank
+        recalls.append(len(found) / len(relevant))
+        reciprocal_ranks.append(1.0 / first_rank if first_rank else 0.0)
+        per_query[case['id']] = {'recall': recalls[-1], 'rank': first_rank}
+
+    return {
+        f'recall@{top_k}': round(sum(recalls) / len(recalls), 4) if recalls else 0.0,
+        'mrr': round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4) if reciprocal_ranks else 0.0,
+        'labeled_queries': len(recalls),
+        'per_query': per_query
+    }
+
+
+def run_level(cases: List[Dict], concurrency: int, iterations: int, top_k: int, multi_query: bool) -> Dict:
+    """Run the query set ``iterations`` times with ``concurrency`` parallel callers"""
+    workload = [case for _ in range(iterations) for case in cases]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda case: run_query(case, top_k, multi_query), workload))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'queries': len(workload),
+        'throughput_qps': round(len(workload) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': latency_summary([result['latency_ms'] for result in results]),
+        'mean_context_chars': round(sum(r['context_chars'] for r in results) / len(results), 1) if results else 0
+    }
+
+
+def config_mismatches(current: Dict, baseline: Dict) -> List[str]:
+    """Run settings that differ from the baseline's (empty list = comparable)"""
+    old_config, new_config = baseline.get('config') or {}, current['config']
+    return [f"{name}: baseline {old_config.get(name)!r}, this run {new_config.get(name)!r}"
+            for name in COMPARABLE_CONFIG if old_config.get(name) != new_config.get(name)]
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, top_k: int,
+                        max_latency_regression: float, max_quality_drop: float) -> List[str]:
+    """Regression messages (empty list = no regression)"""
+    problems = []
+
+    for name in (f'recall@{top_k}', 'mrr'):
+        old, new = baseline['quality'].get(name), current['quality'].get(name)
+        if old is not None and new is not None and new < old - max_quality_drop:
+            problems.append(f"{name} dropped from {old:.4f} to {new:.4f}")
+
+    old_levels = {level['concurrency']: level for level in baseline['levels']}
+    for level in current['levels']:
+        old = old_levels.get(level['concurrency'])
+        if not old or not old['latency_ms'].get('p95'):
+            continue
+        old_p95, new_p95 = old['latency_ms']['p95'], level['latency_ms']['p95']
+        if new_p95 > old_p95 * (1 + max_latency_regression):
+            problems.append(f"p95 latency at concurrency {level['concurrency']} rose from "
+                            f"{old_p95:.2f} ms to {new_p95:.2f} ms")
+    return problems
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix='retrieval-benchmark-') as workdir:
+        configure_environment(args, Path(workdir))
+        add_import_paths()
+
+        build_info = build_index(args, Path(workdir)) if args.content_dir else None
+        cases = load_golden_set(args.golden)
+        levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+        # The retriever logs every query; printing would dominate sub-millisecond timings
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            # Quality from one sequential pass, latency/throughput per concurrency level
+            quality_results = [run_query(case, args.top_k, args.multi_query) for case in cases]
+            level_results = [run_level(cases, level, args.iterations, args.top_k, args.multi_query)
+                             for level in levels]
+
+    report = {
+        'config': {
+            'mode': args.mode,
+            'multi_query': args.multi_query,
+            'top_k': args.top_k,
+            'iterations': args.iterations,
+            'vector_backend': os.environ.get('VECTOR_BACKEND', 's3vectors'),
+            'build': build_info
+        },
+        'quality': quality(cases, quality_results, args.top_k),
+        'levels': level_results
+    }
+
+    print(f"\nQueries: {len(cases)} ({report['quality']['labeled_queries']} labeled), top_k={args.top_k}, "
+          f"mode={args.mode}{' + multi-query' if args.multi_query else ''}")
+    print(f"  recall@{args.top_k}: {report['quality'][f'recall@{args.top_k}']:.4f}   "
+          f"MRR: {report['quality']['mrr']:.4f}")
+    for level in report['levels']:
+        latency = level['latency_ms']
+        print(f"  concurrency {level['concurrency']:>3}: {level['throughput_qps']:>8.1f} q/s   "
+              f"p50 {latency['p50']:>8.2f} ms   p95 {latency['p95']:>8.2f} ms   p99 {latency['p99']:>8.2f} ms")
+
+    if args.json:
+        write_json(args.json, report)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatches = config_mismatches(report, baseline)
+        if mismatches:
+            print(f"Baseline {args.baseline} was run with different settings - not comparing:")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+            sys.exit(2)
+        problems = compare_to_baseline(report, baseline, args.top_k,
+                                       args.max_latency_regression, args.max_quality_drop)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regression against baseline")
+
+
+if __name__ == '__main__':
+    main()
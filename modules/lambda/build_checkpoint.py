@@ -0,0 +1,238 @@
+"""
+Checkpoint store for resumable index builds (used by build_s3_vectors_index.py)
+Append-only on-disk files: computed embeddings and committed upload batches
+
+Layout of the checkpoint directory:
+    checkpoint.json   run info (bucket, index, embedding model, dimension, state)
+    embeddings.bin    fixed-size records: 32-byte content key + float32 vector
+    uploaded.log      one "vector_key fingerprint" line per uploaded vector
+
+Embeddings are keyed by a hash of embedding model and embedded text, so they
+are reused for any chunk with the same content - across restarts and later
+rebuilds. A partially written record or line at the end (crash mid-write) is
+ignored and overwritten.
+"""
+
+import os
+import json
+import time
+import array
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+HEADER_FILE = 'checkpoint.json'
+EMBEDDINGS_FILE = 'embeddings.bin'
+UPLOADED_FILE = 'uploaded.log'
+KEY_BYTES = 32
+
+
+def embedding_key(model_id: str, text: str) -> str:
+    """Content key of an embedding (model + embedded text)"""
+    return hashlib.sha256(f"{model_id}\n{text}".encode('utf-8')).hexdigest()[:KEY_BYTES]
+
+
+class BuildCheckpoint:
+    """
+    Persists embeddings as they are produced and upload batches once they are committed
+
+    Not thread-safe for concurrent writers of the same directory (one build at a time).
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.header = self._read_header()
+        self.dimension = self.header.get('dimension')
+        self._offsets = {}
+        self._uploaded = set()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._reader = None
+        self._unsynced = 0
+        if self.dimension:
+            self._load_embeddings()
+        self._load_uploaded()
+
+    # Run state
+
+    def _read_header(self) -> Dict:
+        path = self.directory / HEADER_FILE
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_header(self):
+        path = self.directory / HEADER_FILE
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.header, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def can_resume(self, vector_bucket: str, index_name: str, embed_model: str) -> bool:
+        """An unfinished run for the same index and embedding model"""
+        return (self.header.get('state') == 'running'
+                and self.header.get('vector_bucket') == vector_bucket
+                and self.header.get('index_name') == index_name
+                and self.header.get('embed_model') == embed_model)
+
+    def start(self, vector_bucket: str, index_name: str, embed_model: str, dimension: int, resume: bool):
+        """
+        Begin (or continue) a run
+
+        A new run forgets the upload log - its index is (re)created or
+        changed - but keeps embeddings of the same model and dimension.
+        """
+        if self.header.get('embed_model') != embed_model or self.header.get('dimension') != dimension:
+            self._reset_embeddings()
+        if not resume:
+            self._reset_uploaded()
+
+        self.dimension = dimension
+        self.header = {
+            'vector_bucket': vector_bucket,
+            'index_name': index_name,
+            'embed_model': embed_model,
+            'dimension': dimension,
+            'state': 'running',
+            'started_at': self.header.get('started_at') if resume else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        self._write_header()
+        if not self._offsets:
+            self._load_embeddings()
+
+    def ensure_embeddings(self, embed_model: str, dimension: int) -> bool:
+        """
+        Use the store as an embedding cache only (local exports) without touching the run state
+
+        Returns:
+            False if the checkpoint holds another model's embeddings (it is then left alone)
+        """
+        if not self.header:
+            self.header = {'embed_model': embed_model, 'dimension': dimension, 'state': 'completed'}
+            self.dimension = dimension
+            self._write_header()
+            return True
+        return self.header.get('embed_model') == embed_model and self.header.get('dimension') == dimension
+
+    def finish(self):
+        """Mark the run as complete (a later build starts a new run)"""
+        self.commit()
+        self.header['state'] = 'completed'
+        self.header['completed_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self._write_header()
+
+    def close(self):
+        self.commit()
+        for handle in (self._writer, self._reader):
+            if handle:
+                handle.close()
+        self._writer = self._reader = None
+
+    # Embeddings
+
+    @property
+    def record_size(self) -> int:
+        return KEY_BYTES + 4 * self.dimension
+
+    def _reset_embeddings(self):
+        self.close()
+        (self.directory / EMBEDDINGS_FILE).unlink(missing_ok=True)
+        self._offsets = {}
+
+    def _load_embeddings(self):
+        """Index complete records (key -> offset); cut off a partially written tail"""
+        path = self.directory / EMBEDDINGS_FILE
+        if not path.exists():
+            return
+        size = path.stat().st_size
+        complete = size - size % self.record_size
+        if complete != size:
+            with open(path, 'r+b') as f:
+                f.truncate(complete)
+        with open(path, 'rb') as f:
+            for offset in range(0, complete, self.record_size):
+                f.seek(offset)
+                self._offsets[f.read(KEY_BYTES).decode('ascii')] = offset
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def has_embedding(self, key: str) -> bool:
+        return key in self._offsets
+
+    def get_embedding(self, key: str) -> Optional[List[float]]:
+        offset = self._offsets.get(key)
+        if offset is None:
+            return None
+        with self._lock:
+            if self._writer:
+                self._writer.flush()
+            if self._reader is None:
+                self._reader = open(self.directory / EMBEDDINGS_FILE, 'rb')
+            self._reader.seek(offset + KEY_BYTES)
+            return array.array('f', self._reader.read(4 * self.dimension)).tolist()
+
+    def add_embedding(self, key: str, embedding: List[float]):
+        """Append an embedding (durable after the next commit())"""
+        if len(embedding) != self.dimension:
+            raise ValueError(f"Embedding has dimension {len(embedding)}, checkpoint expects {self.dimension}")
+        with self._lock:
+            if key in self._offsets:
+                return
+            if self._writer is None:
+                self._writer = open(self.directory / EMBEDDINGS_FILE, 'ab')
+            offset = self._writer.tell()
+            self._writer.write(key.encode('ascii') + array.array('f', embedding).tobytes())
+            self._offsets[key] = offset
+            self._unsynced += 1
+
+    def commit(self):
+        """Flush appended embeddings to disk"""
+        with self._lock:
+            if self._writer and self._unsynced:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._unsynced = 0
+
+    @property
+    def unsynced(self) -> int:
+        return self._unsynced
+
+    # Upload log
+
+    def _reset_uploaded(self):
+        (self.directory / UPLOADED_FILE).unlink(missing_ok=True)
+        self._uploaded = set()
+
+    def _load_uploaded(self):
+        path = self.directory / UPLOADED_FILE
+        if not path.exists():
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        # Only newline-terminated lines were committed
+        for line in content[:content.rfind('\n') + 1].splitlines():
+            self._uploaded.add(line.strip())
+
+    def is_uploaded(self, key: str, fingerprint: str) -> bool:
+        return f"{key} {fingerprint}" in self._uploaded
+
+    @property
+    def uploaded_count(self) -> int:
+        return len(self._uploaded)
+
+    def mark_uploaded(self, pairs: List[Tuple[str, str]]):
+        """Record a committed upload batch of (vector_key, fingerprint) - embeddings are flushed first"""
+        self.commit()
+        lines = [f"{key} {fingerprint}" for key, fingerprint in pairs]
+        with open(self.directory / UPLOADED_FILE, 'a', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._uploaded.update(lines)
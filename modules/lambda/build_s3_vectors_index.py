@@ -4,12 +4,31 @@ Much simpler than FAISS - no ML dependencies, uses Bedrock Titan for embeddings
 """
 
 import os
+import sys
 import json
+import time
+import hashlib
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Callable, Tuple
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from build_checkpoint import BuildCheckpoint, embedding_key
+
+# Shared modules from the Lambda package
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+from local_vector_store import LocalIndexWriter, STORAGE_TYPES  # noqa: E402
+from embeddings import create_embedding_provider  # noqa: E402
+from bm25_index import BM25Index  # noqa: E402
+from markdown_chunker import chunk_documents as iter_document_chunks, embedding_text  # noqa: E402
+from index_pointer import create_pointer_backend, PointerBackend  # noqa: E402
+from retrieval_filters import source_prefixes  # noqa: E402
+
 # Configuration
 # Use knowledge-base/ directory (output from extract-kb-content.py)
 CONTENT_DIR = os.environ.get('CONTENT_DIR', None)
@@ -22,222 +41,982 @@ else:
 
 VECTOR_BUCKET = os.environ.get('S3_VECTORS_BUCKET', 'your-project-dev-vector-bucket')
 VECTOR_INDEX = os.environ.get('S3_VECTORS_INDEX', 'kb-index')
-BEDROCK_EMBED_MODEL = os.environ.get('BEDROCK_EMBED_MODEL', 'amazon.titan-embed-text-v2:0')
 AWS_REGION = os.environ.get('AWS_REGION', 'eu-central-1')
+EMBED_WORKERS = int(os.environ.get('EMBED_WORKERS', '8'))
+BATCH_SIZE = int(os.environ.get('PUT_VECTORS_BATCH_SIZE', '100'))
+CHUNK_TOKENS = int(os.environ.get('CHUNK_TOKENS', '200'))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', '30'))
+TENANT_FROM_PATH = os.environ.get('TENANT_FROM_PATH', 'false').lower() == 'true'  # top-level directory = tenant
+MANIFEST_PATH = Path(os.environ.get('INDEX_MANIFEST', Path(__file__).parent / 's3_vectors_manifest.json'))
+CHECKPOINT_DIR = Path(os.environ.get('INDEX_CHECKPOINT_DIR', Path(__file__).parent / '.index_checkpoint'))
+INDEX_KEEP_VERSIONS = int(os.environ.get('INDEX_KEEP_VERSIONS', '2'))  # blue/green: versions kept incl. the active one
+SMOKE_TEST_SAMPLES = int(os.environ.get('SMOKE_TEST_SAMPLES', '5'))
+SMOKE_TEST_MIN_HIT_RATE = float(os.environ.get('SMOKE_TEST_MIN_HIT_RATE', '0.8'))
+CHECKPOINT_EVERY = int(os.environ.get('INDEX_CHECKPOINT_EVERY', '100'))  # embeddings between fsyncs (local-only builds)
+LOCAL_INDEX_STORAGE = os.environ.get('LOCAL_INDEX_STORAGE') or 'float32'  # float32 | float16 | int8 (local export)
+
+# Document attributes stored as filterable metadata (see retrieval_filters.py)
+ATTRIBUTE_FIELDS = ('tenant', 'language', 'doc_type')
+# Stored for the prompt only - kept out of the (size-limited) filterable metadata
+NON_FILTERABLE_METADATA = ['text', 'section', 'chunk_index', 'start', 'end']
+
+# Bedrock error codes that mean "slow down" rather than "broken request"
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
 
 # AWS Clients
 s3vectors_client = boto3.client('s3vectors', region_name=AWS_REGION)
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=AWS_REGION)
+bedrock_runtime = boto3.client(
+    'bedrock-runtime',
+    region_name=AWS_REGION,
+    config=Config(max_pool_connections=max(10, EMBED_WORKERS))
+)
 
+# Embeddings (EMBEDDING_PROVIDER / EMBEDDING_DIMENSIONS - shared with the Lambda retriever)
+embedding_provider = create_embedding_provider(bedrock_runtime)
 
-def load_markdown_files(content_dir: Path) -> List[Dict[str, str]]:
-    """Load all markdown files from knowledge-base directory"""
-    print(f"📂 Loading markdown files from {content_dir}")
 
-    documents = []
+class AdaptiveThrottle:
+    """
+    Shared pacing for all embedding workers (AIMD)
 
-    # Recursively find all .md files
-    for md_file in content_dir.rglob('*.md'):
-        # Skip files that start with underscore
-        if md_file.name.startswith('_'):
-            continue
+    Every throttling error doubles the delay each worker waits before its next
+    call; every success shrinks it again. This lets the pool settle just below
+    the account's Bedrock quota instead of hammering it with retries.
+    """
+
+    def __init__(self, max_delay: float = 20.0):
+        self.delay = 0.0
+        self.max_delay = max_delay
+        self.throttle_count = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay > 0:
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def on_success(self):
+        with self._lock:
+            self.delay = max(0.0, self.delay - 0.05) if self.delay > 0.1 else 0.0
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttle_count += 1
+            self.delay = min(self.max_delay, max(0.25, self.delay * 2))
+
+
+class ChunkSource:
+    """
+    The corpus as a re-iterable stream of keyed chunks
+
+    Every pass re-reads and re-chunks the markdown files one at a time
+    (chunking is cheap next to embedding), so no pass holds more than one
+    file's chunks. The scan keeps only what later stages need: key ->
+    fingerprint (manifest, incremental diff), the first chunk (embedding
+    dimension) and a few chunks spread over the corpus for the smoke test.
+    """
+
+    def __init__(self, content_dir: Path, chunk_tokens: int = CHUNK_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS, tenant_from_path: bool = TENANT_FROM_PATH,
+                 samples: int = SMOKE_TEST_SAMPLES):
+        self.content_dir = content_dir
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tenant_from_path = tenant_from_path
+        self.sample_size = samples
+        self.fingerprints = {}
+        self.first = None
+        self.samples = []
+        self._scanned = False
+
+    def __iter__(self) -> Iterator[Dict]:
+        chunks = assign_chunk_keys(iter_document_chunks(self.content_dir, self.chunk_tokens, self.overlap_tokens,
+                                                        self.tenant_from_path))
+        for chunk in chunks:
+            if self._scanned and self.fingerprints.get(chunk['key']) != chunk['fingerprint']:
+                raise RuntimeError(f"{chunk['source']} changed during the build - start the build again")
+            yield chunk
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def scan(self) -> 'ChunkSource':
+        """First pass: fingerprints, first chunk, smoke test samples and a summary"""
+        files = 0
+        current_source = None
+        attribute_values = {'tenant': set(), 'language': set()}
+        # Every ``stride``-th chunk is kept; the stride doubles whenever too many
+        # are kept, so the samples stay few and evenly spread over the corpus
+        stride, kept = 1, []
+        for position, chunk in enumerate(self):
+            if chunk['source'] != current_source:
+                current_source = chunk['source']
+                files += 1
+            self.fingerprints[chunk['key']] = chunk['fingerprint']
+            self.first = self.first or chunk
+            for field, values in attribute_values.items():
+                if chunk.get(field):
+                    values.add(chunk[field])
+            if position % stride == 0:
+                kept.append(chunk)
+                if len(kept) > 2 * max(1, self.sample_size):
+                    kept, stride = kept[::2], stride * 2
+        self.samples = kept[::max(1, len(kept) // max(1, self.sample_size))][:self.sample_size]
+        self._scanned = True
+
+        print(f"✅ Created {len(self)} chunks from {files} documents")
+        for field, values in attribute_values.items():
+            values = sorted(values)
+            if values:
+                print(f"  ℹ️  {field.capitalize()}s: {', '.join(values[:10])}{' ...' if len(values) > 10 else ''}")
+        return self
+
+
+def chunk_documents(content_dir: Path, chunk_tokens: int = CHUNK_TOKENS,
+                    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                    tenant_from_path: bool = TENANT_FROM_PATH,
+                    samples: int = SMOKE_TEST_SAMPLES) -> ChunkSource:
+    """
+    Split markdown files into structure-aware chunks (see markdown_chunker.py), one file at a time
+
+    Returns a ChunkSource: chunk text is streamed through the embedding and
+    upload stages, never collected for the whole corpus.
+    """
+    print(f"✂️  Chunking markdown files from {content_dir} (tokens={chunk_tokens}, overlap={overlap_tokens})")
+    return ChunkSource(content_dir, chunk_tokens, overlap_tokens, tenant_from_path, samples).scan()
+
+
+def generate_embedding(text: str, throttle: Optional[AdaptiveThrottle] = None,
+                       max_retries: int = 8) -> List[float]:
+    """Generate embedding with the configured provider (retries with backoff on throttling)"""
+    attempt = 0
+    while True:
+        if throttle:
+            throttle.wait()
 
-        # Read file
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            embedding = embedding_provider.embed(text)
+            if throttle:
+                throttle.on_success()
+            return embedding
 
-            # Skip empty files
-            if not content.strip():
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code in THROTTLING_ERROR_CODES and attempt < max_retries:
+                if throttle:
+                    throttle.on_throttle()
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(30.0, 0.5 * (2 ** attempt))))
+                attempt += 1
                 continue
+            print(f"  ✗ Error generating embedding: {e}")
+            raise
 
-            # Store relative path for debugging
-            rel_path = md_file.relative_to(content_dir)
+        except Exception as e:
+            print(f"  ✗ Error generating embedding: {e}")
+            raise
 
-            documents.append({
-                'path': str(rel_path),
-                'content': content
-            })
-            print(f"  ✓ {rel_path} ({len(content)} chars)")
 
-        except Exception as e:
-            print(f"  ✗ Error reading {md_file}: {e}")
-            continue
+def iter_chunk_embeddings(items: Iterable[Tuple[int, Dict]], workers: int = EMBED_WORKERS,
+                          throttle: Optional[AdaptiveThrottle] = None,
+                          cached: Optional[Callable[[Dict], Optional[List[float]]]] = None) -> Iterator[tuple]:
+    """
+    Embed (position, chunk) pairs with a bounded thread pool
 
-    print(f"✅ Loaded {len(documents)} documents")
-    return documents
+    Yields (position, chunk, embedding) in completion order. Chunks are pulled
+    from ``items`` only as slots free up and at most ``workers * 2`` requests
+    are in flight, so finished vectors can be uploaded while the rest are
+    still being embedded and a streamed corpus is never read far ahead.
+    ``cached(chunk)`` may supply an embedding (e.g. from the checkpoint)
+    instead of a request.
+    """
+    items = iter(items)
+    max_in_flight = max(1, workers * 2)
 
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        exhausted = False
 
-def chunk_documents(documents: List[Dict], chunk_size: int = 500, overlap: int = 50) -> List[Dict]:
-    """Split documents into chunks for better retrieval"""
-    print(f"✂️  Chunking documents (size={chunk_size}, overlap={overlap})")
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                embedding = cached(item[1]) if cached else None
+                if embedding is not None:
+                    yield item[0], item[1], embedding
+                    continue
+                in_flight[executor.submit(generate_embedding, embedding_text(item[1]), throttle)] = item
 
-    chunks = []
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                position, chunk = in_flight.pop(future)
+                yield position, chunk, future.result()
 
-    for doc in documents:
-        content = doc['content']
 
-        # Simple chunking by characters
-        start = 0
-        chunk_idx = 0
-        while start < len(content):
-            end = start + chunk_size
-            chunk_text = content[start:end]
+def assign_chunk_keys(chunks: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Give every chunk a stable, content-derived vector key and a fingerprint
 
-            if chunk_text.strip():
-                chunks.append({
-                    'source': doc['path'],
-                    'text': chunk_text,
-                    'chunk_index': chunk_idx,
-                    'start': start,
-                    'end': end
-                })
-                chunk_idx += 1
+    The key depends only on the source path and the chunk text (plus an
+    occurrence counter for repeated text within one file), so it does not
+    shift when files earlier in the walk change. The fingerprint also covers
+    the stored metadata, so moved chunks get their offsets refreshed.
+    Chunks arrive file by file, so the occurrence counters are per file.
+    """
+    seen = {}
+    current_source = None
+    for chunk in chunks:
+        if chunk['source'] != current_source:
+            current_source = chunk['source']
+            seen = {}
+        digest = hashlib.sha256(f"{chunk['source']}\n{chunk['text']}".encode('utf-8')).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
 
-            start += (chunk_size - overlap)
+        key = f"c_{digest[:32]}" if occurrence == 0 else f"c_{digest[:32]}_{occurrence}"
+        fingerprint_fields = [embedding_provider.model_id, chunk['text'], chunk['source'],
+                              chunk['section'], chunk['chunk_index'], chunk['start'], chunk['end']]
+        attributes = chunk_attributes(chunk)
+        if attributes:
+            fingerprint_fields.append(attributes)
+        fingerprint_source = json.dumps(fingerprint_fields, sort_keys=True)
+        chunk['key'] = key
+        chunk['fingerprint'] = hashlib.sha256(fingerprint_source.encode('utf-8')).hexdigest()[:32]
+        yield chunk
 
-    print(f"✅ Created {len(chunks)} chunks")
-    return chunks
 
+def chunk_attributes(chunk: Dict) -> Dict:
+    """Document attributes of a chunk (tenant, language, doc_type) that are set"""
+    return {field: chunk[field] for field in ATTRIBUTE_FIELDS if chunk.get(field)}
 
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding using Bedrock Titan"""
-    try:
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_EMBED_MODEL,
-            contentType='application/json',
-            accept='application/json',
-            body=json.dumps({
-                'inputText': text
-            })
-        )
 
-        response_body = json.loads(response['body'].read())
-        return response_body['embedding']
+def chunk_metadata(chunk: Dict) -> Dict:
+    """
+    Metadata stored with a chunk (vector index and BM25 artifact)
+
+    source, source_prefixes and the document attributes are filterable;
+    source_prefixes lists the source's directories ("help", "help/returns")
+    so a source prefix filter is an exact match.
+    """
+    metadata = {
+        'text': chunk['text'][:1000],  # Limit metadata size
+        'source': chunk['source'],
+        'section': chunk['section'],
+        'chunk_index': str(chunk['chunk_index']),
+        'start': str(chunk['start']),
+        'end': str(chunk['end'])
+    }
+    prefixes = source_prefixes(chunk['source'])
+    if prefixes:
+        metadata['source_prefixes'] = prefixes
+    metadata.update(chunk_attributes(chunk))
+    return metadata
+
 
+def build_vector(key: str, chunk: Dict, embedding: List[float]) -> Dict:
+    """Build a put_vectors entry for a chunk"""
+    return {
+        'key': key,
+        'data': {'float32': embedding},
+        'metadata': chunk_metadata(chunk)
+    }
+
+
+def write_bm25_index(chunks: Iterable[Dict], path: Path):
+    """Write the BM25 keyword index artifact (RETRIEVAL_MODE=hybrid) for all chunks"""
+    print(f"🔤 Building BM25 keyword index: {path}")
+    docs = []
+
+    def texts() -> Iterator[str]:
+        # One pass: each chunk is tokenized as its document entry is recorded
+        for chunk in chunks:
+            docs.append({'key': chunk['key'], 'metadata': chunk_metadata(chunk)})
+            yield embedding_text(chunk)
+
+    index = BM25Index.build(docs, texts())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index.save(str(path))
+    print(f"✅ BM25 index written: {len(docs)} documents, {len(index.postings)} terms, "
+          f"{path.stat().st_size / 1024:.0f} KiB")
+
+
+def load_manifest(manifest_path: Path) -> Optional[Dict]:
+    """Load the build manifest (vector key -> chunk fingerprint), if any"""
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
     except Exception as e:
-        print(f"  ✗ Error generating embedding: {e}")
+        print(f"  ⚠️  Ignoring unreadable manifest {manifest_path}: {e}")
+        return None
+
+
+def save_manifest(manifest_path: Path, fingerprints: Dict[str, str], dimension: int):
+    """Persist the manifest describing what is currently in the index"""
+    manifest = {
+        'vector_bucket': VECTOR_BUCKET,
+        'index_name': VECTOR_INDEX,
+        'embed_model': embedding_provider.model_id,
+        'dimension': dimension,
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'chunks': dict(fingerprints)
+    }
+    tmp_path = manifest_path.with_suffix(manifest_path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    print(f"  ✓ Wrote manifest: {manifest_path} ({len(manifest['chunks'])} chunks)")
+
+
+def manifest_matches_index(manifest: Optional[Dict]) -> bool:
+    """Check that a manifest describes the configured index and embedding model"""
+    if not manifest:
+        return False
+    return (manifest.get('vector_bucket') == VECTOR_BUCKET
+            and manifest.get('index_name') == VECTOR_INDEX
+            and manifest.get('embed_model') == embedding_provider.model_id)
+
+
+def ensure_vector_bucket():
+    """Check if vector bucket exists, create if not"""
+    try:
+        s3vectors_client.get_vector_bucket(vectorBucketName=VECTOR_BUCKET)
+        print(f"  ✓ Vector bucket exists: {VECTOR_BUCKET}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NotFoundException':
+            print(f"  Creating vector bucket: {VECTOR_BUCKET}")
+            s3vectors_client.create_vector_bucket(vectorBucketName=VECTOR_BUCKET)
+            print(f"  ✓ Created vector bucket")
+        else:
+            raise
+
+
+def index_exists() -> bool:
+    """Check whether the configured S3 Vectors index exists"""
+    try:
+        s3vectors_client.get_index(vectorBucketName=VECTOR_BUCKET, indexName=VECTOR_INDEX)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NotFoundException':
+            return False
         raise
 
 
-def create_s3_vectors_index(chunks: List[Dict]):
-    """Create S3 Vectors index and upload vectors"""
+def chunk_embedding_key(chunk: Dict) -> str:
+    """Checkpoint key of a chunk's embedding (embedding model + embedded text)"""
+    return embedding_key(embedding_provider.model_id, embedding_text(chunk))
+
+
+def first_embedding(chunks: ChunkSource, throttle: AdaptiveThrottle,
+                    checkpoint: Optional[BuildCheckpoint] = None) -> List[float]:
+    """Embedding of the first chunk (determines the dimension) - from the checkpoint if it has it"""
+    if checkpoint is not None:
+        cached = checkpoint.get_embedding(chunk_embedding_key(chunks.first)) if checkpoint.dimension else None
+        if cached is not None:
+            return cached
+    return generate_embedding(embedding_text(chunks.first), throttle)
+
+
+def embed_and_upload(chunks: Iterable[Dict], total: int, workers: int, batch_size: int,
+                     throttle: AdaptiveThrottle,
+                     precomputed: Optional[Dict[str, List[float]]] = None,
+                     local_writer: Optional[LocalIndexWriter] = None,
+                     upload: bool = True,
+                     checkpoint: Optional[BuildCheckpoint] = None) -> int:
+    """
+    Embed streamed chunks concurrently and upload them in batches as soon as they fill up
+
+    ``total`` is the number of chunks the stream yields (progress only);
+    ``precomputed`` maps chunk keys to embeddings that are already known. With
+    a local_writer every vector is also written to the local index (row =
+    position in the stream); upload=False skips S3 Vectors entirely (local
+    export only).
+
+    With a checkpoint, embeddings are appended to it as they arrive and reused
+    instead of recomputed, and chunks whose vector was uploaded by an earlier
+    (interrupted) run of the same build are skipped. A batch is recorded as
+    uploaded only after put_vectors succeeded.
+    """
+    precomputed = precomputed or {}
+    # Nothing to do at all for vectors an interrupted run already uploaded
+    skip_uploaded = checkpoint is not None and upload and not local_writer
+    already_uploaded = 0
+    reused = 0
+
+    def pending() -> Iterator[Tuple[int, Dict]]:
+        nonlocal already_uploaded
+        for position, chunk in enumerate(chunks):
+            if skip_uploaded and checkpoint.is_uploaded(chunk['key'], chunk['fingerprint']):
+                already_uploaded += 1
+                continue
+            yield position, chunk
+
+    def cached_embedding(chunk: Dict) -> Optional[List[float]]:
+        nonlocal reused
+        embedding = precomputed.get(chunk['key'])
+        if embedding is None and checkpoint is not None:
+            embedding = checkpoint.get_embedding(chunk_embedding_key(chunk))
+            reused += embedding is not None
+        return embedding
+
+    print(f"🤖 Generating embeddings for {total} chunks ({workers} workers)...")
+    start_time = time.perf_counter()
+    batch = []
+    batch_pairs = []
+    embedded = 0
+    uploaded = 0
+    skipped = 0
+    batch_number = 0
+
+    def flush_batch():
+        nonlocal batch, batch_pairs, batch_number, uploaded
+        batch_number += 1
+        uploaded += upload_vector_batch(batch, batch_number)
+        if checkpoint is not None:
+            checkpoint.mark_uploaded(batch_pairs)
+        batch, batch_pairs = [], []
+
+    try:
+        for i, chunk, embedding in iter_chunk_embeddings(pending(), workers, throttle, cached_embedding):
+            vector = build_vector(chunk['key'], chunk, embedding)
+            embedded += 1
+
+            if checkpoint is not None:
+                checkpoint.add_embedding(chunk_embedding_key(chunk), embedding)
+                if checkpoint.unsynced >= CHECKPOINT_EVERY:
+                    checkpoint.commit()
+            if local_writer:
+                local_writer.write(i, vector['key'], embedding, vector['metadata'])
+
+            # Progress indicator (also for local-only exports)
+            if embedded % 100 == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"  ✓ Generated {embedded}/{total} embeddings "
+                      f"({embedded / elapsed:.1f} vectors/sec, throttled {throttle.throttle_count}x)")
+
+            if not upload:
+                continue
+            if checkpoint is not None and checkpoint.is_uploaded(chunk['key'], chunk['fingerprint']):
+                skipped += 1
+                continue
+            batch.append(vector)
+            batch_pairs.append((chunk['key'], chunk['fingerprint']))
+
+            if len(batch) >= batch_size:
+                flush_batch()
+
+        if batch:
+            flush_batch()
+    finally:
+        # Whatever was embedded before a failure survives for the next run
+        if checkpoint is not None:
+            checkpoint.commit()
+
+    if already_uploaded:
+        print(f"  ♻️  Skipped {already_uploaded} chunks already uploaded by the interrupted run")
+    if reused:
+        print(f"  ♻️  Reused {reused} checkpointed embeddings")
+    if skipped:
+        print(f"  ♻️  Skipped {skipped} vectors already uploaded by the interrupted run")
+    elapsed = time.perf_counter() - start_time
+    print(f"⏱️  Embedded {embedded} and uploaded {uploaded} vectors in {elapsed:.1f}s "
+          f"({embedded / elapsed if elapsed else 0:.1f} vectors/sec, "
+          f"{throttle.throttle_count} throttling retries)")
+    return uploaded
+
+
+def open_local_writer(export_dir: Path, count: int, dimension: int) -> LocalIndexWriter:
+    """Create the writer for a local (offline) index export of ``count`` vectors"""
+    print(f"💾 Exporting local index to {export_dir} (storage={LOCAL_INDEX_STORAGE})")
+    return LocalIndexWriter(str(export_dir), count, dimension, storage=LOCAL_INDEX_STORAGE,
+                            embed_model=embedding_provider.model_id,
+                            built_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+
+
+def export_local_index(chunks: ChunkSource, export_dir: Path, workers: int = EMBED_WORKERS,
+                       checkpoint: Optional[BuildCheckpoint] = None):
+    """
+    Build only a local index (no S3 Vectors calls), for VECTOR_BACKEND=local
+
+    The checkpoint only serves as embedding cache here; the S3 build state it
+    tracks is left untouched.
+    """
+    print(f"💾 Building local vector index: {export_dir}")
+
+    throttle = AdaptiveThrottle()
+    sample_embedding = first_embedding(chunks, throttle, checkpoint)
+
+    if checkpoint is not None and not checkpoint.ensure_embeddings(embedding_provider.model_id, len(sample_embedding)):
+        print("  ℹ️  Checkpoint holds embeddings of another model - not used for this export")
+        checkpoint = None
+
+    local_writer = open_local_writer(export_dir, len(chunks), len(sample_embedding))
+    embed_and_upload(chunks, len(chunks), workers, BATCH_SIZE, throttle,
+                     precomputed={chunks.first['key']: sample_embedding},
+                     local_writer=local_writer, upload=False, checkpoint=checkpoint)
+    local_writer.close()
+    print(f"✅ Local index written: {len(chunks)} vectors, dimension={len(sample_embedding)}")
+
+
+def create_s3_vectors_index(chunks: ChunkSource, workers: int = EMBED_WORKERS,
+                            batch_size: int = BATCH_SIZE,
+                            manifest_path: Optional[Path] = MANIFEST_PATH,
+                            export_dir: Optional[Path] = None,
+                            checkpoint: Optional[BuildCheckpoint] = None,
+                            resume: bool = True) -> int:
+    """
+    Create S3 Vectors index and upload vectors (optionally also exporting a local index)
+
+    With a checkpoint, a build that was interrupted earlier resumes: the index
+    is kept, vectors of committed batches are not uploaded again and
+    checkpointed embeddings are not recomputed. resume=False starts over.
+
+    Returns:
+        Embedding dimension of the index
+    """
     print(f"🔢 Creating S3 Vectors index: bucket={VECTOR_BUCKET}, index={VECTOR_INDEX}")
 
     try:
-        # Check if vector bucket exists, create if not
-        try:
-            s3vectors_client.get_vector_bucket(vectorBucketName=VECTOR_BUCKET)
-            print(f"  ✓ Vector bucket exists: {VECTOR_BUCKET}")
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NotFoundException':
-                print(f"  Creating vector bucket: {VECTOR_BUCKET}")
-                s3vectors_client.create_vector_bucket(vectorBucketName=VECTOR_BUCKET)
-                print(f"  ✓ Created vector bucket")
+        ensure_vector_bucket()
+        throttle = AdaptiveThrottle()
+        precomputed = None
+
+        resuming = (resume and checkpoint is not None
+                    and checkpoint.can_resume(VECTOR_BUCKET, VECTOR_INDEX, embedding_provider.model_id)
+                    and index_exists())
+        if resuming:
+            dimension = checkpoint.dimension
+            print(f"  ♻️  Resuming interrupted build: {checkpoint.uploaded_count} vectors uploaded, "
+                  f"{len(checkpoint)} embeddings checkpointed")
+            checkpoint.start(VECTOR_BUCKET, VECTOR_INDEX, embedding_provider.model_id, dimension, resume=True)
+        else:
+            # First get dimension from one embedding
+            # (the sample is reused for the first chunk below, not embedded twice)
+            print(f"🤖 Generating sample embedding to determine dimension...")
+            sample_embedding = first_embedding(chunks, throttle, checkpoint)
+            dimension = len(sample_embedding)
+            print(f"  ℹ️  Detected embedding dimension: {dimension}")
+
+            # New run before the index is touched, so a crash below never resumes from a stale upload log
+            if checkpoint is not None:
+                checkpoint.start(VECTOR_BUCKET, VECTOR_INDEX, embedding_provider.model_id, dimension, resume=False)
+                checkpoint.add_embedding(chunk_embedding_key(chunks.first), sample_embedding)
             else:
-                raise
+                precomputed = {chunks.first['key']: sample_embedding}
 
-        # Delete existing index if it exists
-        try:
-            s3vectors_client.delete_index(
+            # Delete existing index if it exists
+            try:
+                s3vectors_client.delete_index(
+                    vectorBucketName=VECTOR_BUCKET,
+                    indexName=VECTOR_INDEX
+                )
+                print(f"  ✓ Deleted existing index")
+            except ClientError as e:
+                if 'NotFound' not in str(e):
+                    print(f"  ℹ️  No existing index to delete")
+
+            # Create index
+            s3vectors_client.create_index(
                 vectorBucketName=VECTOR_BUCKET,
-                indexName=VECTOR_INDEX
+                indexName=VECTOR_INDEX,
+                dimension=dimension,
+                dataType='float32',  # S3 Vectors stores float32 only (compact storage: --local-storage)
+                distanceMetric='cosine',  # Required: cosine, euclidean, or dotProduct
+                metadataConfiguration={'nonFilterableMetadataKeys': NON_FILTERABLE_METADATA}
             )
-            print(f"  ✓ Deleted existing index")
-        except ClientError as e:
-            if 'NotFound' not in str(e):
-                print(f"  ℹ️  No existing index to delete")
+            print(f"  ✓ Created S3 Vectors index")
 
-        # Create new index - first get dimension from one embedding
-        print(f"🤖 Generating sample embedding to determine dimension...")
-        sample_embedding = generate_embedding(chunks[0]['text'])
-        dimension = len(sample_embedding)
-        print(f"  ℹ️  Detected embedding dimension: {dimension}")
+        local_writer = open_local_writer(export_dir, len(chunks), dimension) if export_dir else None
+        embed_and_upload(chunks, len(chunks), workers, batch_size, throttle, precomputed=precomputed,
+                         local_writer=local_writer, checkpoint=checkpoint)
+        if local_writer:
+            local_writer.close()
 
-        # Create index
-        s3vectors_client.create_index(
-            vectorBucketName=VECTOR_BUCKET,
-            indexName=VECTOR_INDEX,
-            dimension=dimension,
-            dataType='float32',  # Required: float32 or float16
-            distanceMetric='cosine'  # Required: cosine, euclidean, or dotProduct
-        )
-        print(f"  ✓ Created S3 Vectors index")
-
-        # Prepare all vectors for batch upload
-        print(f"🤖 Generating embeddings for {len(chunks)} chunks...")
-        vectors = []
-
-        for i, chunk in enumerate(chunks):
-            # Generate embedding
-            embedding = generate_embedding(chunk['text'])
-
-            vectors.append({
-                'key': f"chunk_{i:05d}",
-                'data': {'float32': embedding},
-                'metadata': {
-                    'text': chunk['text'][:1000],  # Limit metadata size
-                    'source': chunk['source'],
-                    'chunk_index': str(chunk['chunk_index']),
-                    'start': str(chunk['start']),
-                    'end': str(chunk['end'])
-                }
-            })
-
-            # Progress indicator
-            if (i + 1) % 10 == 0:
-                print(f"  ✓ Generated {i + 1}/{len(chunks)} embeddings")
-
-        # Upload vectors in batches (S3 Vectors API supports batch upload)
-        print(f"📤 Uploading {len(vectors)} vectors...")
-        BATCH_SIZE = 100
-
-        for i in range(0, len(vectors), BATCH_SIZE):
-            batch = vectors[i:i+BATCH_SIZE]
-            s3vectors_client.put_vectors(
+        if manifest_path:
+            save_manifest(manifest_path, chunks.fingerprints, dimension)
+        if checkpoint is not None:
+            checkpoint.finish()
+
+        print(f"✅ S3 Vectors index created: {len(chunks)} vectors, dimension={dimension}")
+        return dimension
+
+    except Exception as e:
+        print(f"❌ Failed to create S3 Vectors index: {e}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+def update_s3_vectors_index(chunks: ChunkSource, workers: int = EMBED_WORKERS,
+                            batch_size: int = BATCH_SIZE,
+                            manifest_path: Path = MANIFEST_PATH,
+                            checkpoint: Optional[BuildCheckpoint] = None,
+                            resume: bool = True):
+    """
+    Incrementally update the S3 Vectors index from the manifest
+
+    Only new or changed chunks are embedded and uploaded; vectors of chunks
+    that disappeared are deleted. Falls back to a full rebuild when there is
+    no usable manifest or the index does not exist. With a checkpoint an
+    interrupted update resumes like a full build does.
+    """
+    print(f"🔁 Updating S3 Vectors index incrementally: bucket={VECTOR_BUCKET}, index={VECTOR_INDEX}")
+
+    manifest = load_manifest(manifest_path)
+    if not manifest_matches_index(manifest) or not index_exists():
+        print("  ℹ️  No matching manifest or index found - running full build")
+        create_s3_vectors_index(chunks, workers, batch_size, manifest_path,
+                                checkpoint=checkpoint, resume=resume)
+        return
+
+    try:
+        indexed = manifest['chunks']
+        changed = {key for key, fingerprint in chunks.fingerprints.items() if indexed.get(key) != fingerprint}
+        removed = sorted(key for key in indexed if key not in chunks.fingerprints)
+        print(f"  ℹ️  {len(changed)} new/changed, {len(removed)} removed, "
+              f"{len(chunks) - len(changed)} unchanged chunks")
+
+        if checkpoint is not None and not manifest.get('dimension'):
+            checkpoint = None
+        if checkpoint is not None:
+            resuming = resume and checkpoint.can_resume(VECTOR_BUCKET, VECTOR_INDEX, embedding_provider.model_id)
+            checkpoint.start(VECTOR_BUCKET, VECTOR_INDEX, embedding_provider.model_id,
+                             manifest.get('dimension'), resume=resuming)
+
+        if changed:
+            embed_and_upload((chunk for chunk in chunks if chunk['key'] in changed), len(changed),
+                             workers, batch_size, AdaptiveThrottle(), checkpoint=checkpoint)
+
+        for i in range(0, len(removed), batch_size):
+            batch = removed[i:i+batch_size]
+            s3vectors_client.delete_vectors(
                 vectorBucketName=VECTOR_BUCKET,
                 indexName=VECTOR_INDEX,
-                vectors=batch
+                keys=batch
             )
-            print(f"  ✓ Uploaded batch {i//BATCH_SIZE + 1} ({len(batch)} vectors)")
+            print(f"  🗑️  Deleted {len(batch)} stale vectors")
 
-        print(f"✅ S3 Vectors index created: {len(chunks)} vectors, dimension={dimension}")
+        save_manifest(manifest_path, chunks.fingerprints, manifest.get('dimension'))
+        if checkpoint is not None:
+            checkpoint.finish()
+        print(f"✅ S3 Vectors index updated: {len(chunks)} vectors "
+              f"({len(changed)} uploaded, {len(removed)} deleted)")
 
     except Exception as e:
-        print(f"❌ Failed to create S3 Vectors index: {e}")
+        print(f"❌ Failed to update S3 Vectors index: {e}")
         import traceback
         traceback.print_exc()
         raise
 
 
+def upload_vector_batch(batch: List[Dict], batch_number: int) -> int:
+    """Upload one batch of vectors (S3 Vectors API supports batch upload)"""
+    s3vectors_client.put_vectors(
+        vectorBucketName=VECTOR_BUCKET,
+        indexName=VECTOR_INDEX,
+        vectors=batch
+    )
+    print(f"  📤 Uploaded batch {batch_number} ({len(batch)} vectors)")
+    return len(batch)
+
+
+def versioned_index_name(base_index: str, version: str) -> str:
+    return f"{base_index}-{version}"
+
+
+def smoke_test_index(sampled: List[Dict], queries: Optional[List[str]] = None,
+                     checkpoint: Optional[BuildCheckpoint] = None,
+                     min_hit_rate: float = SMOKE_TEST_MIN_HIT_RATE) -> bool:
+    """
+    Validate a freshly built index before it is published
+
+    Queries with the embeddings of the sampled chunks (ChunkSource.samples,
+    spread over the corpus) must return their own chunk in the top 3 (at
+    least ``min_hit_rate`` of them), and every smoke query must return results.
+    """
+    print(f"🧪 Smoke testing index {VECTOR_INDEX}...")
+    hits = 0
+    for chunk in sampled:
+        embedding = checkpoint.get_embedding(chunk_embedding_key(chunk)) if checkpoint is not None else None
+        if embedding is None:
+            embedding = generate_embedding(embedding_text(chunk))
+        response = s3vectors_client.query_vectors(
+            vectorBucketName=VECTOR_BUCKET,
+            indexName=VECTOR_INDEX,
+            queryVector={'float32': embedding},
+            topK=3
+        )
+        if chunk['key'] in {vector['key'] for vector in response.get('vectors', [])}:
+            hits += 1
+    hit_rate = hits / len(sampled) if sampled else 1.0
+    print(f"  {'✓' if hit_rate >= min_hit_rate else '✗'} Self-retrieval: {hits}/{len(sampled)} chunks found")
+    passed = hit_rate >= min_hit_rate
+
+    for query in queries or []:
+        response = s3vectors_client.query_vectors(
+            vectorBucketName=VECTOR_BUCKET,
+            indexName=VECTOR_INDEX,
+            queryVector={'float32': generate_embedding(query)},
+            topK=3,
+            returnMetadata=True
+        )
+        vectors = response.get('vectors', [])
+        top_source = vectors[0].get('metadata', {}).get('source', '') if vectors else ''
+        print(f"  {'✓' if vectors else '✗'} {query[:60]!r}: {len(vectors)} results {top_source}")
+        passed = passed and bool(vectors)
+    return passed
+
+
+def published_versions(record: Optional[Dict]) -> List[str]:
+    """Index names published through the pointer, least recently published first"""
+    if not record:
+        return []
+    # Records written before the history was kept only know the active index
+    return list(record.get('versions') or [record['index_name']])
+
+
+def publish_index(pointer: PointerBackend, version: str, dimension: int):
+    """
+    Point the retriever at the current VECTOR_INDEX (picked up within INDEX_POINTER_TTL)
+
+    The record also lists every published index still kept ('versions'),
+    which is all garbage collection ever deletes from - tenant indexes and
+    unpublished builds next to the versions are never touched.
+    """
+    versions = [name for name in published_versions(pointer.read()) if name != VECTOR_INDEX]
+    record = {
+        'index_name': VECTOR_INDEX,
+        'version': version,
+        'dimension': dimension,
+        'embed_model': embedding_provider.model_id,
+        'published_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'versions': versions + [VECTOR_INDEX]
+    }
+    pointer.write(record)
+    print(f"📌 Published active index: {VECTOR_INDEX} ({pointer.name} pointer)")
+
+
+def garbage_collect_indexes(pointer: PointerBackend, keep: int):
+    """
+    Delete published index versions, keeping the ``keep`` most recently
+    published ones (the active one always stays)
+
+    The previous version is kept by default so a bad release can be rolled
+    back with --activate.
+    """
+    record = pointer.read()
+    versions = published_versions(record)
+    keep_names = set(versions[-keep:]) if keep > 0 else set()
+    keep_names.add(record['index_name'])
+    for name in versions:
+        if name in keep_names:
+            continue
+        try:
+            s3vectors_client.delete_index(vectorBucketName=VECTOR_BUCKET, indexName=name)
+            print(f"  🗑️  Deleted old index version {name}")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NotFoundException':
+                raise
+    pointer.write({**record, 'versions': [name for name in versions if name in keep_names]})
+    print(f"  ℹ️  Keeping {len(keep_names)} index versions")
+
+
+def build_blue_green(chunks: ChunkSource, args, pointer: PointerBackend,
+                     checkpoint: Optional[BuildCheckpoint] = None) -> bool:
+    """
+    Build a new index version next to the live one, validate and publish it
+
+    Queries keep hitting the active index until the pointer is switched;
+    a build that fails its smoke test is not published. An interrupted
+    build resumes the same version (from the checkpoint).
+
+    Returns:
+        True if the new version was published
+    """
+    global VECTOR_INDEX
+    base_index = VECTOR_INDEX
+    version = args.index_version
+    if not version and checkpoint is not None and checkpoint.header.get('state') == 'running' \
+            and checkpoint.header.get('index_name', '').startswith(f"{base_index}-"):
+        version = checkpoint.header['index_name'][len(base_index) + 1:]
+        print(f"♻️  Continuing interrupted build of version {version}")
+    version = version or time.strftime('%Y%m%d%H%M%S', time.gmtime())
+    VECTOR_INDEX = versioned_index_name(base_index, version)
+
+    dimension = create_s3_vectors_index(chunks, workers=args.workers, batch_size=args.batch_size,
+                                        manifest_path=args.manifest, export_dir=args.export_local,
+                                        checkpoint=checkpoint, resume=not args.no_resume)
+    print()
+
+    if not smoke_test_index(chunks.samples, args.smoke_query, checkpoint):
+        print(f"❌ Smoke test failed - {VECTOR_INDEX} was built but NOT published (delete it or --activate it)")
+        return False
+
+    publish_index(pointer, version, dimension)
+    garbage_collect_indexes(pointer, args.keep_versions)
+    return True
+
+
+def activate_index_version(pointer: PointerBackend, version: str) -> bool:
+    """Publish an existing index version (rollback)"""
+    global VECTOR_INDEX
+    VECTOR_INDEX = versioned_index_name(VECTOR_INDEX, version)
+    try:
+        response = s3vectors_client.get_index(vectorBucketName=VECTOR_BUCKET, indexName=VECTOR_INDEX)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NotFoundException':
+            print(f"❌ Index {VECTOR_INDEX} does not exist")
+            return False
+        raise
+    publish_index(pointer, version, response.get('index', {}).get('dimension'))
+    return True
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Build S3 Vectors index from markdown content')
+    parser.add_argument('--workers', type=int, default=EMBED_WORKERS,
+                        help=f'Concurrent embedding requests (default: {EMBED_WORKERS})')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'Vectors per put_vectors call (default: {BATCH_SIZE})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only embed new/changed chunks and delete removed ones (uses the manifest)')
+    parser.add_argument('--manifest', type=Path, default=MANIFEST_PATH,
+                        help=f'Path of the chunk manifest (default: {MANIFEST_PATH})')
+    parser.add_argument('--export-local', type=Path, metavar='DIR',
+                        help='Also write a local NumPy index (VECTOR_BACKEND=local) to DIR')
+    parser.add_argument('--local-storage', choices=STORAGE_TYPES, default=LOCAL_INDEX_STORAGE,
+                        help='Scan format of the --export-local index: float16 / int8 scan a compact copy and '
+                             f'rescore the shortlist in float32 (default: {LOCAL_INDEX_STORAGE})')
+    parser.add_argument('--skip-upload', action='store_true',
+                        help='Only write local artifacts, do not touch S3 Vectors (needs --export-local and/or --bm25-index)')
+    parser.add_argument('--bm25-index', type=Path, metavar='PATH',
+                        help='Also write the BM25 keyword index for hybrid retrieval (e.g. src/kb_bm25.json.gz)')
+    parser.add_argument('--chunk-tokens', type=int, default=CHUNK_TOKENS,
+                        help=f'Target chunk size in estimated tokens (default: {CHUNK_TOKENS})')
+    parser.add_argument('--chunk-overlap', type=int, default=CHUNK_OVERLAP_TOKENS,
+                        help=f'Overlap between chunks of a section in tokens (default: {CHUNK_OVERLAP_TOKENS})')
+    parser.add_argument('--tenant-from-path', action='store_true', default=TENANT_FROM_PATH,
+                        help='Use the top-level directory as tenant of documents without front matter "tenant"')
+    parser.add_argument('--provider', choices=['bedrock', 'hashing'],
+                        help='Embedding provider (default: EMBEDDING_PROVIDER or bedrock)')
+    parser.add_argument('--dimensions', type=int,
+                        help='Embedding dimensions, e.g. 256/512/1024 for Titan v2 (default: EMBEDDING_DIMENSIONS or model default)')
+    parser.add_argument('--blue-green', action='store_true',
+                        help='Build a new <index>-<version> next to the live index, smoke test it, then '
+                             'switch the index pointer (INDEX_POINTER_TYPE / INDEX_POINTER_NAME) and delete old versions')
+    parser.add_argument('--index-version',
+                        help='Version suffix for --blue-green (default: UTC timestamp)')
+    parser.add_argument('--keep-versions', type=int, default=INDEX_KEEP_VERSIONS,
+                        help=f'Index versions kept after a blue/green build, incl. the active one (default: {INDEX_KEEP_VERSIONS})')
+    parser.add_argument('--smoke-samples', type=int, default=SMOKE_TEST_SAMPLES,
+                        help=f'Chunks that must find themselves in the new index (default: {SMOKE_TEST_SAMPLES})')
+    parser.add_argument('--smoke-query', action='append', default=[],
+                        help='Query that must return results in the new index (repeatable)')
+    parser.add_argument('--activate', metavar='VERSION',
+                        help='Only switch the index pointer to an existing version (rollback) and exit')
+    parser.add_argument('--checkpoint-dir', type=Path, default=CHECKPOINT_DIR,
+                        help=f'Directory of the embedding/upload checkpoint (default: {CHECKPOINT_DIR})')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='Do not persist or reuse embeddings (a failed build starts over)')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Start a fresh build even if an interrupted one could be resumed '
+                             '(checkpointed embeddings are still reused)')
+    return parser.parse_args()
+
+
 def main():
     """Main build process"""
+    args = parse_args()
+
+    # Size the HTTP connection pool for the requested concurrency
+    global bedrock_runtime, embedding_provider, VECTOR_INDEX, LOCAL_INDEX_STORAGE
+    LOCAL_INDEX_STORAGE = args.local_storage
+    if args.workers > max(10, EMBED_WORKERS):
+        bedrock_runtime = boto3.client(
+            'bedrock-runtime',
+            region_name=AWS_REGION,
+            config=Config(max_pool_connections=args.workers)
+        )
+    if args.workers > max(10, EMBED_WORKERS) or args.provider or args.dimensions is not None:
+        embedding_provider = create_embedding_provider(bedrock_runtime, args.provider, args.dimensions)
+
     print("=" * 60)
     print("🏗️  Building S3 Vectors Index from Git Repository")
     print("=" * 60)
+    print(f"Embedding model: {embedding_provider.model_id}")
     print()
 
+    # Blue/green index pointer (INDEX_POINTER_TYPE / INDEX_POINTER_NAME)
+    pointer = create_pointer_backend(base_index=VECTOR_INDEX)
+    if (args.blue_green or args.activate) and pointer is None:
+        print("❌ --blue-green / --activate need an index pointer (set INDEX_POINTER_TYPE and INDEX_POINTER_NAME)")
+        sys.exit(1)
+    if args.activate:
+        sys.exit(0 if activate_index_version(pointer, args.activate) else 1)
+
     # Check content directory exists
     if not CONTENT_DIR.exists():
         print(f"❌ Content directory not found: {CONTENT_DIR}")
         print(f"   Current dir: {Path.cwd()}")
         return
 
-    # 1. Load markdown files from Git repo
-    documents = load_markdown_files(CONTENT_DIR)
+    # 1. Chunk markdown files from Git repo (streamed file by file)
+    chunks = chunk_documents(CONTENT_DIR, chunk_tokens=args.chunk_tokens, overlap_tokens=args.chunk_overlap,
+                             tenant_from_path=args.tenant_from_path, samples=args.smoke_samples)
 
-    if not documents:
+    if not chunks:
         print("❌ No documents found!")
         return
 
     print()
 
-    # 2. Chunk documents
-    chunks = chunk_documents(documents, chunk_size=500, overlap=50)
-    print()
+    # 2. Keyword index for hybrid retrieval (cheap - always rebuilt in full)
+    if args.bm25_index:
+        write_bm25_index(chunks, args.bm25_index)
+        print()
 
-    # 3. Create S3 Vectors index
-    create_s3_vectors_index(chunks)
+    # 3. Create (or incrementally update) S3 Vectors index
+    if args.skip_upload and not args.export_local and not args.bm25_index:
+        print("❌ --skip-upload requires --export-local DIR and/or --bm25-index PATH")
+        return
+
+    checkpoint = None if args.no_checkpoint else BuildCheckpoint(args.checkpoint_dir)
+    try:
+        if args.skip_upload:
+            if args.export_local:
+                export_local_index(chunks, args.export_local, workers=args.workers, checkpoint=checkpoint)
+        elif args.incremental:
+            if args.export_local:
+                print("ℹ️  --export-local needs every embedding - ignored for --incremental builds")
+            # Upserts and deletes are safe on the live index - update whatever is active
+            active = pointer.read() if pointer is not None else None
+            if active and active.get('index_name'):
+                VECTOR_INDEX = active['index_name']
+                print(f"ℹ️  Updating active index {VECTOR_INDEX}")
+            update_s3_vectors_index(chunks, workers=args.workers, batch_size=args.batch_size,
+                                    manifest_path=args.manifest, checkpoint=checkpoint,
+                                    resume=not args.no_resume)
+        elif args.blue_green:
+            if not build_blue_green(chunks, args, pointer, checkpoint):
+                sys.exit(1)
+        else:
+            create_s3_vectors_index(chunks, workers=args.workers, batch_size=args.batch_size,
+                                    manifest_path=args.manifest, export_dir=args.export_local,
+                                    checkpoint=checkpoint, resume=not args.no_resume)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
     print()
 
     print("=" * 60)
@@ -0,0 +1,104 @@
+"""
+Local development server for the chatbot Lambda handler
+Serves POST /v1/chat/completions and streams SSE frames as tokens arrive
+(API Gateway REST buffers Lambda responses, so this is the place to see
+real time-to-first-token locally)
+
+Usage:
+    MODEL_ID=anthropic.claude-3-5-sonnet-20241022-v2:0 python3 local_server.py --port 8080
+"""
+
+import argparse
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Lambda sources live in src/
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from lambda_function import (  # noqa: E402
+    lambda_handler,
+    stream_chat_completion,
+    validate_chat_request,
+)
+from retrieval_filters import apply_request_tenant  # noqa: E402
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """HTTP handler forwarding OpenAI-format requests to the Lambda code"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'code': 404}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        raw_body = self.rfile.read(length).decode('utf-8') if length else '{}'
+
+        try:
+            body = json.loads(raw_body)
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON body', 'code': 400}})
+            return
+
+        headers = dict(self.headers.items())
+        if body.get('stream') and not apply_request_tenant(body, {'headers': headers}) \
+                and not validate_chat_request(body):
+            self._stream(body)
+            return
+
+        # Non-streaming (and validation errors): reuse the Lambda handler as-is
+        result = lambda_handler({'body': raw_body, 'headers': headers}, None)
+        self.send_response(result['statusCode'])
+        for name, value in result.get('headers', {}).items():
+            self.send_header(name, value)
+        payload = result['body'].encode('utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for frame in stream_chat_completion(body):
+            data = frame.encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the chatbot handler locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), ChatCompletionsHandler)
+    print(f"🚀 Serving http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
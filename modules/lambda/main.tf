@@ -65,6 +65,7 @@ resource "aws_iam_role_policy" "bedrock_access" {
         Action = [
           "bedrock:InvokeModel",
           "bedrock:InvokeModelWithResponseStream",
+          "bedrock:Rerank",
           "bedrock:Retrieve",
           "bedrock-agent-runtime:Retrieve",
           "bedrock-agent-runtime:RetrieveAndGenerate"
@@ -88,10 +89,12 @@ resource "aws_iam_role_policy" "dynamodb_access" {
         Effect = "Allow"
         Action = [
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:GetItem",
           "dynamodb:UpdateItem",
           "dynamodb:Query",
-          "dynamodb:Scan"
+          "dynamodb:Scan",
+          "dynamodb:DescribeTable"
         ]
         Resource = var.dynamodb_table_arns
       }
@@ -122,6 +125,24 @@ resource "aws_iam_role_policy" "s3_vectors_access" {
   })
 }
 
+# SSM Access Policy (blue/green index pointer)
+resource "aws_iam_role_policy" "index_pointer_access" {
+  count = !var.use_container_image && var.index_pointer_type == "ssm" ? 1 : 0
+  name  = "${var.project_name}-index-pointer-access"
+  role  = aws_iam_role.lambda_role[0].id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter"]
+        Resource = "arn:aws:ssm:*:*:parameter/${trimprefix(var.index_pointer_name, "/")}"
+      }
+    ]
+  })
+}
+
 # CloudWatch Log Group
 resource "aws_cloudwatch_log_group" "lambda_logs" {
   count             = var.use_container_image ? 0 : 1
@@ -139,7 +160,7 @@ resource "aws_lambda_function" "chatbot_handler" {
   filename         = data.archive_file.lambda_zip[0].output_path
   function_name    = "${var.project_name}-handler"
   role             = aws_iam_role.lambda_role[0].arn
-  handler          = "lambda_function.lambda_handler"
+  handler          = var.handler
   source_code_hash = data.archive_file.lambda_zip[0].output_base64sha256
   runtime          = "python3.12"
   timeout          = var.timeout
@@ -153,10 +174,60 @@ resource "aws_lambda_function" "chatbot_handler" {
       ANALYTICS_TABLE = var.analytics_table_name
       LOG_LEVEL       = var.log_level
       # S3 Vectors Configuration
-      S3_VECTORS_BUCKET   = var.s3_vectors_bucket_name
-      S3_VECTORS_INDEX    = var.s3_vectors_index_name
-      BEDROCK_EMBED_MODEL = var.bedrock_embed_model
-      KB_VERSION          = var.kb_version
+      S3_VECTORS_BUCKET     = var.s3_vectors_bucket_name
+      S3_VECTORS_INDEX      = var.s3_vectors_index_name
+      BEDROCK_EMBED_MODEL   = var.bedrock_embed_model
+      EMBEDDING_PROVIDER    = var.embedding_provider
+      EMBEDDING_DIMENSIONS  = tostring(var.embedding_dimensions)
+      KB_VERSION            = var.kb_version
+      VECTOR_BACKEND        = var.vector_backend
+      LOCAL_INDEX_DIR       = var.local_index_dir
+      LOCAL_INDEX_STORAGE   = var.local_index_storage
+      LOCAL_RESCORE_FACTOR  = tostring(var.local_rescore_factor)
+      RETRIEVAL_MODE        = var.retrieval_mode
+      BM25_INDEX_PATH       = var.bm25_index_path
+      MULTI_QUERY_RETRIEVAL = tostring(var.multi_query_retrieval)
+      MAX_SUB_QUERIES       = tostring(var.max_sub_queries)
+      # Blue/green index pointer (active index version, cached for INDEX_POINTER_TTL)
+      INDEX_POINTER_TYPE = var.index_pointer_type
+      INDEX_POINTER_NAME = var.index_pointer_name
+      INDEX_POINTER_TTL  = tostring(var.index_pointer_ttl)
+      # Retrieval filters / multi-tenant routing
+      TENANT_INDEXES = jsonencode(var.tenant_indexes)
+      TENANT_HEADER  = var.tenant_header
+      REQUIRE_TENANT = tostring(var.require_tenant)
+      # Re-ranking (over-fetch, one batched rerank call, time budget)
+      RERANK_MODE       = var.rerank_mode
+      RERANK_MODEL_ID   = var.rerank_model_id
+      RERANK_CANDIDATES = tostring(var.rerank_candidates)
+      RERANK_TOP_N      = tostring(var.rerank_top_n)
+      RERANK_TIMEOUT_MS = tostring(var.rerank_timeout_ms)
+      # Server-side sessions (opt-in per request via session_id)
+      SESSIONS_ENABLED         = tostring(var.sessions_enabled)
+      SESSION_HISTORY_MESSAGES = tostring(var.session_history_messages)
+      SESSION_SUMMARY_MODEL_ID = var.session_summary_model_id
+      SESSION_TTL_DAYS         = tostring(var.session_ttl_days)
+      # Query embedding cache
+      EMBEDDING_CACHE_TABLE = var.embedding_cache_table_name
+      EMBEDDING_CACHE_SIZE  = tostring(var.embedding_cache_size)
+      EMBEDDING_CACHE_TTL   = tostring(var.embedding_cache_ttl)
+      # Semantic response cache
+      RESPONSE_CACHE_ENABLED   = tostring(var.response_cache_enabled)
+      RESPONSE_CACHE_THRESHOLD = tostring(var.response_cache_threshold)
+      RESPONSE_CACHE_SIZE      = tostring(var.response_cache_size)
+      RESPONSE_CACHE_TTL       = tostring(var.response_cache_ttl)
+      RESPONSE_CACHE_TABLE     = var.response_cache_table_name
+      # Buffered analytics writes
+      ANALYTICS_MAX_BUFFERED = tostring(var.analytics_max_buffered)
+      # Context assembly and prompt size limit (history + retrieved context)
+      CONTEXT_MAX_DISTANCE  = tostring(var.context_max_distance)
+      CONTEXT_MAX_DOCUMENTS = tostring(var.context_max_documents)
+      PROMPT_TOKEN_BUDGET   = tostring(var.prompt_token_budget)
+      # Warmup (EventBridge schedule / provisioned concurrency init)
+      WARMUP_QUERIES = jsonencode(var.warmup_queries)
+      # Per-stage latency metrics (EMF log lines)
+      METRICS_MODE      = var.metrics_mode
+      METRICS_NAMESPACE = var.metrics_namespace
       # AWS_REGION is automatically set by Lambda runtime - don't override
     }
   }
@@ -180,3 +251,27 @@ resource "aws_lambda_permission" "api_gateway" {
   principal     = "apigateway.amazonaws.com"
   source_arn    = "${var.api_gateway_arn}/*/*"
 }
+
+# Scheduled warmup (optional): keeps connections and caches of idle instances warm
+resource "aws_cloudwatch_event_rule" "warmup" {
+  count               = !var.use_container_image && var.warmup_schedule != "" ? 1 : 0
+  name                = "${var.project_name}-warmup"
+  description         = "Warmup invocations for ${var.project_name}-handler"
+  schedule_expression = var.warmup_schedule
+}
+
+resource "aws_cloudwatch_event_target" "warmup" {
+  count = !var.use_container_image && var.warmup_schedule != "" ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.warmup[0].name
+  arn   = aws_lambda_function.chatbot_handler[0].arn
+  input = jsonencode({ warmup = true })
+}
+
+resource "aws_lambda_permission" "warmup" {
+  count         = !var.use_container_image && var.warmup_schedule != "" ? 1 : 0
+  statement_id  = "AllowEventBridgeWarmup"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.chatbot_handler[0].function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.warmup[0].arn
+}
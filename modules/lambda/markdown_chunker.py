@@ -0,0 +1,339 @@
+"""
+Structure-aware markdown chunker for the index builder
+Streams files line by line and cuts chunks at headings, paragraphs and code fences
+
+Chunks are sized in (estimated) tokens, split at word boundaries or better, keep tables and
+code fences together where they fit, and carry their heading breadcrumb
+("Guide > Setup > Docker") so retrieval and the prompt know where they came from.
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Iterable, Iterator, Optional, Tuple
+
+from token_budget import estimate_tokens, CHARS_PER_TOKEN
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+FENCE_RE = re.compile(r'^\s{0,3}(`{3,}|~{3,})')
+SETEXT_RE = re.compile(r'^\s{0,3}(=+|-+)\s*$')
+
+# Finer and finer split points for blocks larger than a chunk: lines, sentences, words
+SPLIT_PATTERNS = [re.compile(r'\n'), re.compile(r'(?<=[.!?:;])\s+'), re.compile(r'\s+')]
+
+# Boundaries overlap may start at (line or sentence starts)
+OVERLAP_BOUNDARY_RE = re.compile(r'\n|(?<=[.!?:;])\s+')
+
+BREADCRUMB_SEPARATOR = ' > '
+
+# Filterable document attributes (retrieval filters) and their front matter spellings
+FRONT_MATTER_FIELDS = {
+    'tenant': 'tenant',
+    'language': 'language',
+    'lang': 'language',
+    'doc_type': 'doc_type',
+    'type': 'doc_type',
+}
+FRONT_MATTER_RE = re.compile(r'^([A-Za-z_][\w-]*)\s*:\s*(.*?)\s*$')
+LANGUAGE_RE = re.compile(r'^[a-z]{2}(?:[-_][A-Za-z]{2})?$')
+
+
+def iter_markdown_files(content_dir: Path) -> Iterator[Path]:
+    """Yield markdown files below content_dir in a stable order (files starting with '_' are skipped)"""
+    for md_file in sorted(content_dir.rglob('*.md')):
+        if not md_file.name.startswith('_'):
+            yield md_file
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Group markdown lines into blocks: 'heading', 'code' (whole fence) and
+    'paragraph' (consecutive non-blank lines - paragraphs, lists, tables)
+
+    Each block has 'kind', 'text', and 'start'/'end' character offsets;
+    headings also have 'level' and 'title'. YAML front matter is skipped.
+    """
+    offset = 0
+    buffer, buffer_start = [], 0
+    fence = None
+    first_line = True
+    in_front_matter = False
+
+    def paragraph() -> Optional[Dict]:
+        text = ''.join(buffer).rstrip('\n')
+        if not text.strip():
+            return None
+        return {'kind': 'paragraph', 'text': text, 'start': buffer_start, 'end': buffer_start + len(text)}
+
+    for line in lines:
+        start = offset
+        offset += len(line)
+        stripped = line.strip()
+
+        if first_line:
+            first_line = False
+            if stripped == '---':
+                in_front_matter = True
+                continue
+        if in_front_matter:
+            if stripped in ('---', '...'):
+                in_front_matter = False
+            continue
+
+        if fence:
+            buffer.append(line)
+            if stripped.startswith(fence) and set(stripped) == {fence[0]}:
+                text = ''.join(buffer).rstrip('\n')
+                yield {'kind': 'code', 'text': text, 'start': buffer_start, 'end': buffer_start + len(text)}
+                buffer, fence = [], None
+            continue
+
+        fence_match = FENCE_RE.match(line)
+        heading_match = HEADING_RE.match(line)
+        setext_match = SETEXT_RE.match(line)
+
+        if fence_match:
+            block = paragraph()
+            if block:
+                yield block
+            buffer, buffer_start, fence = [line], start, fence_match.group(1)
+        elif heading_match:
+            block = paragraph()
+            if block:
+                yield block
+            buffer = []
+            yield {'kind': 'heading', 'text': stripped, 'start': start, 'end': start + len(line.rstrip('\n')),
+                   'level': len(heading_match.group(1)), 'title': heading_match.group(2).strip()}
+        elif setext_match and len(buffer) == 1:
+            # "Title\n=====" (level 1) / "Title\n-----" (level 2)
+            title = buffer[0].strip()
+            yield {'kind': 'heading', 'text': f"{title}\n{stripped}", 'start': buffer_start,
+                   'end': start + len(line.rstrip('\n')),
+                   'level': 1 if stripped.startswith('=') else 2, 'title': title}
+            buffer = []
+        elif not stripped:
+            block = paragraph()
+            if block:
+                yield block
+            buffer = []
+        else:
+            if not buffer:
+                buffer_start = start
+            buffer.append(line)
+
+    # Unterminated code fence or trailing paragraph
+    if buffer:
+        text = ''.join(buffer).rstrip('\n')
+        if text.strip():
+            yield {'kind': 'code' if fence else 'paragraph', 'text': text,
+                   'start': buffer_start, 'end': buffer_start + len(text)}
+
+
+def split_text(text: str, start: int, max_tokens: int, level: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Split text into (start, end) spans of at most max_tokens, cutting at
+    line, then sentence, then word boundaries (characters only as a last resort)
+    """
+    if estimate_tokens(text) <= max_tokens:
+        yield start, start + len(text)
+        return
+
+    if level >= len(SPLIT_PATTERNS):
+        size = max(1, int(max_tokens * CHARS_PER_TOKEN))
+        for i in range(0, len(text), size):
+            yield start + i, start + min(i + size, len(text))
+        return
+
+    segments, position = [], 0
+    for match in SPLIT_PATTERNS[level].finditer(text):
+        if match.start() > position:
+            segments.append((position, match.start()))
+        position = match.end()
+    if position < len(text):
+        segments.append((position, len(text)))
+
+    group_start = group_end = None
+    for segment_start, segment_end in segments:
+        if group_start is not None and estimate_tokens(text[group_start:segment_end]) <= max_tokens:
+            group_end = segment_end
+            continue
+        if group_start is not None:
+            yield from split_text(text[group_start:group_end], start + group_start, max_tokens, level + 1)
+        group_start, group_end = segment_start, segment_end
+    if group_start is not None:
+        yield from split_text(text[group_start:group_end], start + group_start, max_tokens, level + 1)
+
+
+def _piece(block: Dict, start: int, end: int) -> Dict:
+    text = block['text'][start - block['start']:end - block['start']]
+    return {'block': block, 'start': start, 'end': end, 'tokens': estimate_tokens(text)}
+
+
+def _render(pieces: List[Dict]) -> str:
+    """Join pieces; consecutive pieces of one block are taken verbatim from the block"""
+    parts = []
+    i = 0
+    while i < len(pieces):
+        block = pieces[i]['block']
+        j = i
+        while j + 1 < len(pieces) and pieces[j + 1]['block'] is block:
+            j += 1
+        parts.append(block['text'][pieces[i]['start'] - block['start']:pieces[j]['end'] - block['start']].strip())
+        i = j + 1
+    return '\n\n'.join(part for part in parts if part)
+
+
+def _overlap_tail(pieces: List[Dict], overlap_tokens: int) -> List[Dict]:
+    """Trailing whole sentences/lines of a finished chunk, up to overlap_tokens"""
+    tail, budget = [], overlap_tokens
+    for piece in reversed(pieces):
+        if piece['block']['kind'] == 'heading' or budget <= 0:
+            break
+        if piece['tokens'] <= budget:
+            tail.insert(0, piece)
+            budget -= piece['tokens']
+            continue
+        # Take the last lines/sentences of the piece that still fit
+        block = piece['block']
+        text = block['text'][piece['start'] - block['start']:piece['end'] - block['start']]
+        fitting = []
+        for match in reversed(list(OVERLAP_BOUNDARY_RE.finditer(text))):
+            candidate = _piece(block, piece['start'] + match.end(), piece['end'])
+            if candidate['tokens'] > budget:
+                break
+            fitting = [candidate]
+        tail = fitting + tail
+        break
+    return tail
+
+
+def chunk_markdown(source: str, lines: Iterable[str], chunk_tokens: int = 200,
+                   overlap_tokens: int = 30) -> Iterator[Dict]:
+    """
+    Chunk one markdown document (streamed line by line)
+
+    A heading always starts a new chunk; blocks are packed until the next one
+    would exceed ``chunk_tokens``; blocks larger than a chunk are split at
+    line/sentence/word boundaries. Overlap (whole sentences, up to
+    ``overlap_tokens``) is only carried within a section.
+
+    Yields:
+        {'source', 'text', 'section', 'chunk_index', 'start', 'end'}
+    """
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+    headings = []  # (level, title) of the enclosing sections
+    pieces, tokens, fresh = [], 0, False
+    chunk_index = 0
+
+    def make_chunk() -> Dict:
+        return {
+            'source': source,
+            'text': _render(pieces),
+            'section': BREADCRUMB_SEPARATOR.join(title for _, title in headings),
+            'chunk_index': chunk_index,
+            'start': pieces[0]['start'],
+            'end': pieces[-1]['end']
+        }
+
+    for block in iter_blocks(lines):
+        if block['kind'] == 'heading':
+            if fresh:
+                yield make_chunk()
+                chunk_index += 1
+            while headings and headings[-1][0] >= block['level']:
+                headings.pop()
+            headings.append((block['level'], block['title']))
+            piece = _piece(block, block['start'], block['end'])
+            pieces, tokens, fresh = [piece], piece['tokens'], False
+            continue
+
+        # Leave room for the overlap carried into the next chunk
+        max_piece_tokens = max(1, chunk_tokens - overlap_tokens)
+        for span_start, span_end in split_text(block['text'], block['start'], max_piece_tokens):
+            piece = _piece(block, span_start, span_end)
+            if fresh and tokens + piece['tokens'] > chunk_tokens:
+                yield make_chunk()
+                chunk_index += 1
+                pieces = _overlap_tail(pieces, overlap_tokens)
+                # Overlap must not push the next chunk over the limit
+                while pieces and sum(p['tokens'] for p in pieces) + piece['tokens'] > chunk_tokens:
+                    pieces.pop(0)
+                tokens = sum(p['tokens'] for p in pieces)
+            pieces.append(piece)
+            tokens += piece['tokens']
+            fresh = True
+
+    if fresh:
+        yield make_chunk()
+
+
+def read_front_matter(lines: Iterable[str]) -> Dict[str, str]:
+    """
+    Flat ``key: value`` pairs of a YAML front matter block (nested YAML is ignored)
+
+    Only the front matter is read; the caller can rewind the file afterwards.
+    """
+    values = {}
+    iterator = iter(lines)
+    if next(iterator, '').strip() != '---':
+        return values
+    for line in iterator:
+        if line.strip() in ('---', '...'):
+            break
+        match = FRONT_MATTER_RE.match(line)
+        if match and match.group(2):
+            values[match.group(1).lower()] = match.group(2).strip('\'"')
+    return values
+
+
+def document_attributes(source: str, front_matter: Dict[str, str], tenant_from_path: bool = False) -> Dict[str, str]:
+    """
+    Filterable attributes of a document: tenant, language, doc_type (empty ones left out)
+
+    Front matter wins. Otherwise the language comes from a "guide.de.md"
+    suffix or a language directory ("de/guide.md"), and with
+    ``tenant_from_path`` the tenant is the top-level directory.
+    """
+    attributes = {}
+    for key, field in FRONT_MATTER_FIELDS.items():
+        if front_matter.get(key) and field not in attributes:
+            attributes[field] = front_matter[key]
+
+    parts = Path(source).parts
+    if 'language' not in attributes:
+        suffixes = Path(source).suffixes
+        candidates = ([suffixes[-2].lstrip('.')] if len(suffixes) > 1 else []) + list(parts[:-1])
+        language = next((part for part in candidates if LANGUAGE_RE.match(part)), None)
+        if language:
+            attributes['language'] = language.replace('_', '-')
+    if tenant_from_path and 'tenant' not in attributes and len(parts) > 1:
+        attributes['tenant'] = parts[0]
+    return attributes
+
+
+def chunk_documents(content_dir: Path, chunk_tokens: int = 200, overlap_tokens: int = 30,
+                    tenant_from_path: bool = False) -> Iterator[Dict]:
+    """
+    Chunk every markdown file below content_dir, one file at a time
+
+    Files are read line by line and never held in memory as a whole, so
+    memory use does not grow with file or corpus size. Each chunk carries
+    its document's attributes (see document_attributes).
+    """
+    for md_file in iter_markdown_files(content_dir):
+        rel_path = md_file.relative_to(content_dir).as_posix()
+        try:
+            with open(md_file, 'r', encoding='utf-8') as f:
+                attributes = document_attributes(rel_path, read_front_matter(f), tenant_from_path)
+                f.seek(0)
+                for chunk in chunk_markdown(rel_path, f, chunk_tokens, overlap_tokens):
+                    chunk.update(attributes)
+                    yield chunk
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"  ✗ Error reading {md_file}: {e}")
+
+
+def embedding_text(chunk: Dict) -> str:
+    """Text that is embedded for a chunk: the heading breadcrumb plus the chunk text"""
+    if chunk.get('section'):
+        return f"{chunk['section']}\n\n{chunk['text']}"
+    return chunk['text']
@@ -0,0 +1,101 @@
+"""
+Buffered analytics writes to DynamoDB (DSGVO-compliant - no PII!)
+Items are written in the background, off the request's critical path
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Any, Optional, Callable
+
+# Configuration
+ANALYTICS_MAX_BUFFERED = int(os.environ.get('ANALYTICS_MAX_BUFFERED', '1'))  # >1: batch across invocations
+ANALYTICS_MAX_AGE = float(os.environ.get('ANALYTICS_MAX_AGE', '60'))  # seconds
+ANALYTICS_TTL_DAYS = int(os.environ.get('ANALYTICS_TTL_DAYS', '30'))
+
+
+class AnalyticsBuffer:
+    """
+    Collects analytics items and writes them in batches
+
+    With the default ``max_buffered`` of 1 every item is due as soon as it is
+    added, and the request that recorded it writes it in its own background
+    task (drained before the handler returns), so no item is lost.
+
+    Batching across invocations is opt-in (ANALYTICS_MAX_BUFFERED > 1): items
+    wait until the buffer is full or its oldest item exceeds ``max_age``, and
+    items still buffered when an execution environment is shut down are lost.
+    """
+
+    def __init__(self, table=None, max_buffered: int = ANALYTICS_MAX_BUFFERED, max_age: float = ANALYTICS_MAX_AGE,
+                 table_factory: Optional[Callable[[], Any]] = None):
+        self._table = table
+        self._table_factory = table_factory
+        self.max_buffered = max(1, max_buffered)
+        self.max_age = max_age
+        self._items = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def table(self):
+        """DynamoDB table (from table_factory on first flush, so idle buffers create no client)"""
+        if self._table is None and self._table_factory is not None:
+            self._table = self._table_factory()
+        return self._table
+
+    def add(self, item: Dict[str, Any]):
+        with self._lock:
+            if not self._items:
+                self._oldest = time.monotonic()
+            self._items.append(item)
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._items:
+                return False
+            return (len(self._items) >= self.max_buffered
+                    or time.monotonic() - self._oldest >= self.max_age)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items, self._items, self._oldest = self._items, [], None
+            return items
+
+    def flush(self) -> int:
+        """Write all buffered items (batch_writer handles 25-item batches and retries)"""
+        items = self._take()
+        if not items:
+            return 0
+        try:
+            with self.table.batch_writer() as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+            self.written += len(items)
+            print(f"[INFO] Flushed {len(items)} analytics items to DynamoDB")
+            return len(items)
+        except Exception as e:
+            # Don't fail requests if logging fails
+            self.failed += len(items)
+            print(f"[WARNING] Failed to flush analytics to DynamoDB: {str(e)}")
+            return 0
+
+
+def build_analytics_item(event_id: str, query: str, response: str, context: str,
+                         cache_hit: bool = False) -> Dict[str, Any]:
+    """
+    Analytics-only item: statistical data, NO query/response text or user data
+    """
+    now = int(time.time())
+    return {
+        'event_id': event_id,
+        'timestamp': now,
+        'query_length': len(query),
+        'response_length': len(response),
+        'context_used': bool(context),
+        'context_length': len(context),
+        'cache_hit': cache_hit,
+        'expire_at': now + (ANALYTICS_TTL_DAYS * 24 * 60 * 60)
+    }
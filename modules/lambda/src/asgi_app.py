@@ -0,0 +1,123 @@
+"""
+Minimal ASGI app for the asyncio chat pipeline (async_handler.py)
+Hosts the handler in a long-running process - container on ECS/App Runner, or locally -
+where one process serves many concurrent requests
+
+No framework needed; run it with any ASGI server, e.g.:
+    MODEL_ID=... uvicorn asgi_app:app --app-dir src --host 0.0.0.0 --port 8080
+
+Routes:
+    POST /v1/chat/completions (or /chat/completions)   OpenAI format, SSE with "stream": true
+    GET  /health                                       liveness probe
+"""
+
+import json
+from typing import Dict, Any, List, Tuple
+
+from async_handler import handle_event, stream_chat_completion, drain_all_background, run_sync
+from async_aws import close_clients, backend_name
+from lambda_function import validate_chat_request, analytics_buffer
+from retrieval_filters import apply_request_tenant
+from warmup import run_warmup, WARMUP_ON_INIT
+
+CHAT_PATHS = ('/v1/chat/completions', '/chat/completions')
+SHUTDOWN_DRAIN_TIMEOUT = 10.0  # seconds for in-flight background writes on shutdown
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+async def app(scope: Dict[str, Any], receive, send):
+    """ASGI 3 application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path'].rstrip('/')
+    if scope['method'] == 'GET' and path == '/health':
+        await send_json(send, 200, {'status': 'ok', 'aws_backend': backend_name()})
+        return
+    if path not in CHAT_PATHS:
+        await send_json(send, 404, {'error': {'message': 'Not found', 'code': 404}})
+        return
+    if scope['method'] != 'POST':
+        await send_json(send, 405, {'error': {'message': 'Method not allowed', 'code': 405}})
+        return
+
+    raw_body = await read_body(receive)
+    try:
+        body = json.loads(raw_body or '{}')
+    except json.JSONDecodeError:
+        await send_json(send, 400, {'error': {'message': 'Invalid JSON body', 'code': 400}})
+        return
+
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    if isinstance(body, dict) and body.get('stream') and not apply_request_tenant(body, {'headers': headers}) \
+            and not validate_chat_request(body):
+        await send_stream(send, body)
+        return
+
+    # Non-streaming (and validation errors): same event/response format as the Lambda handler
+    result = await handle_event({'body': raw_body, 'headers': headers}, None, drain=False)
+    await send_response(send, result['statusCode'], list(result.get('headers', {}).items()),
+                        result['body'].encode('utf-8'))
+
+
+async def read_body(receive) -> str:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks).decode('utf-8')
+
+
+async def send_stream(send, body: Dict[str, Any]):
+    """SSE frames flushed as they are produced (time-to-first-token as with ConverseStream)"""
+    await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+    async for frame in stream_chat_completion(body):
+        await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def send_json(send, status: int, payload: Dict[str, Any]):
+    await send_response(send, status, [('Content-Type', 'application/json')], json.dumps(payload).encode('utf-8'))
+
+
+async def send_response(send, status: int, headers: List[Tuple[str, str]], payload: bytes):
+    raw_headers = [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers]
+    raw_headers.append((b'content-length', str(len(payload)).encode('ascii')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def lifespan(receive, send):
+    """
+    Startup: warm up (clients, hot queries, local indexes) before taking traffic
+    Shutdown: finish background writes, flush buffered analytics, close the clients
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if WARMUP_ON_INIT:
+                try:
+                    await run_sync(run_warmup)
+                except Exception as e:
+                    print(f"[WARNING] Startup warmup failed: {str(e)}")
+            print(f"[INFO] Chat app ready (AWS calls via {backend_name()})")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await drain_all_background(SHUTDOWN_DRAIN_TIMEOUT)
+            if analytics_buffer:
+                await run_sync(analytics_buffer.flush)
+            await close_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
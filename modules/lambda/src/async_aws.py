@@ -0,0 +1,217 @@
+"""
+asyncio access to the AWS APIs the chat pipeline calls
+aiobotocore clients when the package is installed, otherwise the shared boto3 clients on thread pools
+
+Either way the clients are created once per process (per event loop for
+aiobotocore) and share their connection pools between all concurrent
+requests; call sites look the same:
+
+    response = await call('s3vectors', 'query_vectors', **params)
+    async for event in stream('bedrock-runtime', 'converse_stream', 'stream', **params): ...
+"""
+
+import os
+import json
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from typing import Dict, Any, AsyncIterator, Callable, Optional
+
+from aws_clients import get_client, client_config_args, AWS_MAX_POOL_CONNECTIONS
+
+# Configuration
+ASYNC_AWS_BACKEND = os.environ.get('ASYNC_AWS_BACKEND', 'auto').lower()  # auto | aiobotocore | threads
+# Threads for short blocking work (boto3 calls without aiobotocore, DynamoDB tables, caches,
+# local indexes, prompt assembly); matching the connection pool keeps every thread on a pooled connection
+ASYNC_IO_THREADS = int(os.environ.get('ASYNC_IO_THREADS', str(max(AWS_MAX_POOL_CONNECTIONS, 8))))
+# Threads for model calls without aiobotocore: each Converse call / ConverseStream holds one for the
+# whole generation, so this bounds the concurrent generations per process
+ASYNC_MODEL_THREADS = int(os.environ.get('ASYNC_MODEL_THREADS', '64'))
+
+io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix='aws-io')
+# Separate pool, so long generations never queue the short calls (embedding cache, DynamoDB, rerank)
+model_executor = ThreadPoolExecutor(max_workers=ASYNC_MODEL_THREADS, thread_name_prefix='aws-model')
+
+# Operations that last as long as a generation
+MODEL_OPERATIONS = {('bedrock-runtime', 'converse'), ('bedrock-runtime', 'converse_stream')}
+
+_STREAM_END = object()
+
+
+def _aiobotocore_available() -> bool:
+    if ASYNC_AWS_BACKEND == 'threads':
+        return False
+    try:
+        import aiobotocore  # noqa: F401
+        return True
+    except ImportError:
+        if ASYNC_AWS_BACKEND == 'aiobotocore':
+            raise
+        return False
+
+
+USE_AIOBOTOCORE = _aiobotocore_available()
+
+
+async def run_sync(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run blocking work on the I/O pool without blocking the event loop
+
+    The caller's context is copied, so the work records into the same request metrics.
+    """
+    return await _run_on(io_executor, fn, *args, **kwargs)
+
+
+async def run_long(fn: Callable, *args, **kwargs) -> Any:
+    """
+    run_sync for work that can last as long as a model call (background writes,
+    session summaries): runs on model_executor, never queueing the short calls
+    """
+    return await _run_on(model_executor, fn, *args, **kwargs)
+
+
+async def _run_on(executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Any:
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+def _executor_for(service: str, operation: str) -> ThreadPoolExecutor:
+    return model_executor if (service, operation) in MODEL_OPERATIONS else io_executor
+
+
+class AioClients:
+    """
+    aiobotocore clients of one event loop (created on first use, closed by close())
+
+    aiobotocore clients are bound to the loop they were created on, so a
+    new loop (e.g. a fresh asyncio.run) gets its own set.
+    """
+
+    def __init__(self):
+        from aiobotocore.session import get_session
+
+        self._session = get_session()
+        self._stack = AsyncExitStack()
+        self._clients = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, service: str):
+        client = self._clients.get(service)
+        if client is None:
+            async with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    from aiobotocore.config import AioConfig
+                    client = await self._stack.enter_async_context(
+                        self._session.create_client(service, config=AioConfig(**client_config_args(service))))
+                    self._clients[service] = client
+        return client
+
+    async def close(self):
+        self._clients.clear()
+        await self._stack.aclose()
+
+
+_aio_clients = {}  # event loop -> AioClients
+_aio_lock = threading.Lock()
+
+
+def _loop_clients() -> AioClients:
+    loop = asyncio.get_running_loop()
+    clients = _aio_clients.get(loop)
+    if clients is None:
+        with _aio_lock:
+            for old_loop in [old for old in _aio_clients if old.is_closed()]:
+                del _aio_clients[old_loop]
+            clients = _aio_clients.setdefault(loop, AioClients())
+    return clients
+
+
+async def get_async_client(service: str):
+    """Shared aiobotocore client for a service on the running loop"""
+    return await _loop_clients().get(service)
+
+
+async def call(service: str, operation: str, **params) -> Dict[str, Any]:
+    """
+    Call an AWS API operation (e.g. call('s3vectors', 'query_vectors', ...))
+
+    Without aiobotocore, model calls run on model_executor and everything else on io_executor.
+    """
+    if USE_AIOBOTOCORE:
+        client = await get_async_client(service)
+        return await getattr(client, operation)(**params)
+    return await _run_on(_executor_for(service, operation),
+                         lambda: getattr(get_client(service), operation)(**params))
+
+
+async def invoke_model_json(body: Dict[str, Any], **params) -> Dict[str, Any]:
+    """bedrock-runtime invoke_model with a JSON request and response body"""
+    if USE_AIOBOTOCORE:
+        client = await get_async_client('bedrock-runtime')
+        response = await client.invoke_model(body=json.dumps(body), **params)
+        async with response['body'] as response_body:
+            return json.loads(await response_body.read())
+
+    def invoke():
+        response = get_client('bedrock-runtime').invoke_model(body=json.dumps(body), **params)
+        return json.loads(response['body'].read())
+    return await run_sync(invoke)
+
+
+async def stream(service: str, operation: str, stream_key: str, **params) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Events of a streaming operation (e.g. converse_stream -> response['stream'])
+
+    Without aiobotocore a model_executor thread reads the event stream and
+    hands the events to the loop; if the consumer stops early the stream is closed.
+    """
+    if USE_AIOBOTOCORE:
+        client = await get_async_client(service)
+        response = await getattr(client, operation)(**params)
+        async for event in response[stream_key]:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def read():
+        try:
+            event_stream = getattr(get_client(service), operation)(**params)[stream_key]
+            for event in event_stream:
+                if stopped.is_set():
+                    event_stream.close()
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    loop.run_in_executor(_executor_for(service, operation), contextvars.copy_context().run, read)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
+async def close_clients(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Close the aiobotocore clients of a loop (ASGI shutdown)"""
+    clients = _aio_clients.pop(loop or asyncio.get_running_loop(), None)
+    if clients is not None:
+        await clients.close()
+
+
+def backend_name() -> str:
+    return 'aiobotocore' if USE_AIOBOTOCORE else 'threads'
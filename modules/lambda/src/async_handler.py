@@ -0,0 +1,301 @@
+"""
+asyncio variant of the chat pipeline
+Same stages, responses and metrics as lambda_function.py, with every AWS call awaited (async_aws.py)
+
+One process serves many concurrent requests: while one request waits on
+Titan, S3 Vectors, Converse or DynamoDB the event loop runs the others, and
+all of them share the same clients and connection pools. Used by the ASGI
+app (asgi_app.py) in a long-running container; lambda_handler below runs it
+as a Lambda handler (async_handler.lambda_handler) on a persistent loop.
+The default Lambda entry point stays lambda_function.lambda_handler.
+"""
+
+import os
+import asyncio
+import contextvars
+from typing import Dict, List, Any, AsyncIterator, Optional
+from botocore.exceptions import ClientError
+
+from async_aws import call, stream, run_sync, run_long
+from lambda_function import (
+    analytics_buffer,
+    flush_analytics,
+    parse_chat_event,
+    completion_options,
+    json_response,
+    error_response,
+    sse_response,
+    start_chat,
+    load_chat_session,
+    attach_session,
+    retrieval_query,
+    response_cache_namespace,
+    lookup_cached_response,
+    record_cache_result,
+    plan_retrieval,
+    rerank_documents,
+    build_prompt,
+    cached_completion,
+    finish_chat,
+    build_converse_params,
+    parse_converse_response,
+    parse_stream_event,
+    bedrock_error,
+    create_openai_response,
+    ChatStream,
+)
+from s3_vectors_retriever import get_query_embedding_async, retrieve_documents_async, retrieve_documents_multi_async
+from response_cache import get_response_cache
+import metrics
+from warmup import is_warmup_event, run_warmup
+
+# Configuration
+BACKGROUND_DRAIN_TIMEOUT = float(os.environ.get('BACKGROUND_DRAIN_TIMEOUT', '2.0'))  # seconds (Lambda entry only)
+
+# Analytics flushes and session writes/summaries: tracked per request (each request runs in its
+# own task, so its own context) for drain_background, and process-wide for the shutdown drain
+_background_tasks = contextvars.ContextVar('background_tasks', default=None)
+_all_background_tasks = set()
+
+
+def _request_tasks() -> set:
+    tasks = _background_tasks.get()
+    if tasks is None:
+        tasks = set()
+        _background_tasks.set(tasks)
+    return tasks
+
+
+def run_in_background(fn, *args, **kwargs) -> asyncio.Task:
+    """
+    Run blocking work (DynamoDB writes, summaries) off the request path without awaiting it
+
+    The work runs on the long-call pool (async_aws.run_long), so it never queues the
+    request path's short calls. The task inherits the request's context, so it
+    records into the same request metrics.
+    """
+    task = asyncio.ensure_future(run_long(fn, *args, **kwargs))
+    for tasks in (_request_tasks(), _all_background_tasks):
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    return task
+
+
+async def drain_background(timeout: float = BACKGROUND_DRAIN_TIMEOUT):
+    """
+    Wait for this request's background work (Lambda entry: the environment is
+    frozen after the handler returns); other requests' writes are not waited for
+    """
+    await _wait_for(_request_tasks(), timeout)
+
+
+async def drain_all_background(timeout: float = BACKGROUND_DRAIN_TIMEOUT):
+    """Wait for the background work of all requests (server shutdown)"""
+    await _wait_for(_all_background_tasks, timeout)
+
+
+async def _wait_for(tasks: set, timeout: float):
+    if not tasks:
+        return
+    _, not_done = await asyncio.wait(set(tasks), timeout=timeout)
+    if not_done:
+        print(f"[WARNING] {len(not_done)} background task(s) still running after {timeout}s")
+
+
+def start_analytics_flush():
+    """Flush analytics buffered by earlier requests, overlapping this request's pipeline"""
+    if analytics_buffer and analytics_buffer.due():
+        run_in_background(flush_analytics)
+
+
+async def handle_event(event: Dict[str, Any], context: Any = None, drain: bool = True) -> Dict[str, Any]:
+    """
+    lambda_function.lambda_handler as a coroutine (same event and response format)
+
+    Args:
+        event: API Gateway proxy event, raw invoke payload or warmup event
+        context: Lambda context (or None)
+        drain: Wait for background work before returning (Lambda); a
+            long-running server lets it finish on its own
+    """
+    request_metrics = None
+    _request_tasks()
+    try:
+        if is_warmup_event(event):
+            start_analytics_flush()
+            return json_response({'warmup': await run_sync(run_warmup, event.get('queries'))})
+
+        body, request_error = parse_chat_event(event)
+        if request_error:
+            return request_error
+
+        if body.get('stream'):
+            return sse_response(''.join([frame async for frame in stream_chat_completion(body, drain=drain)]))
+
+        options = completion_options(body)
+
+        request_metrics = metrics.start_request(RequestId=getattr(context, 'aws_request_id', None), Async=True)
+        start_analytics_flush()
+
+        prepared = await prepare_chat(body)
+
+        if prepared['cached']:
+            completion = cached_completion(prepared)
+        else:
+            print(f"[INFO] Calling Claude with {len(prepared['messages'])} messages...")
+            with metrics.stage('model'):
+                completion = await call_claude(prepared['messages'], options['temperature'], options['max_tokens'])
+
+        finish_chat(prepared, completion['text'], completion['finish_reason'], run_in_background)
+
+        return json_response(create_openai_response(completion['text'], options['model'], completion['usage'],
+                                                    completion['finish_reason']))
+
+    except Exception as e:
+        print(f"[ERROR] Async handler error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return error_response(500, f"Internal server error: {str(e)}")
+
+    finally:
+        if drain:
+            await drain_background()
+        if request_metrics:
+            request_metrics.emit()
+
+
+async def prepare_chat(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    lambda_function.prepare_chat with the blocking stages awaited (same returned dict)
+
+    Session load, cache lookup, reranking and prompt assembly (CPU-bound token
+    counting) run on the I/O pool so they never stall the event loop.
+    """
+    prepared = start_chat(body)
+
+    if body.get('session_id'):
+        with metrics.stage('session_load'):
+            session = await run_sync(load_chat_session, body['session_id'])
+        attach_session(prepared, session, run_in_background)
+
+    query = retrieval_query(prepared)
+
+    prepared['cache_namespace'] = await run_sync(response_cache_namespace, prepared['messages'], prepared['filters'])
+    with metrics.stage('cache_lookup'):
+        prepared['query_embedding'] = await embed_query_for_cache(query)
+        cached = await run_sync(lookup_cached_response, prepared['query_embedding'], prepared['cache_namespace'])
+    if record_cache_result(prepared, cached):
+        return prepared
+
+    plan = plan_retrieval(prepared)
+    with metrics.stage('retrieval'):
+        if len(plan['sub_queries']) > 1:
+            documents = await retrieve_documents_multi_async(plan['sub_queries'], max_results=plan['candidates'],
+                                                             filters=prepared['filters'])
+        else:
+            documents = await retrieve_documents_async(query, max_results=plan['candidates'],
+                                                       query_embedding=prepared['query_embedding'],
+                                                       filters=prepared['filters'])
+
+    if plan['reranker']:
+        documents = await run_sync(rerank_documents, prepared, documents, plan['reranker'])
+
+    return await run_sync(build_prompt, prepared, documents)
+
+
+async def embed_query_for_cache(query: str) -> Optional[List[float]]:
+    """lambda_function.embed_query_for_cache, awaited"""
+    if not get_response_cache():
+        return None
+    try:
+        return await get_query_embedding_async(query)
+    except Exception as e:
+        print(f"[WARNING] Query embedding for response cache failed: {str(e)}")
+        return None
+
+
+async def call_claude(messages: List[Dict], temperature: float, max_tokens: int) -> Dict[str, Any]:
+    """Bedrock Converse, awaited (see lambda_function.call_claude)"""
+    try:
+        response = await call('bedrock-runtime', 'converse', **build_converse_params(messages, temperature, max_tokens))
+    except ClientError as e:
+        raise bedrock_error(e)
+    return parse_converse_response(response)
+
+
+async def stream_claude(messages: List[Dict], temperature: float, max_tokens: int) -> AsyncIterator[Dict[str, Any]]:
+    """Bedrock ConverseStream events as they arrive (see lambda_function.stream_claude)"""
+    try:
+        total_chars = 0
+        async for event in stream('bedrock-runtime', 'converse_stream', 'stream',
+                                  **build_converse_params(messages, temperature, max_tokens)):
+            parsed = parse_stream_event(event)
+            if parsed:
+                total_chars += len(parsed.get('text', ''))
+                yield parsed
+        print(f"[INFO] Streamed model response: {total_chars} chars")
+
+    except ClientError as e:
+        raise bedrock_error(e)
+
+
+async def stream_chat_completion(body: Dict[str, Any], drain: bool = False) -> AsyncIterator[str]:
+    """
+    lambda_function.stream_chat_completion as an async generator of SSE frames
+
+    The request must already be validated. Cleanup runs in a finally block, so
+    it also happens when the client disconnects and the host closes the generator.
+    """
+    options = completion_options(body)
+    request_metrics = metrics.start_request(Stream=True, Async=True)
+    chat_stream = ChatStream(options['model'], options['include_usage'], request_metrics)
+    _request_tasks()
+
+    try:
+        yield chat_stream.role_frame()
+
+        start_analytics_flush()
+        try:
+            prepared = await prepare_chat(body)
+
+            if prepared['cached']:
+                yield chat_stream.content_frame(prepared['cached']['text'])
+            else:
+                print(f"[INFO] Streaming Claude response for {len(prepared['messages'])} messages...")
+                with metrics.stage('model'):
+                    async for event in stream_claude(prepared['messages'], options['temperature'],
+                                                     options['max_tokens']):
+                        frame = chat_stream.on_event(event)
+                        if frame:
+                            yield frame
+
+        except Exception as e:
+            for frame in chat_stream.error_frames(e):
+                yield frame
+            return
+
+        # Store the answer before the last frames, which a disconnecting client may not wait for
+        finish_chat(prepared, chat_stream.text, chat_stream.finish_reason, run_in_background)
+        for frame in chat_stream.final_frames():
+            yield frame
+
+    finally:
+        if drain:
+            await drain_background()
+        request_metrics.emit()
+
+
+_loop = None
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Lambda entry point for the asyncio pipeline (handler "async_handler.lambda_handler")
+
+    The event loop outlives the invocation, so aiobotocore clients and their
+    connections are reused by warm invocations like the boto3 ones.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(handle_event(event, context))
@@ -0,0 +1,98 @@
+"""
+Shared, lazily created AWS clients
+One bedrock-runtime / s3vectors / DynamoDB client per execution environment, built on first use
+
+Requests that never reach AWS (validation errors, cache hits) don't pay for
+client construction, and all modules reuse the same keep-alive connection pools.
+"""
+
+import os
+import threading
+from typing import Dict, List, Any
+
+# Configuration
+AWS_REGION = os.environ.get('AWS_REGION', 'eu-central-1')
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '16'))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '4'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+
+# Read timeouts per service (seconds) - Converse streams can take minutes
+READ_TIMEOUTS = {
+    'bedrock-runtime': 120,
+    'bedrock-agent-runtime': 10,
+    's3vectors': 10,
+    'dynamodb': 5,
+    'ssm': 5,
+}
+DEFAULT_READ_TIMEOUT = 30
+
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def client_config_args(service: str) -> Dict[str, Any]:
+    """Client settings shared by the boto3 clients and the asyncio ones (async_aws)"""
+    return {
+        'region_name': AWS_REGION,
+        'max_pool_connections': AWS_MAX_POOL_CONNECTIONS,
+        'tcp_keepalive': True,
+        'connect_timeout': AWS_CONNECT_TIMEOUT,
+        'read_timeout': READ_TIMEOUTS.get(service, DEFAULT_READ_TIMEOUT),
+        'retries': {'max_attempts': AWS_MAX_ATTEMPTS, 'mode': 'adaptive'}
+    }
+
+
+def client_config(service: str):
+    """botocore Config: connection pool, TCP keep-alive, adaptive retries, timeouts"""
+    from botocore.config import Config
+
+    return Config(**client_config_args(service))
+
+
+def get_client(service: str):
+    """Shared boto3 client for a service (created on first use)"""
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                import boto3
+                client = boto3.client(service, config=client_config(service))
+                _clients[service] = client
+    return client
+
+
+def get_resource(service: str):
+    """Shared boto3 resource (e.g. 'dynamodb', created on first use)"""
+    resource = _resources.get(service)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service)
+            if resource is None:
+                import boto3
+                resource = boto3.resource(service, config=client_config(service))
+                _resources[service] = resource
+    return resource
+
+
+def get_table(table_name: str):
+    """DynamoDB Table on the shared resource"""
+    return get_resource('dynamodb').Table(table_name)
+
+
+def set_client(service: str, client: Any):
+    """Use a given client (or stub) for a service - tests and benchmarks"""
+    with _lock:
+        _clients[service] = client
+
+
+def set_resource(service: str, resource: Any):
+    """Use a given resource (or stub) for a service - tests and benchmarks"""
+    with _lock:
+        _resources[service] = resource
+
+
+def created_services() -> List[str]:
+    """Services whose client/resource has been created (for warmup and diagnostics)"""
+    return sorted(set(_clients) | set(_resources))
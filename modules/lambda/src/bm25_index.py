@@ -0,0 +1,152 @@
+"""
+BM25 keyword index for hybrid retrieval
+Catches what embeddings miss: product codes, error numbers, names typed verbatim
+
+Artifact (written by build_s3_vectors_index.py --bm25-index, gzip-compressed JSON):
+    {"k1": ..., "b": ..., "doc_lengths": [...],
+     "docs": [{"key": ..., "metadata": {...}}, ...],
+     "postings": {"term": [doc_id, tf, doc_id, tf, ...], ...}}
+"""
+
+import os
+import re
+import gzip
+import json
+import math
+import heapq
+from collections import Counter
+from typing import List, Dict, Optional, Any, Callable, Iterable
+
+# Configuration
+BM25_INDEX_PATH = os.environ.get('BM25_INDEX_PATH', '')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, plus codes that keep their inner punctuation ("ERR-4021", "v2.3", "foo_bar")
+TOKEN_RE = re.compile(r'\w+(?:[-./]\w+)*')
+PART_RE = re.compile(r'[-./_]')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms; compound codes are indexed whole *and* by their parts,
+    so "ERR-4021" matches queries for "err-4021" as well as "4021"
+    """
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        parts = [part for part in PART_RE.split(token) if part]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of the knowledge base
+
+    Postings are flat [doc_id, tf, ...] lists, which keeps the artifact
+    small and loading a single json.load.
+    """
+
+    def __init__(self, docs: List[Dict[str, Any]], postings: Dict[str, List[int]],
+                 doc_lengths: List[int], k1: float = BM25_K1, b: float = BM25_B):
+        self.docs = docs
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, docs: List[Dict[str, Any]], texts: Iterable[str]) -> 'BM25Index':
+        """
+        Index the i-th text as document docs[i] ({'key': ..., 'metadata': {...}})
+
+        texts may be a generator that fills docs as it goes (one pass over a
+        streamed corpus).
+        """
+        postings = {}
+        doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).extend((doc_id, tf))
+        return cls(docs, postings, doc_lengths)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ())) // 2
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int,
+               predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the top_k documents for the query (best first) as
+        {'key', 'score', 'metadata'}
+
+        With a predicate only documents whose metadata it accepts are ranked.
+        """
+        if not self.docs or top_k <= 0:
+            return []
+
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for i in range(0, len(posting), 2):
+                doc_id, tf = posting[i], posting[i + 1]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if predicate is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if predicate(self.docs[doc_id]['metadata'])}
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [
+            {'key': self.docs[doc_id]['key'], 'score': score, 'metadata': self.docs[doc_id]['metadata']}
+            for doc_id, score in best
+        ]
+
+    def save(self, path: str):
+        data = {
+            'k1': self.k1,
+            'b': self.b,
+            'doc_lengths': self.doc_lengths,
+            'docs': self.docs,
+            'postings': self.postings
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['docs'], data['postings'], data['doc_lengths'], data['k1'], data['b'])
+
+
+_bm25_index = None
+
+
+def get_bm25_index(path: Optional[str] = None) -> BM25Index:
+    """
+    Lazily load the BM25 artifact (first hybrid query on a cold start), then
+    keep it resident for warm invocations
+    """
+    global _bm25_index
+    if _bm25_index is None:
+        path = path or BM25_INDEX_PATH
+        if not path:
+            raise RuntimeError("BM25_INDEX_PATH is not set")
+        print(f"[INFO] Loading BM25 index from {path}")
+        _bm25_index = BM25Index.load(path)
+        print(f"[INFO] Loaded BM25 index: {len(_bm25_index)} documents, {len(_bm25_index.postings)} terms")
+    return _bm25_index
@@ -0,0 +1,181 @@
+"""
+Context assembly between retrieval and the prompt
+Distance cutoff -> MMR diversity selection -> merging of adjacent chunks per source
+
+Every document removed here is prompt tokens Converse does not have to read.
+"""
+
+import os
+import re
+from typing import List, Dict, Tuple, Optional
+
+# Configuration
+CONTEXT_MAX_DISTANCE = float(os.environ.get('CONTEXT_MAX_DISTANCE', '0.8'))  # cosine distance, 2.0 = off
+CONTEXT_MAX_DOCUMENTS = int(os.environ.get('CONTEXT_MAX_DOCUMENTS', '5'))
+MMR_LAMBDA = float(os.environ.get('MMR_LAMBDA', '0.7'))  # 1.0 = relevance only, 0.0 = diversity only
+DUPLICATE_SIMILARITY = float(os.environ.get('CONTEXT_DUPLICATE_SIMILARITY', '0.9'))
+
+WORD_RE = re.compile(r'\w+')
+
+# Text overlap searched for when stitching overlapping chunks (shorter matches are coincidence)
+MIN_STITCH_OVERLAP = 8
+MAX_STITCH_OVERLAP = 2000
+
+
+def _terms(text: str) -> frozenset:
+    return frozenset(WORD_RE.findall(text.lower()))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Token-set Jaccard similarity"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _int_metadata(document: Dict, name: str) -> Optional[int]:
+    """Integer metadata (stored as strings in S3 Vectors), None if missing"""
+    try:
+        return int(document.get('metadata', {}).get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_distance_cutoff(documents: List[Dict], max_distance: float) -> List[Dict]:
+    """Drop vector hits farther than max_distance (keyword-only hits have no distance and are kept)"""
+    return [d for d in documents if d['distance'] is None or d['distance'] <= max_distance]
+
+
+def select_mmr(documents: List[Dict], max_documents: int, mmr_lambda: float = MMR_LAMBDA,
+               duplicate_similarity: float = DUPLICATE_SIMILARITY) -> List[Dict]:
+    """
+    Maximal marginal relevance selection
+
+    Greedily picks the document maximizing
+    ``lambda * relevance - (1 - lambda) * max_similarity_to_selected``,
+    with relevance = rerank_score if the documents were re-ranked, else
+    1 - distance, and similarity = token Jaccard (the query does not return
+    vectors). Near-duplicates (similarity >= duplicate_similarity) are dropped
+    outright. Documents without either (keyword-only hits) inherit the
+    relevance of the document ranked before them.
+
+    Returns:
+        Selected documents in selection order (most relevant first)
+    """
+    candidates = []
+    relevance = 1.0
+    for document in documents:
+        if document.get('rerank_score') is not None:
+            relevance = document['rerank_score']
+        elif document['distance'] is not None:
+            relevance = 1.0 - document['distance']
+        candidates.append((document, relevance, _terms(document['text'])))
+
+    selected = []
+    while candidates and len(selected) < max_documents:
+        best_index, best_score = None, None
+        for i, (document, relevance, terms) in enumerate(candidates):
+            similarity = max((jaccard(terms, chosen_terms) for _, chosen_terms in selected), default=0.0)
+            if similarity >= duplicate_similarity:
+                continue
+            score = mmr_lambda * relevance - (1 - mmr_lambda) * similarity
+            if best_score is None or score > best_score:
+                best_index, best_score = i, score
+        if best_index is None:
+            break
+        document, _, terms = candidates.pop(best_index)
+        selected.append((document, terms))
+
+    return [document for document, _ in selected]
+
+
+def _stitch(first: str, second: str, overlapping: bool) -> str:
+    """Concatenate two neighbouring chunk texts, removing the text they share"""
+    limit = min(len(first), len(second), MAX_STITCH_OVERLAP) if overlapping else 0
+    for size in range(limit, MIN_STITCH_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n\n{second}"
+
+
+def merge_adjacent(documents: List[Dict]) -> List[Dict]:
+    """
+    Merge overlapping or consecutive chunks of the same source into one document
+
+    Uses the builder's 'start'/'end'/'chunk_index' metadata. A merged
+    document takes the rank and key of its best member, the smallest
+    distance, and lists all member keys in 'merged_keys'.
+    """
+    by_source = {}
+    for rank, document in enumerate(documents):
+        by_source.setdefault(document['source'], []).append((rank, document))
+
+    merged = []
+    for source, members in by_source.items():
+        members.sort(key=lambda item: (_int_metadata(item[1], 'start') is None,
+                                       _int_metadata(item[1], 'start') or 0))
+        group = None
+        for rank, document in members:
+            start, end = _int_metadata(document, 'start'), _int_metadata(document, 'end')
+            index = _int_metadata(document, 'chunk_index')
+            adjacent = (group is not None and start is not None and group['end'] is not None
+                        and (start <= group['end']
+                             or (index is not None and group['last_index'] is not None
+                                 and index == group['last_index'] + 1)))
+            if adjacent:
+                group['document']['text'] = _stitch(group['document']['text'], document['text'],
+                                                    overlapping=start < group['end'])
+                group['document']['merged_keys'].append(document['key'])
+                if document['distance'] is not None and (group['document']['distance'] is None
+                                                         or document['distance'] < group['document']['distance']):
+                    group['document']['distance'] = document['distance']
+                group['rank'] = min(group['rank'], rank)
+                group['end'] = max(group['end'], end if end is not None else group['end'])
+                group['last_index'] = index
+                group['document']['metadata'] = dict(group['document'].get('metadata', {}), end=str(group['end']))
+                continue
+
+            if group:
+                merged.append(group)
+            group = {
+                'rank': rank,
+                'end': end,
+                'last_index': index,
+                'document': dict(document, merged_keys=[document['key']])
+            }
+        if group:
+            merged.append(group)
+
+    merged.sort(key=lambda group: group['rank'])
+    return [group['document'] for group in merged]
+
+
+def assemble_context(documents: List[Dict], max_documents: int = CONTEXT_MAX_DOCUMENTS,
+                     max_distance: float = CONTEXT_MAX_DISTANCE,
+                     mmr_lambda: float = MMR_LAMBDA) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Turn retrieved documents (best first) into the documents used as prompt context
+
+    Args:
+        documents: Retrieved documents, best first
+        max_documents: Max documents selected by MMR (before merging)
+        max_distance: Vector hits above this cosine distance are dropped
+        mmr_lambda: Relevance vs. diversity trade-off
+
+    Returns:
+        (documents, stats) - stats has 'retrieved', 'over_cutoff',
+        'selected' and 'merged' (documents folded into a neighbour)
+    """
+    relevant = apply_distance_cutoff(documents, max_distance)
+    selected = select_mmr(relevant, max_documents, mmr_lambda)
+    assembled = merge_adjacent(selected)
+
+    stats = {
+        'retrieved': len(documents),
+        'over_cutoff': len(documents) - len(relevant),
+        'selected': len(selected),
+        'merged': len(selected) - len(assembled)
+    }
+    print(f"[INFO] Context assembly: {stats['retrieved']} retrieved, {stats['over_cutoff']} over distance "
+          f"{max_distance}, {stats['selected']} selected, {stats['merged']} merged into neighbours")
+    return assembled, stats
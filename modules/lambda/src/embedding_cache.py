@@ -0,0 +1,199 @@
+"""
+Query embedding cache for S3 Vectors retrieval
+Two tiers: in-process LRU (survives warm Lambda invocations) + optional shared backend (DynamoDB)
+"""
+
+import os
+import time
+import array
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any
+
+# Configuration
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '1024'))
+EMBEDDING_CACHE_TTL = int(os.environ.get('EMBEDDING_CACHE_TTL', '86400'))  # seconds
+EMBEDDING_CACHE_TABLE = os.environ.get('EMBEDDING_CACHE_TABLE', '')
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize query text for cache lookups
+
+    Unicode-normalizes, case-folds and collapses whitespace so trivially
+    different spellings of the same question share one cache entry.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def make_cache_key(text: str, model_id: str) -> str:
+    """Cache key for (normalized query, embedding model)"""
+    return hashlib.sha256(f"{model_id}\n{normalize_query(text)}".encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with size and TTL eviction"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class CacheBackend:
+    """Interface for the shared (second-tier) cache"""
+
+    def get(self, key: str) -> Optional[List[float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, embedding: List[float], ttl_seconds: int):
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Process-local stand-in for the shared tier (tests, local runs)"""
+
+    def __init__(self):
+        self._items = {}
+
+    def get(self, key: str) -> Optional[List[float]]:
+        item = self._items.get(key)
+        if item is None or item[1] < time.time():
+            return None
+        return item[0]
+
+    def set(self, key: str, embedding: List[float], ttl_seconds: int):
+        self._items[key] = (list(embedding), time.time() + ttl_seconds)
+
+
+class DynamoDBCacheBackend(CacheBackend):
+    """
+    Shared tier backed by a DynamoDB table
+
+    Table schema: hash key ``cache_key`` (S), TTL attribute ``expire_at``.
+    Embeddings are stored as packed float32 binary to keep items small.
+    """
+
+    def __init__(self, table_name: str):
+        from aws_clients import get_table
+        self.table = get_table(table_name)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        item = self.table.get_item(Key={'cache_key': key}).get('Item')
+        if not item or int(item.get('expire_at', 0)) < time.time():
+            return None
+        return array.array('f', bytes(item['embedding'])).tolist()
+
+    def set(self, key: str, embedding: List[float], ttl_seconds: int):
+        self.table.put_item(Item={
+            'cache_key': key,
+            'embedding': array.array('f', embedding).tobytes(),
+            'expire_at': int(time.time()) + ttl_seconds
+        })
+
+
+class EmbeddingCache:
+    """
+    Two-tier query embedding cache with hit/miss counters
+
+    Lookups go local LRU -> shared backend -> miss. Shared-tier hits are
+    promoted into the local LRU. Shared-tier errors are logged and treated
+    as misses so the cache can never fail a request.
+
+    The LRU holds packed float32 arrays (4 bytes per dimension instead of a
+    list of Python floats), unpacked to a list on each hit.
+    """
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE, ttl_seconds: int = EMBEDDING_CACHE_TTL,
+                 shared: Optional[CacheBackend] = None):
+        self.local = LRUCache(max_size, ttl_seconds)
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, text: str, model_id: str) -> Optional[List[float]]:
+        key = make_cache_key(text, model_id)
+
+        packed = self.local.get(key)
+        if packed is not None:
+            self.local_hits += 1
+            return packed.tolist()
+
+        if self.shared:
+            try:
+                embedding = self.shared.get(key)
+            except Exception as e:
+                print(f"[WARNING] Shared embedding cache lookup failed: {e}")
+                embedding = None
+            if embedding is not None:
+                self.shared_hits += 1
+                self.local.set(key, array.array('f', embedding))
+                return embedding
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, model_id: str, embedding: List[float]):
+        key = make_cache_key(text, model_id)
+        self.local.set(key, array.array('f', embedding))
+
+        if self.shared:
+            try:
+                self.shared.set(key, embedding, self.ttl_seconds)
+            except Exception as e:
+                print(f"[WARNING] Shared embedding cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+            'local_size': len(self.local)
+        }
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Module-level cache instance (created on first use, kept for warm invocations)"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        shared = DynamoDBCacheBackend(EMBEDDING_CACHE_TABLE) if EMBEDDING_CACHE_TABLE else None
+        _embedding_cache = EmbeddingCache(shared=shared)
+    return _embedding_cache
@@ -0,0 +1,171 @@
+"""
+Embedding providers shared by the retriever (query embeddings) and the index builder
+Bedrock Titan for production, a deterministic hashing embedder for offline tests and benchmarks
+"""
+
+import os
+import re
+import json
+import math
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
+
+# Configuration
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'bedrock').lower()  # bedrock | hashing
+BEDROCK_EMBED_MODEL = os.environ.get('BEDROCK_EMBED_MODEL', 'amazon.titan-embed-text-v2:0')
+EMBEDDING_DIMENSIONS = int(os.environ.get('EMBEDDING_DIMENSIONS', '0'))  # 0 = model default
+EMBEDDING_NORMALIZE = os.environ.get('EMBEDDING_NORMALIZE', 'true').lower() == 'true'
+
+# Output sizes Titan Text Embeddings v2 accepts via the "dimensions" field
+TITAN_V2_DIMENSIONS = (256, 512, 1024)
+
+
+class EmbeddingProvider:
+    """
+    Interface for text embedding backends
+
+    ``model_id`` identifies model *and* output configuration; it is used in
+    cache keys and build manifests, so changing the dimension never mixes
+    incompatible vectors.
+    """
+
+    dimensions = 0
+    normalize = True
+
+    @property
+    def model_id(self) -> str:
+        raise NotImplementedError
+
+    def embed(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+    async def embed_async(self, text: str) -> List[float]:
+        """embed() for the asyncio handler (default: on the async_aws I/O pool)"""
+        from async_aws import run_sync
+        return await run_sync(self.embed, text)
+
+    def embed_many(self, texts: List[str], max_workers: int = 8) -> List[List[float]]:
+        """Embed several texts (concurrently where the backend has no batch API), order preserved"""
+        if len(texts) <= 1 or max_workers <= 1:
+            return [self.embed(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as executor:
+            return list(executor.map(self.embed, texts))
+
+
+class BedrockTitanEmbeddingProvider(EmbeddingProvider):
+    """Amazon Titan Text Embeddings via Bedrock invoke_model"""
+
+    def __init__(self, client=None, model_id: str = BEDROCK_EMBED_MODEL,
+                 dimensions: int = EMBEDDING_DIMENSIONS, normalize: bool = EMBEDDING_NORMALIZE):
+        self.client = client
+        self.base_model_id = model_id
+        self.dimensions = dimensions
+        self.normalize = normalize
+
+        if dimensions and self.supports_dimensions and dimensions not in TITAN_V2_DIMENSIONS:
+            raise ValueError(f"Titan v2 supports dimensions {TITAN_V2_DIMENSIONS}, got {dimensions}")
+
+    @property
+    def supports_dimensions(self) -> bool:
+        return 'titan-embed-text-v2' in self.base_model_id
+
+    @property
+    def model_id(self) -> str:
+        if self.dimensions and self.supports_dimensions:
+            return f"{self.base_model_id}/{self.dimensions}"
+        return self.base_model_id
+
+    def _get_client(self):
+        if self.client is None:
+            from aws_clients import get_client
+            return get_client('bedrock-runtime')
+        return self.client
+
+    def request_body(self, text: str) -> Dict[str, Any]:
+        body = {'inputText': text}
+        if self.supports_dimensions:
+            if self.dimensions:
+                body['dimensions'] = self.dimensions
+            body['normalize'] = self.normalize
+        return body
+
+    def embed(self, text: str) -> List[float]:
+        response = self._get_client().invoke_model(
+            modelId=self.base_model_id,
+            contentType='application/json',
+            accept='application/json',
+            body=json.dumps(self.request_body(text))
+        )
+
+        response_body = json.loads(response['body'].read())
+        return response_body['embedding']
+
+    async def embed_async(self, text: str) -> List[float]:
+        if self.client is not None:
+            return await super().embed_async(text)
+        from async_aws import invoke_model_json
+        response_body = await invoke_model_json(
+            self.request_body(text),
+            modelId=self.base_model_id,
+            contentType='application/json',
+            accept='application/json'
+        )
+        return response_body['embedding']
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic offline embedder (feature hashing of words and word bigrams)
+
+    No network, no model - texts sharing vocabulary get similar vectors, which
+    is enough to exercise and benchmark the whole pipeline without AWS.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS or 256, normalize: bool = True):
+        self.dimensions = dimensions
+        self.normalize = normalize
+
+    @property
+    def model_id(self) -> str:
+        return f"local-hashing/{self.dimensions}"
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        tokens = re.findall(r'\w+', text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+
+        if self.normalize:
+            norm = math.sqrt(sum(x * x for x in vector))
+            if norm:
+                vector = [x / norm for x in vector]
+        return vector
+
+    async def embed_async(self, text: str) -> List[float]:
+        return self.embed(text)  # pure CPU, microseconds
+
+
+def create_embedding_provider(client=None, provider: Optional[str] = None,
+                              dimensions: Optional[int] = None) -> EmbeddingProvider:
+    """
+    Build the provider configured by EMBEDDING_PROVIDER / EMBEDDING_DIMENSIONS
+
+    Args:
+        client: bedrock-runtime client to use (shared aws_clients client if omitted)
+        provider: Override for EMBEDDING_PROVIDER
+        dimensions: Override for EMBEDDING_DIMENSIONS
+    """
+    provider = (provider or EMBEDDING_PROVIDER).lower()
+    dimensions = EMBEDDING_DIMENSIONS if dimensions is None else dimensions
+
+    if provider == 'hashing':
+        return HashingEmbeddingProvider(dimensions or 256)
+    if provider == 'bedrock':
+        return BedrockTitanEmbeddingProvider(client, dimensions=dimensions)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
@@ -0,0 +1,209 @@
+"""
+Active index pointer for blue/green index rebuilds
+The builder writes a new versioned index (kb-index-<version>), validates it and then
+publishes its name here; the retriever resolves the pointer with a TTL cache
+
+Pointer backends (INDEX_POINTER_TYPE):
+    none       no pointer - S3_VECTORS_INDEX is queried directly
+    ssm        SSM parameter INDEX_POINTER_NAME (JSON value)
+    dynamodb   item {"pointer": S3_VECTORS_INDEX} in table INDEX_POINTER_NAME
+    file       local JSON file INDEX_POINTER_NAME (local runs, tests)
+
+Published record: {"index_name", "version", "dimension", "embed_model", "published_at",
+                   "versions" (published indexes still kept - the builder's garbage collection list)}
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+# Configuration
+INDEX_POINTER_TYPE = os.environ.get('INDEX_POINTER_TYPE', 'none').lower()  # none | ssm | dynamodb | file
+INDEX_POINTER_NAME = os.environ.get('INDEX_POINTER_NAME', '')  # parameter name / table name / file path
+INDEX_POINTER_TTL = float(os.environ.get('INDEX_POINTER_TTL', '60'))  # seconds between pointer lookups
+VECTOR_INDEX = os.environ.get('S3_VECTORS_INDEX', 'kb-index')
+
+
+class PointerBackend:
+    """Interface for where the active index record is stored"""
+
+    name = 'base'
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def write(self, record: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class SSMPointer(PointerBackend):
+    """SSM Parameter Store parameter holding the record as JSON"""
+
+    name = 'ssm'
+
+    def __init__(self, parameter_name: str):
+        self.parameter_name = parameter_name
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        from aws_clients import get_client
+        from botocore.exceptions import ClientError
+
+        try:
+            response = get_client('ssm').get_parameter(Name=self.parameter_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ParameterNotFound':
+                return None
+            raise
+        return json.loads(response['Parameter']['Value'])
+
+    def write(self, record: Dict[str, Any]):
+        from aws_clients import get_client
+        get_client('ssm').put_parameter(
+            Name=self.parameter_name,
+            Value=json.dumps(record),
+            Type='String',
+            Overwrite=True
+        )
+
+
+class DynamoDBPointer(PointerBackend):
+    """
+    DynamoDB item keyed by the base index name
+
+    Table schema: hash key ``pointer`` (S); one table can hold pointers of
+    several indexes.
+    """
+
+    name = 'dynamodb'
+
+    def __init__(self, table_name: str, pointer: str = VECTOR_INDEX):
+        self.table_name = table_name
+        self.pointer = pointer
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        from aws_clients import get_table
+        item = get_table(self.table_name).get_item(Key={'pointer': self.pointer}, ConsistentRead=True).get('Item')
+        if not item:
+            return None
+        record = {k: v for k, v in item.items() if k != 'pointer'}
+        if 'dimension' in record:
+            record['dimension'] = int(record['dimension'])
+        return record
+
+    def write(self, record: Dict[str, Any]):
+        from aws_clients import get_table
+        get_table(self.table_name).put_item(Item={'pointer': self.pointer, **record})
+
+
+class FilePointer(PointerBackend):
+    """Local JSON file (replaced atomically) - stand-in for local runs and tests"""
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        if not self.path.exists():
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, record: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def create_pointer_backend(pointer_type: Optional[str] = None, name: Optional[str] = None,
+                           base_index: str = VECTOR_INDEX) -> Optional[PointerBackend]:
+    """
+    Build the pointer backend configured by INDEX_POINTER_TYPE / INDEX_POINTER_NAME
+
+    Returns:
+        None when no pointer is configured (type 'none')
+    """
+    pointer_type = (pointer_type or INDEX_POINTER_TYPE).lower()
+    name = name if name is not None else INDEX_POINTER_NAME
+    if pointer_type == 'none':
+        return None
+    if not name:
+        raise ValueError(f"INDEX_POINTER_NAME is required for INDEX_POINTER_TYPE={pointer_type}")
+    if pointer_type == 'ssm':
+        return SSMPointer(name)
+    if pointer_type == 'dynamodb':
+        return DynamoDBPointer(name, base_index)
+    if pointer_type == 'file':
+        return FilePointer(name)
+    raise ValueError(f"Unknown INDEX_POINTER_TYPE: {pointer_type}")
+
+
+class ActiveIndex:
+    """
+    TTL-cached resolution of the active index name
+
+    The pointer is read at most once per ``ttl_seconds`` (one thread refreshes,
+    the others keep using the cached name). If a lookup fails the last known
+    name stays in use; without any, the base index name is used.
+    """
+
+    def __init__(self, backend: Optional[PointerBackend], default_index: str = VECTOR_INDEX,
+                 ttl_seconds: float = INDEX_POINTER_TTL):
+        self.backend = backend
+        self.default_index = default_index
+        self.ttl_seconds = ttl_seconds
+        self._record = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            record = self.backend.read()
+            if record and record.get('index_name'):
+                if not self._record or record['index_name'] != self._record.get('index_name'):
+                    print(f"[INFO] Active index: {record['index_name']} (version {record.get('version', '?')})")
+                self._record = record
+            elif self._record is None:
+                print(f"[WARNING] Index pointer ({self.backend.name}) not set - using {self.default_index}")
+        except Exception as e:
+            current = self._record['index_name'] if self._record else self.default_index
+            print(f"[WARNING] Index pointer lookup ({self.backend.name}) failed, keeping {current}: {str(e)}")
+        self._expires_at = time.monotonic() + self.ttl_seconds
+
+    def name(self) -> str:
+        """Active index name (cached; refreshed when the TTL expired)"""
+        if self.backend is not None and time.monotonic() >= self._expires_at:
+            if self._lock.acquire(blocking=self._record is None):
+                try:
+                    if time.monotonic() >= self._expires_at:
+                        self._refresh()
+                finally:
+                    self._lock.release()
+        return self._record['index_name'] if self._record else self.default_index
+
+    def invalidate(self):
+        """Re-read the pointer on the next lookup (e.g. after querying a deleted index)"""
+        self._expires_at = 0.0
+
+
+_active_index = None
+_active_index_lock = threading.Lock()
+
+
+def get_active_index() -> ActiveIndex:
+    """Module-level resolver for the configured pointer (created on first use)"""
+    global _active_index
+    if _active_index is None:
+        with _active_index_lock:
+            if _active_index is None:
+                _active_index = ActiveIndex(create_pointer_backend())
+    return _active_index
+
+
+def active_index_name() -> str:
+    return get_active_index().name()
@@ -8,25 +8,48 @@ import json
 import os
 import uuid
 import time
-from datetime import datetime
-from typing import Dict, List, Any
-import boto3
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 from botocore.exceptions import ClientError
 
 # Import S3 Vectors retriever
-from s3_vectors_retriever import retrieve_context
+from aws_clients import get_client, get_table
+from s3_vectors_retriever import retrieve_documents, retrieve_documents_multi, format_context, get_query_embedding
+from response_cache import get_response_cache, make_namespace
+from analytics import AnalyticsBuffer, build_analytics_item
+import metrics
+from token_budget import fit_to_budget
+from context_assembly import assemble_context
+from reranker import get_reranker, rerank, RERANK_CANDIDATES
+from warmup import is_warmup_event, run_warmup, WARMUP_ON_INIT
+from sessions import Session, load_session, save_turn, update_summary, validate_session_id
+from retrieval_filters import validate_filters, normalize_filters, apply_request_tenant, filters_key
+from index_pointer import active_index_name
 
 # Environment Variables
 MODEL_ID = os.environ['MODEL_ID']
+KB_VERSION = os.environ.get('KB_VERSION', 'unknown')
 SESSIONS_TABLE = os.environ.get('SESSIONS_TABLE', '')
 MESSAGES_TABLE = os.environ.get('MESSAGES_TABLE', '')
 ANALYTICS_TABLE = os.environ.get('ANALYTICS_TABLE', '')
 AWS_REGION = os.environ.get('AWS_REGION', 'eu-central-1')
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+RETRIEVAL_CANDIDATES = int(os.environ.get('RETRIEVAL_CANDIDATES', '8'))  # over-fetch for context assembly
+MULTI_QUERY_RETRIEVAL = os.environ.get('MULTI_QUERY_RETRIEVAL', 'false').lower() == 'true'
+MAX_SUB_QUERIES = int(os.environ.get('MAX_SUB_QUERIES', '3'))
+BACKGROUND_DRAIN_TIMEOUT = float(os.environ.get('BACKGROUND_DRAIN_TIMEOUT', '2.0'))  # seconds
 
-# AWS Clients
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION) if SESSIONS_TABLE else None
+# Background work (analytics flushes, session writes) - drained before every invocation
+# returns, because Lambda freezes the execution environment once the handler is done.
+# Futures are tracked per request context, so concurrent requests (local_server.py
+# threads) only ever wait for their own work.
+background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='background')
+_background_futures = contextvars.ContextVar('background_futures', default=None)
+
+# AWS clients are created lazily on first use (aws_clients), so e.g. validation
+# errors never pay for them
+analytics_buffer = AnalyticsBuffer(table_factory=lambda: get_table(ANALYTICS_TABLE)) if ANALYTICS_TABLE else None
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -36,61 +59,59 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Endpoint: POST /v1/chat/completions
     Request Format: OpenAI Chat Completions API
     Response Format: OpenAI Chat Completions API
+                     (chat.completion.chunk SSE frames if "stream": true)
+
+    Pipeline stages: query -> [response cache] -> retrieval -> prompt -> model,
+    with the analytics write and session update in the background (drained before returning).
+    Stage latencies are emitted as one CloudWatch EMF log line per request.
+
+    Warmup events ({"warmup": true} or an EventBridge schedule) prepare the
+    execution environment and return without calling the model.
     """
+    request_metrics = None
     try:
-        # Parse request
-        if 'body' in event:
-            body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
-        else:
-            body = event
+        if is_warmup_event(event):
+            start_analytics_flush()
+            return json_response({'warmup': run_warmup(event.get('queries'))})
+
+        # Parse and validate the request (tenant from the authorizer / tenant header goes into the filters)
+        body, request_error = parse_chat_event(event)
+        if request_error:
+            return request_error
+
+        # Streaming mode: API Gateway (REST) buffers the integration response and the
+        # Python runtime has no response streaming, so the SSE frames are collected here -
+        # the deployed Lambda gains no time to first token. Streaming hosts (asgi_app.py,
+        # local_server.py) send the frames of stream_chat_completion() as they are produced.
+        if body.get('stream'):
+            return sse_response(''.join(stream_chat_completion(body)))
 
         # Extract OpenAI-format parameters
-        messages = body.get('messages', [])
-        model = body.get('model', 'claude-3-5-sonnet')
-        temperature = body.get('temperature', 0.7)
-        max_tokens = body.get('max_tokens', 2000)
+        options = completion_options(body)
 
-        # Validate
-        if not messages:
-            return error_response(400, "messages field is required")
+        request_metrics = metrics.start_request(RequestId=getattr(context, 'aws_request_id', None))
+        start_analytics_flush()
 
-        # Extract user query
-        user_message = next((m for m in reversed(messages) if m['role'] == 'user'), None)
-        if not user_message:
-            return error_response(400, "No user message found")
+        # 1.-2. Query, response cache, retrieval and prompt assembly
+        prepared = prepare_chat(body)
 
-        # 1. Build conversation-aware query for Knowledge Base
-        query = build_contextual_query(messages, max_messages=5)
-        print(f"[INFO] Retrieving context for conversation query ({len(query)} chars)...")
-
-        # Retrieve context from S3 Vectors
-        kb_context = retrieve_context(query, max_results=5)
-
-        # 2. Prepare messages with context
-        enhanced_messages = prepare_messages_with_context(messages, kb_context)
-
-        # 3. Call Claude via Bedrock
-        print(f"[INFO] Calling Claude with {len(enhanced_messages)} messages...")
-        claude_response = call_claude(enhanced_messages, temperature, max_tokens)
+        if prepared['cached']:
+            # Served from cache: no model call, no tokens used
+            completion = cached_completion(prepared)
+        else:
+            # 3. Call Claude via Bedrock
+            print(f"[INFO] Calling Claude with {len(prepared['messages'])} messages...")
+            with metrics.stage('model'):
+                completion = call_claude(prepared['messages'], options['temperature'], options['max_tokens'])
 
-        # 4. Log analytics to DynamoDB (optional, DSGVO-compliant)
-        # NOTE: Only stores statistical data (lengths, timestamps), NO PII!
-        if dynamodb:
-            log_conversation(user_message['content'], claude_response, kb_context)
+        # 4. Cache the answer, log analytics (buffered, no PII) and store the session turn
+        finish_chat(prepared, completion['text'], completion['finish_reason'], run_in_background)
 
         # 5. Return OpenAI-compatible response
-        response = create_openai_response(claude_response, model)
-
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': json.dumps(response)
-        }
+        response = create_openai_response(completion['text'], options['model'], completion['usage'],
+                                          completion['finish_reason'])
+
+        return json_response(response)
 
     except Exception as e:
         print(f"[ERROR] Lambda handler error: {str(e)}")
@@ -98,6 +119,516 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         traceback.print_exc()
         return error_response(500, f"Internal server error: {str(e)}")
 
+    finally:
+        drain_background()
+        if request_metrics:
+            request_metrics.emit()
+
+
+def run_in_background(fn, *args, **kwargs):
+    """
+    Run work off the critical path; drain_background() waits for it before returning
+
+    The caller's context is copied, so the task records into the same request metrics.
+    """
+    futures = _background_futures.get()
+    if futures is None:
+        futures = []
+        _background_futures.set(futures)
+    future = background_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    futures.append(future)
+    return future
+
+
+def drain_background(timeout: float = BACKGROUND_DRAIN_TIMEOUT):
+    """
+    Wait for the current request's background work before the invocation ends
+    (Lambda freezes afterwards); work still running is waited for again next time
+    """
+    futures = _background_futures.get()
+    if not futures:
+        return
+    _, not_done = wait(futures, timeout=timeout)
+    futures[:] = not_done
+    if not_done:
+        print(f"[WARNING] {len(not_done)} background task(s) still running after {timeout}s")
+
+
+def start_analytics_flush():
+    """
+    Flush analytics left by earlier invocations (batching, ANALYTICS_MAX_BUFFERED > 1),
+    overlapping this request's pipeline
+    """
+    if analytics_buffer and analytics_buffer.due():
+        run_in_background(flush_analytics)
+
+
+def flush_analytics():
+    """
+    Write buffered analytics items (runs on the background executor)
+    """
+    with metrics.stage('analytics_write'):
+        analytics_buffer.flush()
+
+
+def prepare_chat(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the pre-model pipeline stages for a validated request
+
+    The stages themselves are shared with the asyncio handler (async_handler.py),
+    which awaits the same I/O calls instead.
+
+    Returns:
+        Dict with 'messages' (enhanced, ready for the model), 'kb_context',
+        'cached' (cached response or None), 'query_embedding',
+        'cache_namespace', 'user_query', 'session' (sessions.Session or None),
+        'new_messages' (the client's non-system messages) and 'filters'
+    """
+    prepared = start_chat(body)
+
+    # Server-side session: prepend the stored summary + recent turns to the new turn,
+    # and fold older turns into the summary while the model call runs
+    if body.get('session_id'):
+        with metrics.stage('session_load'):
+            session = load_chat_session(body['session_id'])
+        attach_session(prepared, session, run_in_background)
+
+    # 1. Build conversation-aware query for Knowledge Base
+    query = retrieval_query(prepared)
+
+    # Semantic response cache: near-duplicate questions skip retrieval and Converse
+    prepared['cache_namespace'] = response_cache_namespace(prepared['messages'], prepared['filters'])
+    with metrics.stage('cache_lookup'):
+        prepared['query_embedding'] = embed_query_for_cache(query)
+        cached = lookup_cached_response(prepared['query_embedding'], prepared['cache_namespace'])
+    if record_cache_result(prepared, cached):
+        return prepared
+
+    # Retrieve context from S3 Vectors (one sub-query per recent user turn in multi-query mode);
+    # with a reranker, over-fetch RERANK_CANDIDATES and keep the best RERANK_TOP_N
+    plan = plan_retrieval(prepared)
+    with metrics.stage('retrieval'):
+        if len(plan['sub_queries']) > 1:
+            documents = retrieve_documents_multi(plan['sub_queries'], max_results=plan['candidates'],
+                                                 filters=prepared['filters'])
+        else:
+            documents = retrieve_documents(query, max_results=plan['candidates'],
+                                           query_embedding=prepared['query_embedding'], filters=prepared['filters'])
+
+    if plan['reranker']:
+        documents = rerank_documents(prepared, documents, plan['reranker'])
+
+    return build_prompt(prepared, documents)
+
+
+def start_chat(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    First stage: the prepared dict (see prepare_chat) from a validated request body
+    """
+    messages = body.get('messages', [])
+    filters = normalize_filters(body.get('filters'))
+    metrics.count('FilteredRequests', 1 if filters else 0)
+    user_message = next((m for m in reversed(messages) if m['role'] == 'user'), None)
+    return {
+        'messages': messages,
+        'kb_context': '',
+        'cached': None,
+        'query_embedding': None,
+        'cache_namespace': None,
+        'user_query': user_message['content'],
+        'session': None,
+        'new_messages': [m for m in messages if m['role'] != 'system'],
+        'filters': filters
+    }
+
+
+def load_chat_session(session_id: str) -> Session:
+    """
+    Load a server-side session (blocking DynamoDB reads)
+
+    A failed load answers without stored history rather than failing; the turn is still saved.
+    """
+    try:
+        return load_session(session_id)
+    except Exception as e:
+        print(f"[WARNING] Failed to load session: {str(e)}")
+        metrics.count('SessionLoadErrors')
+        return Session(session_id)
+
+
+def attach_session(prepared: Dict[str, Any], session: Session, background):
+    """
+    Prepend the session's history to the request and start a summary update
+    through ``background`` (the handler's run_in_background) when one is due
+    """
+    prepared['session'] = session
+    prepared['messages'] = session.build_messages(prepared['messages'])
+    metrics.count('SessionHistoryMessages', len(session.messages))
+    if session.needs_summary():
+        metrics.count('SessionSummaryUpdates')
+        background(update_summary, session)
+
+
+def retrieval_query(prepared: Dict[str, Any]) -> str:
+    """Conversation-aware query for the response cache and retrieval"""
+    query = build_contextual_query(prepared['messages'], max_messages=5)
+    print(f"[INFO] Retrieving context for conversation query ({len(query)} chars)...")
+    return query
+
+
+def record_cache_result(prepared: Dict[str, Any], cached: Optional[Dict[str, Any]]) -> bool:
+    """Store the response cache lookup result; True on a hit (the request skips retrieval)"""
+    prepared['cached'] = cached
+    metrics.count('ResponseCacheHit', 1 if cached else 0)
+    return bool(cached)
+
+
+def plan_retrieval(prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Retrieval settings of a request: 'reranker' (or None), 'candidates' to
+    fetch and 'sub_queries' (more than one: multi-query retrieval)
+    """
+    reranker = get_reranker()
+    return {
+        'reranker': reranker,
+        'candidates': max(RETRIEVAL_CANDIDATES, RERANK_CANDIDATES) if reranker else RETRIEVAL_CANDIDATES,
+        'sub_queries': build_sub_queries(prepared['messages'], MAX_SUB_QUERIES) if MULTI_QUERY_RETRIEVAL else []
+    }
+
+
+def rerank_documents(prepared: Dict[str, Any], documents: List[Dict], reranker) -> List[Dict]:
+    """
+    Rerank retrieved documents against the last two user turns
+
+    Scoring keeps its own time budget (RERANK_TIMEOUT_MS) on the reranker's executor.
+    """
+    documents, rerank_stats = rerank(rerank_query(prepared['messages']), documents, reranker=reranker)
+    metrics.count('RerankFallback', rerank_stats['fallback'])
+    return documents
+
+
+def rerank_query(messages: List[Dict]) -> str:
+    """Query the reranker scores against: the last two user turns, oldest first"""
+    return ' '.join(reversed(build_sub_queries(messages, max_queries=2)))
+
+
+def build_prompt(prepared: Dict[str, Any], documents: List[Dict]) -> Dict[str, Any]:
+    """
+    Final pre-model stage: fill prepared['kb_context'] / ['messages'] from the retrieved documents
+    """
+    # 2. Select and merge context documents, fit history + context into the
+    #    prompt token budget, then prepare messages
+    with metrics.stage('context_build'):
+        documents, assembly_stats = assemble_context(documents)
+        messages, documents, budget_stats = fit_to_budget(
+            prepared['messages'], documents,
+            lambda msgs, docs: prepare_messages_with_context(msgs, format_context(docs))
+        )
+        prepared['kb_context'] = format_context(documents)
+        prepared['messages'] = prepare_messages_with_context(messages, prepared['kb_context'])
+    print(f"[INFO] Retrieved {len(prepared['kb_context'])} characters of context")
+
+    metrics.count('ContextDocumentsOverCutoff', assembly_stats['over_cutoff'])
+    metrics.count('ContextDocumentsMerged', assembly_stats['merged'])
+    metrics.count('PromptTokensEstimate', budget_stats['prompt_tokens'])
+    metrics.count('TrimmedMessages', budget_stats['trimmed_messages'])
+    metrics.count('TrimmedDocuments', budget_stats['trimmed_documents'])
+    return prepared
+
+
+def cached_completion(prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """Completion served from the response cache: no model call, no tokens used"""
+    return {'text': prepared['cached']['text'], 'usage': {}, 'finish_reason': 'stop'}
+
+
+def finish_chat(prepared: Dict[str, Any], response_text: str, finish_reason: str, background):
+    """
+    Post-model stage: cache a grounded answer and store the session turn
+    through ``background`` (the handler's run_in_background), log analytics
+    """
+    if not prepared['cached'] and prepared['kb_context'] and finish_reason == 'stop':
+        background(store_cached_response, prepared['query_embedding'], prepared['cache_namespace'],
+                   {'text': response_text})
+
+    # Log analytics to DynamoDB (optional, DSGVO-compliant, written in the background)
+    # NOTE: Only stores statistical data (lengths, timestamps), NO PII!
+    log_conversation(prepared['user_query'], response_text, prepared['kb_context'],
+                     cache_hit=bool(prepared['cached']), background=background)
+    if prepared['session'] is not None:
+        background(store_session_turn, prepared['session'], prepared['new_messages'], response_text)
+
+
+def json_response(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Create successful JSON response (API Gateway proxy format)
+    """
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type'
+        },
+        'body': json.dumps(payload)
+    }
+
+
+def sse_response(body: str) -> Dict[str, Any]:
+    """
+    Collected SSE frames as one response (API Gateway proxy format)
+    """
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type'
+        },
+        'body': body
+    }
+
+
+def get_system_prompt(messages: List[Dict]) -> str:
+    """
+    Concatenated client-supplied system messages (part of the response cache namespace)
+    """
+    return "\n".join(m.get('content', '') for m in messages if m.get('role') == 'system')
+
+
+def response_cache_namespace(messages: List[Dict], filters: Dict[str, List[str]]) -> str:
+    """
+    Response cache namespace: KB version, active index (blue/green pointer), model,
+    client system prompt and filters
+    """
+    return make_namespace(KB_VERSION, MODEL_ID, get_system_prompt(messages), filters_key(filters),
+                          active_index_name())
+
+
+def embed_query_for_cache(query: str) -> Optional[List[float]]:
+    """
+    Compute the query embedding up front when the semantic response cache is on
+
+    The same embedding is passed to retrieve_documents(), so the cache adds no
+    extra Titan call. Returns None (retrieval embeds on its own) when the
+    cache is disabled or embedding fails.
+    """
+    if not get_response_cache():
+        return None
+    try:
+        return get_query_embedding(query)
+    except Exception as e:
+        print(f"[WARNING] Query embedding for response cache failed: {str(e)}")
+        return None
+
+
+def lookup_cached_response(query_embedding: Optional[List[float]], namespace: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a previously answered near-duplicate query
+    """
+    cache = get_response_cache()
+    if not cache or query_embedding is None:
+        return None
+    cached = cache.lookup(query_embedding, namespace)
+    stats = cache.stats()
+    print(f"[INFO] Response cache: {stats['hits']} hits / {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate, {stats['size']} entries)")
+    return cached
+
+
+def store_cached_response(query_embedding: Optional[List[float]], namespace: str, response: Dict[str, Any]):
+    """
+    Remember a completion for future near-duplicate queries
+
+    Only called for answers grounded in retrieved context, so a failed
+    retrieval never poisons the cache.
+    """
+    cache = get_response_cache()
+    if cache and query_embedding is not None:
+        cache.store(query_embedding, namespace, response)
+
+
+def parse_request_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the JSON request body from an API Gateway event (or a raw invoke payload)
+    """
+    if 'body' in event:
+        return json.loads(event['body']) if isinstance(event['body'], str) else event['body']
+    return event
+
+
+def parse_chat_event(event: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Request body of a chat event with the caller's tenant applied, validated
+
+    Returns:
+        (body, None), or (None, error response) for a 403 / 400
+    """
+    body = parse_request_body(event)
+    tenant_error = apply_request_tenant(body, event)
+    if tenant_error:
+        return None, error_response(403, tenant_error)
+
+    validation_error = validate_chat_request(body)
+    if validation_error:
+        return None, error_response(400, validation_error)
+    return body, None
+
+
+def completion_options(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    OpenAI request parameters: 'model', 'temperature', 'max_tokens', 'include_usage'
+    """
+    return {
+        'model': body.get('model', 'claude-3-5-sonnet'),
+        'temperature': body.get('temperature', 0.7),
+        'max_tokens': body.get('max_tokens', 2000),
+        # OpenAI stream_options.include_usage: final chunk with empty choices and usage
+        'include_usage': bool((body.get('stream_options') or {}).get('include_usage'))
+    }
+
+
+def validate_chat_request(body: Dict[str, Any]) -> Optional[str]:
+    """
+    Validate an OpenAI-format chat request
+
+    Returns:
+        Error message for a 400 response, or None if the request is valid
+    """
+    messages = body.get('messages', [])
+    if not messages:
+        return "messages field is required"
+
+    if not any(m.get('role') == 'user' for m in messages):
+        return "No user message found"
+
+    filters_error = validate_filters(body.get('filters'))
+    if filters_error:
+        return filters_error
+
+    if body.get('session_id') is not None:
+        return validate_session_id(body['session_id'])
+
+    return None
+
+
+def stream_chat_completion(body: Dict[str, Any]) -> Iterator[str]:
+    """
+    Streaming variant of the chat pipeline (OpenAI "stream": true)
+
+    Yields Server-Sent Events frames ("data: {...}\n\n") containing
+    chat.completion.chunk objects as tokens arrive from Bedrock ConverseStream,
+    terminated by "data: [DONE]". The request must already be validated.
+
+    Background work is drained and the metrics are emitted in a finally block,
+    so a client that disconnects (the host closes the generator) loses nothing
+    but the frames it no longer reads.
+    """
+    options = completion_options(body)
+    request_metrics = metrics.start_request(Stream=True)
+    chat_stream = ChatStream(options['model'], options['include_usage'], request_metrics)
+
+    try:
+        # Send the role frame right away so clients can render before retrieval finishes
+        yield chat_stream.role_frame()
+
+        start_analytics_flush()
+        try:
+            prepared = prepare_chat(body)
+
+            if prepared['cached']:
+                yield chat_stream.content_frame(prepared['cached']['text'])
+            else:
+                print(f"[INFO] Streaming Claude response for {len(prepared['messages'])} messages...")
+                with metrics.stage('model'):
+                    for event in stream_claude(prepared['messages'], options['temperature'], options['max_tokens']):
+                        frame = chat_stream.on_event(event)
+                        if frame:
+                            yield frame
+
+        except Exception as e:
+            yield from chat_stream.error_frames(e)
+            return
+
+        # The answer is complete: store it before the last frames, which a client may not wait for
+        finish_chat(prepared, chat_stream.text, chat_stream.finish_reason, run_in_background)
+        yield from chat_stream.final_frames()
+
+    finally:
+        drain_background()
+        request_metrics.emit()
+
+
+class ChatStream:
+    """
+    SSE frames of one streamed completion (shared with the asyncio handler)
+
+    Collects the streamed text, finish reason and usage as model events are
+    turned into chat.completion.chunk frames.
+    """
+
+    def __init__(self, model: str, include_usage: bool, request_metrics: metrics.RequestMetrics):
+        self.model = model
+        self.include_usage = include_usage
+        self.request_metrics = request_metrics
+        self.completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        self.created = int(time.time())
+        self.parts = []
+        self.finish_reason = 'stop'
+        self.usage = {}
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    def chunk(self, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return create_openai_chunk(self.completion_id, self.created, self.model, delta, finish_reason)
+
+    def role_frame(self) -> str:
+        return format_sse(self.chunk({'role': 'assistant'}))
+
+    def content_frame(self, text: str) -> str:
+        self.parts.append(text)
+        return format_sse(self.chunk({'content': text}))
+
+    def on_event(self, event: Dict[str, Any]) -> Optional[str]:
+        """Record a stream_claude event; returns the frame to send, if any"""
+        if 'text' in event:
+            if not self.parts:
+                self.request_metrics.mark('first_token')
+            return self.content_frame(event['text'])
+        if 'stop_reason' in event:
+            self.finish_reason = map_finish_reason(event['stop_reason'])
+        elif 'usage' in event:
+            self.usage = event['usage']
+        return None
+
+    def final_frames(self) -> List[str]:
+        frames = [format_sse(self.chunk({}, self.finish_reason))]
+        if self.include_usage:
+            usage_chunk = self.chunk({})
+            usage_chunk['choices'] = []
+            usage_chunk['usage'] = openai_usage(self.usage)
+            frames.append(format_sse(usage_chunk))
+        frames.append("data: [DONE]\n\n")
+        return frames
+
+    def error_frames(self, error: Exception) -> List[str]:
+        """Headers are already sent - report the error in-band, OpenAI style"""
+        print(f"[ERROR] Streaming error: {str(error)}")
+        return [
+            format_sse({
+                'error': {
+                    'message': f"Internal server error: {str(error)}",
+                    'type': 'server_error',
+                    'code': 500
+                }
+            }),
+            "data: [DONE]\n\n"
+        ]
+
 
 def build_contextual_query(messages: List[Dict], max_messages: int = 5) -> str:
     """
@@ -166,7 +697,7 @@ CRITICAL RULES:
 2. ONLY answer based on the provided information
 3. If information is not available, say: "I don't have that information in my knowledge base."
 
-SPECIAL COMMAND: If the user asks for "knowledge base version" or "KB version", respond with: "The current knowledge base version is: {os.environ.get('KB_VERSION', 'unknown')}"
+SPECIAL COMMAND: If the user asks for "knowledge base version" or "KB version", respond with: "The current knowledge base version is: {KB_VERSION}"
 
 Here is relevant information from the knowledge base:
 
@@ -181,8 +712,11 @@ Format your responses with Markdown for better readability (bold, lists, etc.).
 """.strip()
 
         if system_idx is not None:
-            # Append to existing system message
-            enhanced[system_idx]['content'] += "\n\n" + context_instruction
+            # Append to existing system message (copy - don't mutate the caller's message)
+            enhanced[system_idx] = {
+                **enhanced[system_idx],
+                'content': enhanced[system_idx]['content'] + "\n\n" + context_instruction
+            }
         else:
             # Insert new system message at beginning
             enhanced.insert(0, {
@@ -193,9 +727,9 @@ Format your responses with Markdown for better readability (bold, lists, etc.).
     return enhanced
 
 
-def call_claude(messages: List[Dict], temperature: float, max_tokens: int) -> str:
+def build_converse_params(messages: List[Dict], temperature: float, max_tokens: int) -> Dict[str, Any]:
     """
-    Call LLM via Bedrock Converse API (works for Claude, Nova, etc.)
+    Convert OpenAI-format messages into Bedrock Converse API parameters
     """
     # Separate system message
     system_prompts = []
@@ -223,24 +757,131 @@ def call_claude(messages: List[Dict], temperature: float, max_tokens: int) -> st
     if system_prompts:
         converse_params['system'] = system_prompts
 
+    return converse_params
+
+
+def call_claude(messages: List[Dict], temperature: float, max_tokens: int) -> Dict[str, Any]:
+    """
+    Call LLM via Bedrock Converse API (works for Claude, Nova, etc.)
+
+    Returns:
+        Dict with 'text', 'usage' (Bedrock usage block) and 'finish_reason' (OpenAI)
+    """
+    converse_params = build_converse_params(messages, temperature, max_tokens)
+
     # Call Bedrock Converse API
     try:
-        response = bedrock_runtime.converse(**converse_params)
+        response = get_client('bedrock-runtime').converse(**converse_params)
+        return parse_converse_response(response)
+
+    except ClientError as e:
+        raise bedrock_error(e)
+
 
-        # Extract text from response
-        output_message = response['output']['message']
-        text = ''.join([block['text'] for block in output_message['content'] if 'text' in block])
+def parse_converse_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Text, usage and OpenAI finish_reason of a Converse response (records token usage)
+    """
+    output_message = response['output']['message']
+    text = ''.join([block['text'] for block in output_message['content'] if 'text' in block])
 
-        print(f"[INFO] Model response: {len(text)} chars")
-        return text
+    usage = response.get('usage', {})
+    record_token_usage(usage)
+    print(f"[INFO] Model response: {len(text)} chars, {usage.get('totalTokens', 0)} tokens")
+    return {
+        'text': text,
+        'usage': usage,
+        'finish_reason': map_finish_reason(response.get('stopReason', 'end_turn'))
+    }
+
+
+def stream_claude(messages: List[Dict], temperature: float, max_tokens: int) -> Iterator[Dict[str, Any]]:
+    """
+    Call LLM via Bedrock ConverseStream API
+
+    Yields:
+        {'text': str} for every text delta, then {'stop_reason': str}
+        and {'usage': dict} (Bedrock usage block)
+    """
+    converse_params = build_converse_params(messages, temperature, max_tokens)
+
+    try:
+        response = get_client('bedrock-runtime').converse_stream(**converse_params)
+
+        total_chars = 0
+        for event in response['stream']:
+            parsed = parse_stream_event(event)
+            if parsed:
+                total_chars += len(parsed.get('text', ''))
+                yield parsed
+
+        print(f"[INFO] Streamed model response: {total_chars} chars")
 
     except ClientError as e:
-        error_msg = f"Bedrock API error: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        raise RuntimeError(error_msg)
+        raise bedrock_error(e)
+
+
+def bedrock_error(error: ClientError) -> RuntimeError:
+    """
+    Log a Bedrock API error and wrap it for the handler's 500 response
+    """
+    error_msg = f"Bedrock API error: {str(error)}"
+    print(f"[ERROR] {error_msg}")
+    return RuntimeError(error_msg)
 
 
-def create_openai_response(text: str, model: str) -> Dict[str, Any]:
+def parse_stream_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    ConverseStream event -> {'text'} / {'stop_reason'} / {'usage'} (None for other events)
+    """
+    if 'contentBlockDelta' in event:
+        text = event['contentBlockDelta']['delta'].get('text', '')
+        return {'text': text} if text else None
+    if 'messageStop' in event:
+        return {'stop_reason': event['messageStop'].get('stopReason', 'end_turn')}
+    if 'metadata' in event:
+        usage = event['metadata'].get('usage', {})
+        record_token_usage(usage)
+        return {'usage': usage}
+    return None
+
+
+def record_token_usage(usage: Dict[str, Any]):
+    """
+    Add Bedrock token usage to the request metrics
+    """
+    metrics.count('InputTokens', usage.get('inputTokens', 0))
+    metrics.count('OutputTokens', usage.get('outputTokens', 0))
+
+
+def map_finish_reason(stop_reason: str) -> str:
+    """
+    Map a Bedrock Converse stopReason to an OpenAI finish_reason
+    """
+    if stop_reason == 'max_tokens':
+        return 'length'
+    if stop_reason == 'content_filtered':
+        return 'content_filter'
+    if stop_reason == 'tool_use':
+        return 'tool_calls'
+    return 'stop'
+
+
+def openai_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Convert a Bedrock Converse usage block to OpenAI usage fields
+    """
+    prompt_tokens = usage.get('inputTokens', 0)
+    completion_tokens = usage.get('outputTokens', 0)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": usage.get('totalTokens', prompt_tokens + completion_tokens)
+    }
+
+
+def create_openai_response(text: str, model: str, usage: Optional[Dict[str, Any]] = None,
+                           finish_reason: str = 'stop') -> Dict[str, Any]:
     """
     Create OpenAI-compatible Chat Completion response
     """
@@ -256,18 +897,41 @@ def create_openai_response(text: str, model: str) -> Dict[str, Any]:
                     "role": "assistant",
                     "content": text
                 },
-                "finish_reason": "stop"
+                "finish_reason": finish_reason
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,  # Bedrock doesn't provide token counts
-            "completion_tokens": 0,
-            "total_tokens": 0
-        }
+        "usage": openai_usage(usage or {})
     }
 
 
-def log_conversation(query: str, response: str, context: str):
+def create_openai_chunk(completion_id: str, created: int, model: str, delta: Dict[str, Any],
+                        finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Create OpenAI-compatible Chat Completion chunk (streaming)
+    """
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason
+            }
+        ]
+    }
+
+
+def format_sse(payload: Dict[str, Any]) -> str:
+    """
+    Encode a payload as a Server-Sent Events data frame
+    """
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def log_conversation(query: str, response: str, context: str, cache_hit: bool = False, background=None):
     """
     Log analytics metrics to DynamoDB (DSGVO-compliant - no PII!)
 
@@ -280,35 +944,52 @@ def log_conversation(query: str, response: str, context: str):
     - Actual query/response text
     - User identifiable information
     - Personal data
+
+    No DynamoDB call happens here: once the buffer is due (by default right
+    away, see analytics.AnalyticsBuffer) the write runs through ``background``,
+    the handler's run_in_background, and is drained with the request.
     """
-    try:
-        if not MESSAGES_TABLE:
-            return
+    if not analytics_buffer:
+        return
 
-        table = dynamodb.Table(MESSAGES_TABLE)
-
-        timestamp = datetime.utcnow().isoformat()
-        message_id = str(uuid.uuid4())
-        session_id = str(uuid.uuid4())  # Generate session ID
-
-        # Analytics-only: NO PII!
-        table.put_item(Item={
-            'session_id': session_id,  # Required partition key
-            'message_id': message_id,
-            'timestamp': timestamp,
-            # Statistical data only
-            'query_length': len(query),
-            'response_length': len(response),
-            'context_used': bool(context),
-            'context_length': len(context),
-            'ttl': int(time.time()) + (30 * 24 * 60 * 60)  # 30 days TTL
-        })
+    analytics_buffer.add(build_analytics_item(str(uuid.uuid4()), query, response, context, cache_hit))
+    if background and analytics_buffer.due():
+        background(flush_analytics)
 
-        print(f"[INFO] Logged analytics to DynamoDB: {message_id}")
 
-    except Exception as e:
-        print(f"[WARNING] Failed to log to DynamoDB: {str(e)}")
-        # Don't fail the request if logging fails
+def store_session_turn(session, new_messages: List[Dict], response_text: str):
+    """
+    Write a session turn to DynamoDB (runs on the background executor)
+    """
+    with metrics.stage('session_write'):
+        try:
+            save_turn(session, new_messages, response_text)
+        except Exception as e:
+            print(f"[WARNING] Failed to store session turn: {str(e)}")
+
+
+def build_sub_queries(messages: List[Dict], max_queries: int = 3) -> List[str]:
+    """
+    One retrieval query per recent user turn (newest first, duplicates removed)
+
+    Unlike build_contextual_query, every turn is embedded on its own, so a
+    follow-up like "And the times?" does not dilute the earlier question.
+
+    Args:
+        messages: Full conversation history
+        max_queries: Max number of sub-queries
+
+    Returns:
+        List of query strings
+    """
+    queries = []
+    for msg in reversed(messages):
+        content = (msg.get('content') or '').strip()
+        if msg.get('role') == 'user' and content and content not in queries:
+            queries.append(content)
+            if len(queries) >= max_queries:
+                break
+    return queries
 
 
 def error_response(status_code: int, message: str) -> Dict[str, Any]:
@@ -329,3 +1010,11 @@ def error_response(status_code: int, message: str) -> Dict[str, Any]:
             }
         })
     }
+
+
+# Provisioned concurrency: warm up during init, before the environment gets traffic
+if WARMUP_ON_INIT and os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency':
+    try:
+        run_warmup()
+    except Exception as e:
+        print(f"[WARNING] Init warmup failed: {str(e)}")
@@ -0,0 +1,288 @@
+"""
+Local (offline) vector search backend - drop-in for S3 Vectors query_vectors
+Memory-mapped float32 embedding matrix + JSON metadata sidecar, NumPy cosine top-K
+
+Index directory layout (written by build_s3_vectors_index.py --export-local):
+    vectors.npy         float32 [N, D], rows L2-normalized
+    vectors.f16.npy     float16 [N, D] copy            (storage "float16")
+    vectors.i8.npy      int8 [N, D] codes              (storage "int8")
+    vector_scales.npy   float32 [N] per-row scales     (storage "int8")
+    metadata.json       list of {"key": ..., "metadata": {...}} aligned with the rows
+    index.json          {"dimension": D, "count": N, "distance_metric": "cosine", "storage": ...}
+
+Compact storage: queries scan the float16 / int8 matrix (2x / 4x less memory
+touched per query), then rescore a shortlist of top_k * LOCAL_RESCORE_FACTOR
+rows exactly against the float32 matrix, which is only paged in for those rows.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Callable
+
+# Configuration
+LOCAL_INDEX_DIR = os.environ.get('LOCAL_INDEX_DIR', '')
+LOCAL_INDEX_STORAGE = os.environ.get('LOCAL_INDEX_STORAGE', '')  # '' = as built | float32 | float16 | int8
+LOCAL_RESCORE_FACTOR = int(os.environ.get('LOCAL_RESCORE_FACTOR', '4'))  # shortlist = top_k * factor
+SCAN_BLOCK_ROWS = 512  # rows converted to float32 per step of the compact scan (buffer stays in CPU cache)
+
+VECTORS_FILE = 'vectors.npy'
+METADATA_FILE = 'metadata.json'
+INDEX_FILE = 'index.json'
+
+STORAGE_TYPES = ('float32', 'float16', 'int8')
+COMPACT_FILES = {'float16': 'vectors.f16.npy', 'int8': 'vectors.i8.npy'}
+SCALES_FILE = 'vector_scales.npy'
+
+
+def quantize_int8(vectors) -> tuple:
+    """
+    Symmetric per-row int8 quantization
+
+    Returns:
+        (codes int8 [N, D], scales float32 [N]) with vectors ~= codes * scales[:, None]
+    """
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def compact_vectors(vectors, storage: str) -> tuple:
+    """
+    Compact copy of a float32 matrix
+
+    Returns:
+        (matrix, scales) - scales is None except for int8
+    """
+    import numpy as np
+
+    if storage == 'float16':
+        return np.asarray(vectors, dtype=np.float16), None
+    if storage == 'int8':
+        return quantize_int8(vectors)
+    raise ValueError(f"Unknown storage type: {storage} (expected one of {', '.join(STORAGE_TYPES)})")
+
+
+def write_compact_vectors(index_dir: str, storage: str):
+    """Write the compact matrix for an index directory's vectors.npy (block-wise, memory-mapped)"""
+    import numpy as np
+    from numpy.lib.format import open_memmap
+
+    index_dir = Path(index_dir)
+    vectors = np.load(index_dir / VECTORS_FILE, mmap_mode='r')
+    dtype = np.float16 if storage == 'float16' else np.int8
+    matrix = open_memmap(index_dir / COMPACT_FILES[storage], mode='w+', dtype=dtype, shape=vectors.shape)
+    scales = np.ones(len(vectors), dtype=np.float32) if storage == 'int8' else None
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        end = start + SCAN_BLOCK_ROWS
+        block, block_scales = compact_vectors(vectors[start:end], storage)
+        matrix[start:end] = block
+        if scales is not None:
+            scales[start:end] = block_scales
+    matrix.flush()
+    del matrix
+    if scales is not None:
+        np.save(index_dir / SCALES_FILE, scales)
+
+
+class LocalVectorStore:
+    """
+    Cosine top-K search over a memory-mapped embedding matrix
+
+    The matrix is mapped read-only, so loading is cheap and pages are shared
+    with the OS page cache; results mimic S3 Vectors' ``vectors`` entries
+    (key, distance = 1 - cosine similarity, metadata).
+
+    With float16 / int8 storage the compact matrix is scanned first and only
+    the shortlist is rescored in float32, so returned distances are exact.
+    An index built without the compact file is quantized in memory on load.
+    """
+
+    def __init__(self, index_dir: str, storage: Optional[str] = None,
+                 rescore_factor: int = LOCAL_RESCORE_FACTOR):
+        import numpy as np
+
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / INDEX_FILE, 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+        with open(self.index_dir / METADATA_FILE, 'r', encoding='utf-8') as f:
+            self.entries = json.load(f)
+
+        self.vectors = np.load(self.index_dir / VECTORS_FILE, mmap_mode='r')
+        self.dimension = int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+        if len(self.entries) != len(self.vectors):
+            raise ValueError(f"Local index is inconsistent: {len(self.vectors)} vectors, "
+                             f"{len(self.entries)} metadata entries")
+
+        self.storage = storage or LOCAL_INDEX_STORAGE or self.info.get('storage', 'float32')
+        self.rescore_factor = max(1, rescore_factor)
+        self.compact, self.scales = None, None
+        if self.storage != 'float32':
+            self._load_compact()
+
+    def _load_compact(self):
+        import numpy as np
+
+        path = self.index_dir / COMPACT_FILES.get(self.storage, VECTORS_FILE)
+        if self.storage in COMPACT_FILES and path.exists():
+            self.compact = np.load(path, mmap_mode='r')
+            if self.storage == 'int8':
+                self.scales = np.load(self.index_dir / SCALES_FILE)
+        else:
+            print(f"[INFO] Local index has no {self.storage} copy - quantizing in memory")
+            self.compact, self.scales = compact_vectors(self.vectors, self.storage)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def scan_bytes(self) -> int:
+        """Bytes of vector data read by a full (unfiltered) scan"""
+        if self.compact is None:
+            return int(self.vectors.nbytes)
+        return int(self.compact.nbytes) + (int(self.scales.nbytes) if self.scales is not None else 0)
+
+    def _approximate_scores(self, query, rows):
+        import numpy as np
+
+        matrix = self.compact if rows is None else self.compact[rows]
+        scores = np.empty(len(matrix), dtype=np.float32)
+        buffer = np.empty((min(SCAN_BLOCK_ROWS, len(matrix)), self.dimension), dtype=np.float32)
+        for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+            block = matrix[start:start + SCAN_BLOCK_ROWS]
+            converted = buffer[:len(block)]
+            np.copyto(converted, block, casting='unsafe')
+            np.dot(converted, query, out=scores[start:start + len(block)])
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def query(self, query_vector: List[float], top_k: int,
+              predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the top_k most similar vectors (best first)
+
+        With a predicate only rows whose metadata it accepts are searched
+        (evaluated per row - fine for the corpus sizes this backend serves).
+        """
+        import numpy as np
+
+        if not len(self.entries) or top_k <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != self.dimension:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self.dimension}")
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rows = None
+        if predicate is not None:
+            rows = np.fromiter((i for i, entry in enumerate(self.entries) if predicate(entry['metadata'])),
+                               dtype=np.int64)
+            if not len(rows):
+                return []
+        searched = len(self.entries) if rows is None else len(rows)
+        k = min(top_k, searched)
+
+        if self.compact is None:
+            scores = self.vectors @ query if rows is None else self.vectors[rows] @ query
+            top = _top_k(scores, k)
+            row_ids = top if rows is None else rows[top]
+        else:
+            # Phase 1: approximate scan of the compact matrix -> shortlist
+            shortlist = _top_k(self._approximate_scores(query, rows), min(searched, k * self.rescore_factor))
+            candidates = np.sort(shortlist if rows is None else rows[shortlist])
+            # Phase 2: exact float32 rescoring of the shortlist only
+            scores = self.vectors[candidates] @ query
+            top = _top_k(scores, k)
+            row_ids = candidates[top]
+
+        return [
+            {
+                'key': self.entries[row]['key'],
+                'distance': float(1.0 - scores[i]),
+                'metadata': self.entries[row]['metadata']
+            }
+            for i, row in zip(top, row_ids)
+        ]
+
+
+def _top_k(scores, k: int):
+    """Indices of the k highest scores, best first"""
+    import numpy as np
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class LocalIndexWriter:
+    """
+    Writes a local index incrementally (rows may arrive in any order)
+
+    The matrix is created as a memory-mapped .npy of the final size, so the
+    builder never holds all embeddings in memory. float16 / int8 storage adds
+    the compact copy on close (the float32 matrix is kept for rescoring).
+    """
+
+    def __init__(self, index_dir: str, count: int, dimension: int, storage: str = 'float32', **info):
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage type: {storage} (expected one of {', '.join(STORAGE_TYPES)})")
+        self.storage = storage
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors = open_memmap(self.index_dir / VECTORS_FILE, mode='w+', dtype=np.float32,
+                                   shape=(count, dimension))
+        self.entries = [None] * count
+        self.info = {'dimension': dimension, 'count': count, 'distance_metric': 'cosine', 'storage': storage,
+                     **info}
+
+    def write(self, row: int, key: str, embedding: List[float], metadata: Dict[str, Any]):
+        import numpy as np
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        self.vectors[row] = vector / norm if norm else vector
+        self.entries[row] = {'key': key, 'metadata': metadata}
+
+    def close(self):
+        missing = sum(1 for entry in self.entries if entry is None)
+        if missing:
+            raise ValueError(f"Local index incomplete: {missing} rows were never written")
+
+        self.vectors.flush()
+        del self.vectors
+        if self.storage != 'float32':
+            write_compact_vectors(self.index_dir, self.storage)
+        with open(self.index_dir / METADATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, separators=(',', ':'))
+        with open(self.index_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.info, f, indent=2)
+
+
+_local_store = None
+
+
+def get_local_store(index_dir: Optional[str] = None) -> LocalVectorStore:
+    """
+    Lazily load the local index (first query on a cold start), then keep it
+    resident for warm invocations
+    """
+    global _local_store
+    if _local_store is None:
+        index_dir = index_dir or LOCAL_INDEX_DIR
+        if not index_dir:
+            raise RuntimeError("LOCAL_INDEX_DIR is not set")
+        print(f"[INFO] Loading local vector index from {index_dir}")
+        _local_store = LocalVectorStore(index_dir)
+        print(f"[INFO] Loaded {len(_local_store)} vectors (dimension={_local_store.dimension}, "
+              f"storage={_local_store.storage})")
+    return _local_store
@@ -0,0 +1,173 @@
+"""
+Per-request latency instrumentation with CloudWatch Embedded Metric Format (EMF) output
+One structured log line per request - CloudWatch extracts the metrics, no PutMetricData calls
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Tuple
+
+# Configuration
+METRICS_MODE = os.environ.get('METRICS_MODE', 'emf').lower()  # emf | debug | off
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'BedrockRAG')
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+
+# Stage name -> EMF metric name (all in milliseconds)
+STAGE_METRICS = {
+    'session_load': 'SessionLoadLatency',
+    'cache_lookup': 'CacheLookupLatency',
+    'embed': 'EmbedLatency',
+    'vector_query': 'VectorQueryLatency',
+    'keyword_query': 'KeywordQueryLatency',
+    'retrieval': 'RetrievalLatency',
+    'rerank': 'RerankLatency',
+    'context_build': 'ContextBuildLatency',
+    'model': 'ModelLatency',
+    'first_token': 'FirstTokenLatency',
+    'analytics_write': 'AnalyticsWriteLatency',
+    'session_write': 'SessionWriteLatency',
+    'total': 'TotalLatency',
+}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_listeners = []
+
+
+class RequestMetrics:
+    """
+    Collects stage timings, counts and properties for one request
+
+    Recording is a dict write under a lock (stages also run on pool threads);
+    emit() prints a single EMF JSON line.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE, function_name: str = FUNCTION_NAME):
+        self.namespace = namespace
+        self.function_name = function_name
+        self.timings = {}
+        self.counts = {}
+        self.properties = {}
+        self.start = time.perf_counter()
+        self._intervals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage (repeated stages accumulate, concurrent ones count once)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_interval(name, start, time.perf_counter())
+
+    def add_interval(self, name: str, start: float, end: float):
+        """
+        Add a stage run (perf_counter start / end); the timing is the wall time
+        covered by all runs, so parallel embeds read as latency, not as a sum
+        """
+        with self._lock:
+            intervals = self._intervals.setdefault(name, [])
+            intervals.append((start, end))
+            self.timings[name] = round(_covered_seconds(intervals) * 1000, 2)
+
+    def mark(self, name: str):
+        """Record the time elapsed since the request started (e.g. first_token)"""
+        with self._lock:
+            self.timings[name] = round((time.perf_counter() - self.start) * 1000, 2)
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def put_property(self, name: str, value: Any):
+        """Non-metric context (searchable in Logs Insights, not a dimension)"""
+        self.properties[name] = value
+
+    def to_emf(self) -> Dict[str, Any]:
+        metrics = []
+        record = {}
+
+        for name, value in self.timings.items():
+            metric_name = STAGE_METRICS.get(name, name)
+            metrics.append({'Name': metric_name, 'Unit': 'Milliseconds'})
+            record[metric_name] = value
+
+        for name, value in self.counts.items():
+            metrics.append({'Name': name, 'Unit': 'Count'})
+            record[name] = value
+
+        record.update(self.properties)
+        record['FunctionName'] = self.function_name
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': self.namespace,
+                'Dimensions': [['FunctionName']],
+                'Metrics': metrics
+            }]
+        }
+        return record
+
+    def emit(self):
+        """Write the EMF log line (and a readable summary in debug mode)"""
+        self.mark('total')
+        for listener in _listeners:
+            listener(self)
+        if METRICS_MODE == 'off':
+            return
+        print(json.dumps(self.to_emf(), separators=(',', ':')))
+        if METRICS_MODE == 'debug':
+            print(f"[DEBUG] Stage timings (ms): {json.dumps(self.timings)} counts: {json.dumps(self.counts)}")
+
+
+def _covered_seconds(intervals: List[Tuple[float, float]]) -> float:
+    """Length of the union of (start, end) intervals"""
+    covered = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+
+def add_listener(callback: Callable[[RequestMetrics], None]):
+    """Call ``callback`` with every finished request's metrics (benchmarks, load tests)"""
+    _listeners.append(callback)
+
+
+def start_request(**properties) -> RequestMetrics:
+    """Begin collecting metrics for the current request (context-local)"""
+    metrics = RequestMetrics()
+    for name, value in properties.items():
+        if value is not None:
+            metrics.put_property(name, value)
+    _current.set(metrics)
+    return metrics
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current request (no-op outside a request)"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def count(name: str, value: float = 1):
+    """Add to a count of the current request (no-op outside a request)"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value)
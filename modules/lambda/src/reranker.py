@@ -0,0 +1,184 @@
+"""
+Re-ranking of retrieved candidates before context assembly
+Bedrock rerank models (one batched Rerank call) or a local scorer, within a strict time budget
+
+Retrieval over-fetches RERANK_CANDIDATES documents; the reranker scores all of
+them in one call and keeps the best RERANK_TOP_N. If scoring fails or exceeds
+RERANK_TIMEOUT_MS the candidates keep their retrieval order.
+"""
+
+import os
+import importlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple, Callable, Optional
+
+import metrics
+
+# Configuration
+RERANK_MODE = os.environ.get('RERANK_MODE', 'off').lower()  # off | bedrock | local
+RERANK_MODEL_ID = os.environ.get('RERANK_MODEL_ID', 'amazon.rerank-v1:0')  # or cohere.rerank-v3-5:0
+RERANK_CANDIDATES = int(os.environ.get('RERANK_CANDIDATES', '30'))  # over-fetched from retrieval
+RERANK_TOP_N = int(os.environ.get('RERANK_TOP_N', '8'))  # kept for context assembly
+RERANK_TIMEOUT_MS = float(os.environ.get('RERANK_TIMEOUT_MS', '800'))
+RERANK_MAX_CHARS = int(os.environ.get('RERANK_MAX_CHARS', '2000'))  # per candidate text
+RERANK_SCORER = os.environ.get('RERANK_SCORER', '')  # local mode: "module:function" (query, texts) -> scores
+AWS_REGION = os.environ.get('AWS_REGION', 'eu-central-1')
+
+# Scoring runs here so the request thread can stop waiting at the time budget
+rerank_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='rerank')
+
+
+class Reranker:
+    """
+    Interface for re-ranking backends
+
+    score() rates all candidate texts against the query in one call;
+    higher is better, scale is backend-specific.
+    """
+
+    name = 'base'
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+
+class BedrockReranker(Reranker):
+    """Bedrock rerank model via the bedrock-agent-runtime Rerank API (scores 0..1)"""
+
+    name = 'bedrock'
+
+    def __init__(self, client=None, model_id: str = RERANK_MODEL_ID, region: str = AWS_REGION):
+        self.client = client
+        self.model_arn = model_id if model_id.startswith('arn:') else \
+            f"arn:aws:bedrock:{region}::foundation-model/{model_id}"
+
+    def _get_client(self):
+        if self.client is None:
+            from aws_clients import get_client
+            return get_client('bedrock-agent-runtime')
+        return self.client
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        response = self._get_client().rerank(
+            queries=[{'type': 'TEXT', 'textQuery': {'text': query}}],
+            sources=[
+                {'type': 'INLINE', 'inlineDocumentSource': {'type': 'TEXT', 'textDocument': {'text': text}}}
+                for text in texts
+            ],
+            rerankingConfiguration={
+                'type': 'BEDROCK_RERANKING_MODEL',
+                'bedrockRerankingConfiguration': {
+                    'numberOfResults': len(texts),
+                    'modelConfiguration': {'modelArn': self.model_arn}
+                }
+            }
+        )
+        scores = [0.0] * len(texts)
+        for result in response.get('results', []):
+            scores[result['index']] = result['relevanceScore']
+        return scores
+
+
+class LexicalReranker(Reranker):
+    """BM25 over the candidate set - no model call; rewards exact terms, codes and names"""
+
+    name = 'lexical'
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        from bm25_index import BM25Index
+
+        index = BM25Index.build([{'key': str(i), 'metadata': {}} for i in range(len(texts))], texts)
+        scores = [0.0] * len(texts)
+        for hit in index.search(query, len(texts)):
+            scores[int(hit['key'])] = hit['score']
+        return scores
+
+
+class CallableReranker(Reranker):
+    """Any scoring function (query, texts) -> scores, e.g. a packaged cross-encoder"""
+
+    def __init__(self, scorer: Callable[[str, List[str]], List[float]], name: str = 'custom'):
+        self.scorer = scorer
+        self.name = name
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return list(self.scorer(query, texts))
+
+
+def load_scorer(path: str) -> CallableReranker:
+    """Import a scorer given as "module:function" (RERANK_SCORER)"""
+    module_name, _, attribute = path.partition(':')
+    if not module_name or not attribute:
+        raise ValueError(f"RERANK_SCORER must look like 'module:function', got {path!r}")
+    return CallableReranker(getattr(importlib.import_module(module_name), attribute), name=path)
+
+
+def create_reranker(mode: Optional[str] = None, client=None) -> Optional[Reranker]:
+    """
+    Build the reranker configured by RERANK_MODE (None when re-ranking is off)
+
+    Args:
+        mode: Override for RERANK_MODE
+        client: bedrock-agent-runtime client to use (shared aws_clients client if omitted)
+    """
+    mode = (mode or RERANK_MODE).lower()
+    if mode == 'off':
+        return None
+    if mode == 'bedrock':
+        return BedrockReranker(client)
+    if mode == 'local':
+        return load_scorer(RERANK_SCORER) if RERANK_SCORER else LexicalReranker()
+    raise ValueError(f"Unknown RERANK_MODE: {mode}")
+
+
+_reranker = None
+_reranker_loaded = False
+
+
+def get_reranker() -> Optional[Reranker]:
+    """Module-level reranker instance (created on first use)"""
+    global _reranker, _reranker_loaded
+    if not _reranker_loaded:
+        _reranker = create_reranker()
+        _reranker_loaded = True
+    return _reranker
+
+
+def rerank(query: str, documents: List[Dict], top_n: int = RERANK_TOP_N,
+           timeout_ms: float = RERANK_TIMEOUT_MS,
+           reranker: Optional[Reranker] = None) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Re-score retrieved documents and keep the best ``top_n``
+
+    Scores are normalized to 0..1 (by the best score) and stored as
+    'rerank_score'. On error or timeout the documents keep their retrieval
+    order, truncated to ``top_n``.
+
+    Returns:
+        (documents, stats) - stats has 'candidates', 'kept' and 'fallback' (0/1)
+    """
+    reranker = reranker or get_reranker()
+    stats = {'candidates': len(documents), 'kept': min(top_n, len(documents)), 'fallback': 0}
+    if reranker is None or len(documents) <= 1:
+        return documents[:top_n], stats
+
+    texts = [document['text'][:RERANK_MAX_CHARS] for document in documents]
+    with metrics.stage('rerank'):
+        future = rerank_executor.submit(contextvars.copy_context().run, reranker.score, query, texts)
+        try:
+            scores = future.result(timeout=timeout_ms / 1000)
+        except FutureTimeoutError:
+            print(f"[WARNING] Reranking ({reranker.name}) exceeded {timeout_ms:.0f} ms - keeping retrieval order")
+            stats['fallback'] = 1
+            return documents[:top_n], stats
+        except Exception as e:
+            print(f"[WARNING] Reranking ({reranker.name}) failed - keeping retrieval order: {str(e)}")
+            stats['fallback'] = 1
+            return documents[:top_n], stats
+
+    best = max(scores) if scores else 0.0
+    ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)[:top_n]
+    reranked = [{**document, 'rerank_score': (score / best) if best > 0 else 0.0} for document, score in ranked]
+    print(f"[INFO] Reranked {len(documents)} candidates with {reranker.name}, kept {len(reranked)}")
+    return reranked, stats
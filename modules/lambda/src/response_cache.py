@@ -0,0 +1,201 @@
+"""
+Semantic response cache for near-duplicate questions
+Reuses the query embedding to find previously answered queries by cosine similarity
+(optionally shared through DynamoDB, so warmup can preload answers into new execution environments)
+"""
+
+import os
+import json
+import math
+import time
+import array
+import hashlib
+import operator
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any
+
+# Configuration
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get('RESPONSE_CACHE_THRESHOLD', '0.95'))  # cosine similarity
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '3600'))  # seconds
+RESPONSE_CACHE_TABLE = os.environ.get('RESPONSE_CACHE_TABLE', '')  # shared answers, preloaded on warmup
+
+
+def _normalize(vector: List[float]) -> array.array:
+    """Unit-length float32 copy, so cosine similarity becomes a dot product"""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array.array('f', (x / norm for x in vector))
+
+
+def make_namespace(kb_version: str, model_id: str, system_prompt: str = '', filters: str = '',
+                   index_name: str = '') -> str:
+    """
+    Cache namespace for a request
+
+    Answers are only reused within the same KB version, active index, model,
+    client system prompt and retrieval filters (tenant, language, ...), so a
+    KB rebuild (new KB_VERSION) or a blue/green swap / rollback (new active
+    index) invalidates everything and tenants never see each other's answers.
+    """
+    key = f"{kb_version}\n{index_name}\n{model_id}\n{system_prompt}\n{filters}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+class DynamoDBResponseStore:
+    """
+    Shared answers in a DynamoDB table - written with every cached answer,
+    read only by warmup (lookups always stay in-process)
+
+    Table schema: hash key ``cache_key`` (S), TTL attribute ``expire_at``.
+    The query embedding is stored as packed float32 binary.
+    """
+
+    def __init__(self, table_name: str):
+        from aws_clients import get_table
+        self.table = get_table(table_name)
+
+    def put(self, namespace: str, embedding: List[float], response: Dict[str, Any], ttl_seconds: int):
+        packed = array.array('f', embedding).tobytes()
+        self.table.put_item(Item={
+            'cache_key': hashlib.sha256(namespace.encode('utf-8') + packed).hexdigest(),
+            'namespace': namespace,
+            'embedding': packed,
+            'response': json.dumps(response),
+            'expire_at': int(time.time()) + ttl_seconds
+        })
+
+    def scan(self, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` unexpired entries (namespace, embedding, response, expires_in seconds)"""
+        now = int(time.time())
+        entries = []
+        params = {'Limit': limit}
+        while len(entries) < limit:
+            page = self.table.scan(**params)
+            for item in page.get('Items', []):
+                expires_in = int(item.get('expire_at', 0)) - now
+                if expires_in > 0:
+                    entries.append({
+                        'namespace': item['namespace'],
+                        'embedding': array.array('f', bytes(item['embedding'])).tolist(),
+                        'response': json.loads(item['response']),
+                        'expires_in': expires_in
+                    })
+            if 'LastEvaluatedKey' not in page:
+                break
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+        return entries[:limit]
+
+
+class SemanticResponseCache:
+    """
+    In-process semantic answer cache with LRU/TTL eviction and hit-rate metrics
+
+    Lookups scan the (small, bounded) entry set of the request's namespace and
+    return the stored completion of the most similar query if its cosine
+    similarity reaches the threshold. With a shared store, stored answers are
+    also written there (errors are logged, never raised) and preload() fills a
+    new execution environment's cache from it.
+    """
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD, max_size: int = RESPONSE_CACHE_SIZE,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL, shared: Optional[DynamoDBResponseStore] = None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries = OrderedDict()  # entry_id -> (namespace, vector, response, expires_at)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, embedding: List[float], namespace: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for the most similar query, or None"""
+        query = _normalize(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, -1.0
+            for entry_id, (entry_namespace, vector, _, expires_at) in list(self._entries.items()):
+                if expires_at < now:
+                    del self._entries[entry_id]
+                    self.expirations += 1
+                    continue
+                if entry_namespace != namespace or len(vector) != len(query):
+                    continue
+                score = sum(map(operator.mul, query, vector))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self.hits += 1
+                print(f"[INFO] Semantic cache hit (similarity {best_score:.3f})")
+                return self._entries[best_id][2]
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding: List[float], namespace: str, response: Dict[str, Any]):
+        """Store a completion for a query embedding"""
+        if self.max_size <= 0:
+            return
+        self._add(embedding, namespace, response, self.ttl_seconds)
+
+        if self.shared:
+            try:
+                self.shared.put(namespace, embedding, response, self.ttl_seconds)
+            except Exception as e:
+                print(f"[WARNING] Shared response cache write failed: {e}")
+
+    def preload(self) -> int:
+        """Fill the cache from the shared store (warmup); returns the number of answers loaded"""
+        if not self.shared or self.max_size <= 0:
+            return 0
+        entries = self.shared.scan(self.max_size)
+        for entry in entries:
+            self._add(entry['embedding'], entry['namespace'], entry['response'],
+                      min(entry['expires_in'], self.ttl_seconds))
+        return len(entries)
+
+    def _add(self, embedding: List[float], namespace: str, response: Dict[str, Any], ttl_seconds: float):
+        with self._lock:
+            self._entries[self._next_id] = (namespace, _normalize(embedding), response,
+                                            time.monotonic() + ttl_seconds)
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': len(self._entries)
+        }
+
+
+_response_cache = None
+
+
+def get_response_cache() -> Optional[SemanticResponseCache]:
+    """Module-level cache instance, or None if RESPONSE_CACHE_ENABLED is off"""
+    global _response_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        shared = DynamoDBResponseStore(RESPONSE_CACHE_TABLE) if RESPONSE_CACHE_TABLE else None
+        _response_cache = SemanticResponseCache(shared=shared)
+    return _response_cache
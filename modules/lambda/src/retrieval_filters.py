@@ -0,0 +1,161 @@
+"""
+Metadata filters and tenant routing for retrieval
+Requests narrow the search with "filters"; the tenant can also come from the authorizer or a header
+
+Request format (all fields optional, a value may be a string or a list of strings):
+    "filters": {"tenant": "shop-a", "language": "de", "doc_type": "faq", "source_prefix": "help/returns"}
+
+Filters are sent to S3 Vectors as metadata filters (the builder stores tenant,
+language, doc_type and the directory prefixes of each chunk's source) and
+evaluated in-process for the local and BM25 backends. Tenants listed in
+TENANT_INDEXES are routed to their own index instead.
+"""
+
+import os
+import json
+from typing import Dict, List, Any, Optional, Tuple
+
+# Configuration
+TENANT_HEADER = os.environ.get('TENANT_HEADER', 'x-tenant-id').lower()  # '' disables the header
+TENANT_INDEXES = os.environ.get('TENANT_INDEXES', '{}')  # JSON {"tenant": "index-name"}
+REQUIRE_TENANT = os.environ.get('REQUIRE_TENANT', 'false').lower() == 'true'
+MAX_FILTER_VALUES = 20
+
+FILTER_FIELDS = ('tenant', 'language', 'doc_type', 'source_prefix')
+# Request field -> vector metadata field
+METADATA_FIELDS = {'tenant': 'tenant', 'language': 'language', 'doc_type': 'doc_type',
+                   'source_prefix': 'source_prefixes'}
+
+
+def _tenant_indexes() -> Dict[str, str]:
+    try:
+        indexes = json.loads(TENANT_INDEXES or '{}')
+    except json.JSONDecodeError as e:
+        print(f"[WARNING] TENANT_INDEXES is not valid JSON: {e}")
+        return {}
+    return {str(tenant): str(index) for tenant, index in indexes.items()} if isinstance(indexes, dict) else {}
+
+
+tenant_indexes = _tenant_indexes()
+
+
+def validate_filters(filters: Any) -> Optional[str]:
+    """
+    Returns:
+        Error message for a 400 response, or None if the filters are usable
+    """
+    if filters is None:
+        return "tenant is required" if REQUIRE_TENANT else None
+    if not isinstance(filters, dict):
+        return "filters must be an object"
+    unknown = sorted(set(filters) - set(FILTER_FIELDS))
+    if unknown:
+        return f"Unknown filter field(s): {', '.join(unknown)} (allowed: {', '.join(FILTER_FIELDS)})"
+    for field, value in filters.items():
+        values = value if isinstance(value, list) else [value]
+        if not values or len(values) > MAX_FILTER_VALUES:
+            return f"filters.{field} needs 1-{MAX_FILTER_VALUES} values"
+        if not all(isinstance(v, str) and v.strip() for v in values):
+            return f"filters.{field} must be a non-empty string or a list of them"
+    if REQUIRE_TENANT and not filters.get('tenant'):
+        return "tenant is required"
+    return None
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Validated request filters as {field: sorted values}; source prefixes without surrounding '/'"""
+    normalized = {}
+    for field, value in (filters or {}).items():
+        values = {v.strip() for v in (value if isinstance(value, list) else [value])}
+        if field == 'source_prefix':
+            values = {v.strip('/') for v in values}
+        normalized[field] = sorted(values)
+    return normalized
+
+
+def authorized_tenant(event: Dict[str, Any]) -> Optional[str]:
+    """Tenant set by an API Gateway authorizer (Lambda authorizer context or JWT claim)"""
+    authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+    for source in (authorizer, authorizer.get('lambda') or {}, (authorizer.get('jwt') or {}).get('claims') or {},
+                   authorizer.get('claims') or {}):
+        tenant = source.get('tenant') or source.get('custom:tenant')
+        if tenant:
+            return str(tenant)
+    return None
+
+
+def apply_request_tenant(body: Dict[str, Any], event: Dict[str, Any]) -> Optional[str]:
+    """
+    Put the request's tenant into body["filters"]
+
+    An authorizer tenant is enforced (a different tenant in the body is
+    rejected); otherwise the tenant header fills in a missing body tenant.
+
+    Returns:
+        Error message for a 403 response, or None
+    """
+    filters = body.get('filters')
+    if filters is not None and not isinstance(filters, dict):
+        return None  # reported by validate_filters
+    tenant = authorized_tenant(event)
+    if tenant:
+        requested = (filters or {}).get('tenant')
+        if requested and requested != tenant and requested != [tenant]:
+            return "filters.tenant does not match the authenticated tenant"
+    elif TENANT_HEADER:
+        headers = {str(k).lower(): v for k, v in (event.get('headers') or {}).items()}
+        tenant = None if (filters or {}).get('tenant') else headers.get(TENANT_HEADER)
+    if tenant:
+        body['filters'] = {**(filters or {}), 'tenant': tenant}
+    return None
+
+
+def route_index(filters: Dict[str, List[str]]) -> Optional[str]:
+    """Dedicated index of a single-tenant request (TENANT_INDEXES), None for the shared index"""
+    tenants = filters.get('tenant', [])
+    if len(tenants) == 1:
+        return tenant_indexes.get(tenants[0])
+    return None
+
+
+def to_s3_vectors_filter(filters: Dict[str, List[str]], skip: Tuple[str, ...] = ()) -> Optional[Dict[str, Any]]:
+    """
+    S3 Vectors metadata filter for normalized filters (None if nothing to filter)
+
+    One value becomes $eq, several become $in; source_prefix matches an
+    entry of the chunk's source_prefixes list.
+    """
+    conditions = []
+    for field in FILTER_FIELDS:
+        values = filters.get(field)
+        if not values or field in skip:
+            continue
+        operator = {'$eq': values[0]} if len(values) == 1 else {'$in': values}
+        conditions.append({METADATA_FIELDS[field]: operator})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+
+def matches(metadata: Dict[str, Any], filters: Dict[str, List[str]]) -> bool:
+    """In-process evaluation of the filters against stored chunk metadata"""
+    for field, values in filters.items():
+        stored = metadata.get(METADATA_FIELDS[field])
+        if field == 'source_prefix' and stored is None:
+            # Indexes built before filter support: derive from the source path
+            stored = source_prefixes(metadata.get('source', ''))
+        stored = stored if isinstance(stored, list) else [stored]
+        if not any(value in stored for value in values):
+            return False
+    return True
+
+
+def source_prefixes(source: str) -> List[str]:
+    """Directory prefixes of a source path: 'a/b/c.md' -> ['a', 'a/b']"""
+    parts = source.strip('/').split('/')[:-1]
+    return ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def filters_key(filters: Dict[str, List[str]]) -> str:
+    """Canonical form of the filters (part of the response cache namespace)"""
+    return json.dumps(filters, sort_keys=True, separators=(',', ':')) if filters else ''
@@ -1,29 +1,56 @@
 """
 S3 Vectors-based Knowledge Base Retrieval
 Replaces FAISS with AWS S3 Vectors API - much simpler, no ML dependencies!
+(VECTOR_BACKEND=local switches to the offline NumPy index in local_vector_store.py,
+RETRIEVAL_MODE=hybrid fuses it with BM25 keyword search from bm25_index.py;
+request filters and tenant routing come from retrieval_filters.py)
+
+The *_async functions are the same retrieval for the asyncio handler (async_handler.py);
+async_aws / asyncio are imported on first use, so the Lambda cold start doesn't pay for them.
 """
 
 import os
-import json
-from typing import List, Dict
-import boto3
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client
+from embedding_cache import get_embedding_cache
+from embeddings import create_embedding_provider
+from local_vector_store import get_local_store
+from index_pointer import get_active_index
+from retrieval_filters import route_index, to_s3_vectors_filter, matches
+from bm25_index import get_bm25_index
+from reranker import get_reranker, rerank, RERANK_CANDIDATES
+import metrics
+
 # Configuration
 VECTOR_BUCKET = os.environ.get('S3_VECTORS_BUCKET', 'your-project-dev-vector-bucket')
 VECTOR_INDEX = os.environ.get('S3_VECTORS_INDEX', 'kb-index')
-BEDROCK_EMBED_MODEL = os.environ.get('BEDROCK_EMBED_MODEL', 'amazon.titan-embed-text-v2:0')
 MAX_RESULTS = int(os.environ.get('MAX_VECTOR_RESULTS', '5'))
-AWS_REGION = os.environ.get('AWS_REGION', 'eu-central-1')
+VECTOR_BACKEND = os.environ.get('VECTOR_BACKEND', 's3vectors').lower()  # s3vectors | local
+RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'vector').lower()  # vector | hybrid
+RRF_K = int(os.environ.get('RRF_K', '60'))
+HYBRID_CANDIDATES = int(os.environ.get('HYBRID_CANDIDATES', '10'))  # per search, before fusion
+MAX_SUB_QUERIES = int(os.environ.get('MAX_SUB_QUERIES', '3'))
+
+# Query embeddings (EMBEDDING_PROVIDER / EMBEDDING_DIMENSIONS, must match the index);
+# the bedrock-runtime client is shared with the handler (aws_clients)
+embedding_provider = create_embedding_provider()
 
-# AWS Clients
-s3vectors_client = boto3.client('s3vectors', region_name=AWS_REGION)
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=AWS_REGION)
+# Runs the vector search next to the in-process keyword search (hybrid mode)
+search_executor = ThreadPoolExecutor(max_workers=4)
+# Runs the sub-queries of retrieve_documents_multi (separate pool: each sub-query
+# may itself wait on search_executor)
+query_executor = ThreadPoolExecutor(max_workers=MAX_SUB_QUERIES)
 
 
 def _generate_query_embedding(query: str) -> List[float]:
     """
-    Generate embedding for query using Bedrock Titan
+    Generate embedding for query using the configured embedding provider
+
+    Repeated queries are served from the embedding cache (see embedding_cache.py).
 
     Args:
         query: User query text
@@ -31,24 +58,17 @@ def _generate_query_embedding(query: str) -> List[float]:
     Returns:
         List of floats representing the query embedding
     """
+    cached = _cached_query_embedding(query)
+    if cached is not None:
+        return cached
+
     try:
         print(f"[INFO] Generating embedding for query ({len(query)} chars)")
 
-        # Call Bedrock Titan Embed API
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_EMBED_MODEL,
-            contentType='application/json',
-            accept='application/json',
-            body=json.dumps({
-                'inputText': query
-            })
-        )
-
-        # Parse response
-        response_body = json.loads(response['body'].read())
-        embedding = response_body['embedding']
-
-        print(f"[INFO] Generated {len(embedding)}-dimensional embedding")
+        with metrics.stage('embed'):
+            embedding = embedding_provider.embed(query)
+
+        _store_query_embedding(query, embedding)
         return embedding
 
     except Exception as e:
@@ -56,72 +76,501 @@ def _generate_query_embedding(query: str) -> List[float]:
         raise
 
 
-def retrieve_context(query: str, max_results: int = MAX_RESULTS) -> str:
+def _store_query_embedding(query: str, embedding: List[float]):
+    print(f"[INFO] Generated {len(embedding)}-dimensional embedding")
+    get_embedding_cache().put(query, embedding_provider.model_id, embedding)
+
+
+def _cached_query_embedding(query: str) -> Optional[List[float]]:
+    cache = get_embedding_cache()
+    cached = cache.get(query, embedding_provider.model_id)
+    metrics.count('EmbeddingCacheHit', 1 if cached is not None else 0)
+    if cached is not None:
+        print(f"[INFO] Embedding cache hit ({cache.stats()['hit_rate']:.0%} hit rate)")
+    return cached
+
+
+def get_query_embedding(query: str) -> List[float]:
     """
-    Retrieve relevant context from S3 Vectors index
+    Public accessor for the (cached) query embedding
+
+    Lets the handler compute the embedding once and share it between the
+    semantic response cache and retrieval.
+    """
+    return _generate_query_embedding(query)
+
+
+async def get_query_embedding_async(query: str) -> List[float]:
+    """get_query_embedding for the asyncio handler (same embedding cache, read and written on the I/O pool)"""
+    from async_aws import run_sync
+
+    cached = await run_sync(_cached_query_embedding, query)
+    if cached is not None:
+        return cached
+
+    try:
+        print(f"[INFO] Generating embedding for query ({len(query)} chars)")
+        with metrics.stage('embed'):
+            embedding = await embedding_provider.embed_async(query)
+
+        await run_sync(_store_query_embedding, query, embedding)
+        return embedding
+
+    except Exception as e:
+        print(f"[ERROR] Failed to generate embedding: {e}")
+        raise
+
+
+def _query_params(index_name: str, query_embedding: List[float], max_results: int,
+                  metadata_filter: Optional[Dict] = None) -> Dict:
+    params = {
+        'vectorBucketName': VECTOR_BUCKET,
+        'indexName': index_name,
+        'queryVector': {'float32': query_embedding},
+        'topK': max_results,
+        'returnDistance': True,
+        'returnMetadata': True
+    }
+    if metadata_filter:
+        params['filter'] = metadata_filter
+    return params
+
+
+def _query_index(index_name: str, query_embedding: List[float], max_results: int,
+                 metadata_filter: Optional[Dict] = None) -> Dict:
+    return get_client('s3vectors').query_vectors(**_query_params(index_name, query_embedding, max_results,
+                                                                 metadata_filter))
+
+
+def _query_vectors(query_embedding: List[float], max_results: int,
+                   filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """
+    Top-K nearest vectors from the configured backend (VECTOR_BACKEND)
+
+    Returns:
+        S3 Vectors-style entries with 'key', 'distance' and 'metadata'
+    """
+    if VECTOR_BACKEND == 'local':
+        return _query_local(query_embedding, max_results, filters)
+
+    tenant_index, metadata_filter = _query_target(filters)
+    if tenant_index:
+        return _query_index(tenant_index, query_embedding, max_results, metadata_filter).get('vectors', [])
+
+    active_index = get_active_index()
+    index_name = active_index.name()
+    _log_query(f"index={index_name}", metadata_filter)
+    try:
+        response = _query_index(index_name, query_embedding, max_results, metadata_filter)
+    except ClientError as e:
+        response = _query_index(_retry_index(e, active_index, index_name), query_embedding, max_results,
+                                metadata_filter)
+
+    # Extract results (S3 Vectors returns 'vectors', not 'results'!)
+    return response.get('vectors', [])
+
+
+async def _query_vectors_async(query_embedding: List[float], max_results: int,
+                               filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """_query_vectors with the S3 Vectors call awaited (the local index is searched on the I/O pool)"""
+    from async_aws import call as call_async, run_sync
+
+    if VECTOR_BACKEND == 'local':
+        return await run_sync(_query_local, query_embedding, max_results, filters)
+
+    tenant_index, metadata_filter = _query_target(filters)
+    if tenant_index:
+        response = await call_async('s3vectors', 'query_vectors',
+                                    **_query_params(tenant_index, query_embedding, max_results, metadata_filter))
+        return response.get('vectors', [])
+
+    # Pointer lookups (SSM / DynamoDB, at most once per TTL) stay off the event loop
+    active_index = get_active_index()
+    index_name = await run_sync(active_index.name) if active_index.backend is not None else active_index.name()
+    _log_query(f"index={index_name}", metadata_filter)
+    try:
+        response = await call_async('s3vectors', 'query_vectors',
+                                    **_query_params(index_name, query_embedding, max_results, metadata_filter))
+    except ClientError as e:
+        retry_index = await run_sync(_retry_index, e, active_index, index_name)
+        response = await call_async('s3vectors', 'query_vectors',
+                                    **_query_params(retry_index, query_embedding, max_results, metadata_filter))
+    return response.get('vectors', [])
+
+
+def _query_local(query_embedding: List[float], max_results: int,
+                 filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    predicate = (lambda metadata: matches(metadata, filters)) if filters else None
+    return get_local_store().query(query_embedding, max_results, predicate)
+
+
+def _query_target(filters: Optional[Dict[str, List[str]]]) -> tuple:
+    """
+    (tenant index or None, S3 Vectors metadata filter) for the request filters
+
+    A tenant with its own index needs no tenant filter; everyone else queries the
+    shared index (name from the blue/green pointer, if configured).
+    """
+    filters = filters or {}
+    tenant_index = route_index(filters)
+    metadata_filter = to_s3_vectors_filter(filters, skip=('tenant',) if tenant_index else ())
+    if tenant_index:
+        _log_query(f"tenant index={tenant_index}", metadata_filter)
+        metrics.count('TenantIndexQueries')
+    return tenant_index, metadata_filter
+
+
+def _log_query(target: str, metadata_filter: Optional[Dict]):
+    print(f"[INFO] Querying S3 Vectors: bucket={VECTOR_BUCKET}, {target}, filter={metadata_filter}")
+
+
+def _retry_index(error: ClientError, active_index, index_name: str) -> str:
+    """
+    Index to retry a failed shared-index query with (re-raises the error otherwise)
+
+    A cached pointer can outlive its index (old version garbage-collected) - re-read once.
+    """
+    if error.response['Error']['Code'] != 'NotFoundException' or active_index.backend is None:
+        raise error
+    active_index.invalidate()
+    retry_index = active_index.name()
+    if retry_index == index_name:
+        raise error
+    print(f"[WARNING] Index {index_name} not found, retrying with {retry_index}")
+    return retry_index
+
+
+def _to_document(key: str, metadata: Dict, distance: Optional[float]) -> Dict:
+    return {
+        'key': key,
+        'text': metadata.get('text', ''),
+        'source': metadata.get('source', ''),
+        'section': metadata.get('section', ''),
+        'distance': distance,
+        'metadata': metadata
+    }
+
+
+def _vector_search(query: str, max_results: int,
+                   query_embedding: Optional[List[float]] = None,
+                   filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """Embed the query (unless given) and return the nearest documents"""
+    if query_embedding is None:
+        query_embedding = _generate_query_embedding(query)
+
+    with metrics.stage('vector_query'):
+        results = _query_vectors(query_embedding, max_results, filters)
+
+    return _vector_documents(results)
+
+
+async def _vector_search_async(query: str, max_results: int,
+                               query_embedding: Optional[List[float]] = None,
+                               filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    if query_embedding is None:
+        query_embedding = await get_query_embedding_async(query)
+
+    with metrics.stage('vector_query'):
+        results = await _query_vectors_async(query_embedding, max_results, filters)
+
+    return _vector_documents(results)
+
+
+def _vector_documents(results: List[Dict]) -> List[Dict]:
+    print(f"[INFO] Found {len(results)} vector matches")
+    documents = [_to_document(result.get('key', ''), result.get('metadata', {}), result.get('distance', 0))
+                 for result in results]
+    return [document for document in documents if document['text']]
+
+
+def _keyword_search(query: str, max_results: int,
+                    filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """BM25 search over the keyword index (documents carry no vector distance)"""
+    predicate = (lambda metadata: matches(metadata, filters)) if filters else None
+    with metrics.stage('keyword_query'):
+        hits = get_bm25_index().search(query, max_results, predicate)
+
+    print(f"[INFO] Found {len(hits)} keyword matches")
+    documents = [_to_document(hit['key'], hit['metadata'], None) for hit in hits]
+    return [document for document in documents if document['text']]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], max_results: int, k: int = RRF_K) -> List[Dict]:
+    """
+    Merge ranked document lists by reciprocal rank: score = sum(1 / (k + rank))
+
+    Documents are matched by key; the fused document keeps the smallest
+    vector distance seen for it and gets its 'rrf_score'.
+    """
+    fused = {}
+    for documents in result_lists:
+        for rank, document in enumerate(documents, start=1):
+            entry = fused.get(document['key'])
+            if entry is None:
+                entry = fused[document['key']] = dict(document, rrf_score=0.0)
+            elif document['distance'] is not None and (entry['distance'] is None
+                                                       or document['distance'] < entry['distance']):
+                entry['distance'] = document['distance']
+            entry['rrf_score'] += 1.0 / (k + rank)
+
+    ranked = sorted(fused.values(), key=lambda document: document['rrf_score'], reverse=True)
+    return ranked[:max_results]
+
+
+def _hybrid_search(query: str, max_results: int,
+                   query_embedding: Optional[List[float]] = None,
+                   filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """
+    Vector and keyword search run concurrently, fused with RRF
+
+    The keyword search runs in-process while the embedding / vector query
+    is in flight, so hybrid mode costs no extra wall-clock time. Either
+    side failing degrades to the other one.
+    """
+    candidates = max(max_results, HYBRID_CANDIDATES)
+    context = contextvars.copy_context()
+    vector_future = search_executor.submit(context.run, _vector_search, query, candidates, query_embedding, filters)
+
+    try:
+        keyword_result = _keyword_search(query, candidates, filters)
+    except Exception as e:
+        keyword_result = e
+
+    try:
+        vector_result = vector_future.result()
+    except Exception as e:
+        vector_result = e
+
+    return _fuse_results(vector_result, keyword_result, max_results)
+
+
+async def _hybrid_search_async(query: str, max_results: int,
+                               query_embedding: Optional[List[float]] = None,
+                               filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """_hybrid_search with the keyword search on the I/O pool while the vector query is awaited"""
+    import asyncio
+    from async_aws import run_sync
+
+    candidates = max(max_results, HYBRID_CANDIDATES)
+    vector_result, keyword_result = await asyncio.gather(
+        _vector_search_async(query, candidates, query_embedding, filters),
+        run_sync(_keyword_search, query, candidates, filters),
+        return_exceptions=True
+    )
+    return _fuse_results(vector_result, keyword_result, max_results)
+
+
+def _fuse_results(vector_result, keyword_result, max_results: int) -> List[Dict]:
+    """
+    RRF of the vector and keyword documents; either result may be the
+    exception its search raised (degrades to the other side)
+    """
+    keyword_documents = keyword_result
+    if isinstance(keyword_result, Exception):
+        print(f"[WARNING] Keyword search failed, using vector results only: {keyword_result}")
+        keyword_documents = []
+    vector_documents = vector_result
+    if isinstance(vector_result, Exception):
+        if not keyword_documents:
+            raise vector_result
+        print(f"[WARNING] Vector search failed, using keyword results only: {vector_result}")
+        vector_documents = []
+
+    documents = reciprocal_rank_fusion([vector_documents, keyword_documents], max_results)
+    metrics.count('KeywordOnlyDocuments', sum(1 for document in documents if document['distance'] is None))
+    return documents
+
+
+def retrieve_documents(query: str, max_results: int = MAX_RESULTS,
+                       query_embedding: Optional[List[float]] = None,
+                       filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """
+    Retrieve relevant documents from S3 Vectors index (plus BM25 in hybrid mode)
 
     Args:
         query: User query text
         max_results: Number of results to return
+        query_embedding: Precomputed query embedding (generated if omitted)
+        filters: Normalized request filters (retrieval_filters.normalize_filters)
 
     Returns:
-        Combined context string
+        Documents ordered by rank (best first), each with 'key', 'text',
+        'source', 'section' (heading breadcrumb), 'distance' (None for
+        keyword-only hits) and the raw 'metadata'
     """
     try:
         print(f"[INFO] Retrieving context for query: {query[:100]}...")
 
-        # Generate query embedding
-        query_embedding = _generate_query_embedding(query)
+        if RETRIEVAL_MODE == 'hybrid':
+            documents = _hybrid_search(query, max_results, query_embedding, filters)
+        else:
+            documents = _vector_search(query, max_results, query_embedding, filters)
 
-        # Query S3 Vectors API
-        print(f"[INFO] Querying S3 Vectors: bucket={VECTOR_BUCKET}, index={VECTOR_INDEX}")
+        return _retrieved(documents)
 
-        response = s3vectors_client.query_vectors(
-            vectorBucketName=VECTOR_BUCKET,
-            indexName=VECTOR_INDEX,
-            queryVector={'float32': query_embedding},
-            topK=max_results,
-            returnDistance=True,
-            returnMetadata=True
-        )
+    except Exception as e:
+        # Don't fail the whole request if retrieval fails
+        return _retrieval_failed(e)
 
-        # Extract results (S3 Vectors returns 'vectors', not 'results'!)
-        results = response.get('vectors', [])
-        print(f"[INFO] Found {len(results)} matches")
 
-        if not results:
-            print("[WARNING] No matches found in S3 Vectors index")
-            return ""
+async def retrieve_documents_async(query: str, max_results: int = MAX_RESULTS,
+                                   query_embedding: Optional[List[float]] = None,
+                                   filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """retrieve_documents for the asyncio handler (same results, errors also yield [])"""
+    try:
+        print(f"[INFO] Retrieving context for query: {query[:100]}...")
 
-        # Combine context from results
-        context_parts = []
-        for i, result in enumerate(results):
-            distance = result.get('distance', 0)
-            metadata = result.get('metadata', {})
+        if RETRIEVAL_MODE == 'hybrid':
+            documents = await _hybrid_search_async(query, max_results, query_embedding, filters)
+        else:
+            documents = await _vector_search_async(query, max_results, query_embedding, filters)
 
-            # Extract text content from metadata
-            text = metadata.get('text', '')
-            source = metadata.get('source', '')
+        return _retrieved(documents)
 
-            if text:
-                context_parts.append(f"[Document {i+1}] (Distance: {distance:.3f})")
-                if source:
-                    context_parts.append(f"Source: {source}")
-                context_parts.append(text)
-                context_parts.append("")  # Empty line between documents
+    except Exception as e:
+        return _retrieval_failed(e)
 
-        context = "\n".join(context_parts)
-        print(f"[INFO] Retrieved {len(context)} characters of context")
 
-        return context
+def _retrieved(documents: List[Dict]) -> List[Dict]:
+    metrics.count('RetrievedDocuments', len(documents))
+    if not documents:
+        print("[WARNING] No matches found in S3 Vectors index")
+    return documents
 
-    except ClientError as e:
-        error_code = e.response['Error']['Code']
-        print(f"[ERROR] S3 Vectors retrieval failed: {error_code} - {e}")
-        # Don't fail the whole request if retrieval fails
-        return ""
 
-    except Exception as e:
-        print(f"[ERROR] S3 Vectors retrieval failed: {e}")
-        # Don't fail the whole request if retrieval fails
-        return ""
+def _retrieval_failed(error: Exception) -> List[Dict]:
+    if isinstance(error, ClientError):
+        print(f"[ERROR] S3 Vectors retrieval failed: {error.response['Error']['Code']} - {error}")
+    else:
+        print(f"[ERROR] S3 Vectors retrieval failed: {error}")
+    return []
+
+
+def retrieve_documents_multi(queries: List[str], max_results: int = MAX_RESULTS,
+                             query_embeddings: Optional[List[Optional[List[float]]]] = None,
+                             filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """
+    Retrieve documents for several sub-queries concurrently and merge them
+
+    Each sub-query is embedded and searched on its own thread, so the
+    latency is about that of a single query. Hits are de-duplicated by
+    vector key and re-ranked by their best distance over all sub-queries
+    (keyword-only hits from hybrid mode follow, by fusion score).
+
+    Args:
+        queries: Sub-queries, e.g. one per recent user turn or query rewrites
+        max_results: Number of merged results to return (and per sub-query)
+        query_embeddings: Optional precomputed embeddings aligned with queries
+        filters: Normalized request filters, applied to every sub-query
+
+    Returns:
+        Documents as returned by retrieve_documents, best first
+    """
+    queries = _clean_sub_queries(queries)
+    if not queries:
+        return []
+    query_embeddings = query_embeddings or [None] * len(queries)
+    if len(queries) == 1:
+        return retrieve_documents(queries[0], max_results, query_embeddings[0], filters)
+
+    futures = [
+        query_executor.submit(contextvars.copy_context().run, retrieve_documents, query, max_results, embedding,
+                              filters)
+        for query, embedding in zip(queries, query_embeddings)
+    ]
+
+    return _merge_sub_query_results([future.result() for future in futures], max_results)
+
+
+async def retrieve_documents_multi_async(queries: List[str], max_results: int = MAX_RESULTS,
+                                         query_embeddings: Optional[List[Optional[List[float]]]] = None,
+                                         filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """retrieve_documents_multi for the asyncio handler (sub-queries run as concurrent tasks)"""
+    import asyncio
+
+    queries = _clean_sub_queries(queries)
+    if not queries:
+        return []
+    query_embeddings = query_embeddings or [None] * len(queries)
+    if len(queries) == 1:
+        return await retrieve_documents_async(queries[0], max_results, query_embeddings[0], filters)
+
+    results = await asyncio.gather(*(
+        retrieve_documents_async(query, max_results, embedding, filters)
+        for query, embedding in zip(queries, query_embeddings)
+    ))
+    return _merge_sub_query_results(results, max_results)
+
+
+def _clean_sub_queries(queries: List[str]) -> List[str]:
+    """Non-blank sub-queries, at most MAX_SUB_QUERIES"""
+    return [query for query in queries if query and query.strip()][:MAX_SUB_QUERIES]
+
+
+def _merge_sub_query_results(results: List[List[Dict]], max_results: int) -> List[Dict]:
+    """De-duplicate sub-query hits by key (best rank wins), best first"""
+    merged = {}
+    for documents in results:
+        for document in documents:
+            best = merged.get(document['key'])
+            if best is None or _rank_key(document) < _rank_key(best):
+                merged[document['key']] = document
+
+    documents = sorted(merged.values(), key=_rank_key)[:max_results]
+    metrics.count('SubQueries', len(results))
+    print(f"[INFO] Merged {len(merged)} unique documents from {len(results)} sub-queries")
+    return documents
+
+
+def _rank_key(document: Dict) -> tuple:
+    """Sort key: vector hits by distance, then keyword-only hits by fusion score"""
+    if document['distance'] is None:
+        return (1, -document.get('rrf_score', 0.0))
+    return (0, document['distance'])
+
+
+def format_context(documents: List[Dict]) -> str:
+    """
+    Combine retrieved documents into the context string for the prompt
+    """
+    context_parts = []
+    for i, document in enumerate(documents):
+        if document['distance'] is None:
+            context_parts.append(f"[Document {i+1}] (Keyword match)")
+        else:
+            context_parts.append(f"[Document {i+1}] (Distance: {document['distance']:.3f})")
+        if document['source']:
+            context_parts.append(f"Source: {document['source']}")
+        if document.get('section'):
+            context_parts.append(f"Section: {document['section']}")
+        context_parts.append(document['text'])
+        context_parts.append("")  # Empty line between documents
+
+    return "\n".join(context_parts)
+
+
+def retrieve_context(query: str, max_results: int = MAX_RESULTS,
+                     query_embedding: Optional[List[float]] = None,
+                     filters: Optional[Dict[str, List[str]]] = None) -> str:
+    """
+    Retrieve relevant context from S3 Vectors index
+
+    Args:
+        query: User query text
+        max_results: Number of results to return
+        query_embedding: Precomputed query embedding (generated if omitted)
+        filters: Normalized request filters (retrieval_filters.normalize_filters)
+
+    Returns:
+        Combined context string
+    """
+    if get_reranker() is None:
+        documents = retrieve_documents(query, max_results, query_embedding, filters)
+    else:
+        # Over-fetch, then keep the best max_results by reranker score
+        documents = retrieve_documents(query, max(max_results, RERANK_CANDIDATES), query_embedding, filters)
+        documents, _ = rerank(query, documents, top_n=max_results)
+
+    context = format_context(documents)
+    print(f"[INFO] Retrieved {len(context)} characters of context")
+    return context
@@ -0,0 +1,225 @@
+"""
+Server-side conversation memory (opt-in per request via "session_id")
+Recent turns live in the messages table, older turns are rolled into a running summary in the sessions table
+
+Clients that send a session_id only send the new turn; the handler prepends
+the stored history. The prompt holds at most SESSION_HISTORY_MESSAGES +
+SESSION_SUMMARY_BATCH stored messages plus the summary, however long the
+conversation runs. Message text is stored only for sessions the client opted
+into, and expires after SESSION_TTL_DAYS (DynamoDB TTL).
+"""
+
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from aws_clients import get_client, get_table
+
+# Configuration
+SESSIONS_ENABLED = os.environ.get('SESSIONS_ENABLED', 'false').lower() == 'true'
+SESSIONS_TABLE = os.environ.get('SESSIONS_TABLE', '')
+MESSAGES_TABLE = os.environ.get('MESSAGES_TABLE', '')
+SESSION_HISTORY_MESSAGES = int(os.environ.get('SESSION_HISTORY_MESSAGES', '10'))  # verbatim in the prompt
+SESSION_SUMMARY_BATCH = int(os.environ.get('SESSION_SUMMARY_BATCH', '6'))  # older messages per summary update
+SESSION_SUMMARY_MODEL_ID = os.environ.get('SESSION_SUMMARY_MODEL_ID', '') or os.environ.get('MODEL_ID', '')
+SESSION_SUMMARY_MAX_TOKENS = int(os.environ.get('SESSION_SUMMARY_MAX_TOKENS', '400'))
+SESSION_TTL_DAYS = int(os.environ.get('SESSION_TTL_DAYS', '7'))
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{8,128}$')
+
+SUMMARY_PROMPT = """
+Summarize the conversation between a user and a support assistant below for the assistant's memory.
+Keep facts the user stated about themselves and their situation, questions asked, answers and
+decisions given, and anything still open. Write compact bullet points in the conversation's
+language. Do not add information that is not in the conversation.
+""".strip()
+
+# GetItem (summary) and Query (recent turns) run concurrently
+session_executor = ThreadPoolExecutor(max_workers=2)
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+
+class Session:
+    """
+    Stored state of one conversation
+
+    Attributes:
+        session_id: Client-supplied ID
+        summary: Running summary of turns no longer kept verbatim ('' if none)
+        summarized_until: Timestamp of the newest message included in the summary
+        messages: Unsummarized stored messages, oldest first ({'role', 'content', 'timestamp'})
+    """
+
+    def __init__(self, session_id: str, summary: str = '', summarized_until: int = 0,
+                 messages: Optional[List[Dict[str, Any]]] = None):
+        self.session_id = session_id
+        self.summary = summary
+        self.summarized_until = summarized_until
+        self.messages = messages or []
+
+    def overflow(self, history_messages: int = SESSION_HISTORY_MESSAGES) -> List[Dict[str, Any]]:
+        """Stored messages older than the verbatim window (candidates for the summary)"""
+        return self.messages[:-history_messages] if history_messages > 0 else list(self.messages)
+
+    def needs_summary(self, history_messages: int = SESSION_HISTORY_MESSAGES,
+                      batch: int = SESSION_SUMMARY_BATCH) -> bool:
+        return len(self.overflow(history_messages)) >= max(1, batch)
+
+    def build_messages(self, client_messages: List[Dict]) -> List[Dict]:
+        """
+        Prompt messages: client system messages, the summary, stored history, then the new turn
+
+        Leading assistant messages of the stored history are dropped, so the
+        conversation starts with a user turn (Bedrock Converse requirement).
+        """
+        system = [m for m in client_messages if m.get('role') == 'system']
+        new_turn = [m for m in client_messages if m.get('role') != 'system']
+
+        history = [{'role': m['role'], 'content': m['content']} for m in self.messages]
+        while history and history[0]['role'] != 'user':
+            history.pop(0)
+
+        if self.summary:
+            system = system + [{'role': 'system', 'content': f"Summary of the earlier conversation:\n{self.summary}"}]
+        return system + history + new_turn
+
+
+def sessions_enabled() -> bool:
+    return SESSIONS_ENABLED and bool(SESSIONS_TABLE) and bool(MESSAGES_TABLE)
+
+
+def validate_session_id(session_id: Any) -> Optional[str]:
+    """
+    Returns:
+        Error message for a 400 response, or None if the session_id is usable
+    """
+    if not sessions_enabled():
+        return "session_id was given, but server-side sessions are not enabled"
+    if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+        return "session_id must be 8-128 characters (letters, digits, '.', '_', ':', '-')"
+    return None
+
+
+def _load_summary(session_id: str) -> Dict[str, Any]:
+    return get_table(SESSIONS_TABLE).get_item(Key={'session_id': session_id}).get('Item') or {}
+
+
+def _load_recent_messages(session_id: str, limit: int) -> List[Dict[str, Any]]:
+    """Newest ``limit`` messages with one Query (descending sort key), returned oldest first"""
+    from boto3.dynamodb.conditions import Key
+
+    response = get_table(MESSAGES_TABLE).query(
+        KeyConditionExpression=Key('session_id').eq(session_id),
+        ScanIndexForward=False,
+        Limit=limit
+    )
+    return list(reversed(response.get('Items', [])))
+
+
+def load_session(session_id: str) -> Session:
+    """
+    Load summary and recent turns of a session (empty session if it doesn't exist yet)
+
+    Loads at most SESSION_HISTORY_MESSAGES + SESSION_SUMMARY_BATCH messages;
+    messages already covered by the summary are skipped.
+    """
+    limit = SESSION_HISTORY_MESSAGES + SESSION_SUMMARY_BATCH
+    summary_future = session_executor.submit(_load_summary, session_id)
+    messages_future = session_executor.submit(_load_recent_messages, session_id, limit)
+    item, items = summary_future.result(), messages_future.result()
+
+    summarized_until = int(item.get('summarized_until', 0))
+    messages = [
+        {'role': m['role'], 'content': m['content'], 'timestamp': int(m['timestamp'])}
+        for m in items if int(m['timestamp']) > summarized_until
+    ]
+    print(f"[INFO] Session loaded: {len(messages)} recent messages, "
+          f"summary {len(item.get('summary', ''))} chars")
+    return Session(session_id, item.get('summary', ''), summarized_until, messages)
+
+
+def save_turn(session: Session, new_messages: List[Dict], response_text: str):
+    """
+    Append the new user message(s) and the assistant reply, and refresh the session's TTL
+    """
+    now_ms = int(time.time() * 1000)
+    expire_at = int(time.time()) + SESSION_TTL_DAYS * 24 * 60 * 60
+    turn = [m for m in new_messages if m.get('role') in ('user', 'assistant') and m.get('content')]
+    if response_text:
+        turn.append({'role': 'assistant', 'content': response_text})
+
+    # Consecutive timestamps keep the order within one turn
+    with get_table(MESSAGES_TABLE).batch_writer() as batch:
+        for offset, message in enumerate(turn):
+            batch.put_item(Item={
+                'session_id': session.session_id,
+                'timestamp': now_ms + offset,
+                'role': message['role'],
+                'content': message['content'],
+                'expire_at': expire_at
+            })
+
+    get_table(SESSIONS_TABLE).update_item(
+        Key={'session_id': session.session_id},
+        UpdateExpression='SET last_active = :now, expire_at = :expire ADD message_count :count',
+        ExpressionAttributeValues={':now': now_ms, ':expire': expire_at, ':count': len(turn)}
+    )
+
+
+def summarize_messages(summary: str, messages: List[Dict[str, Any]]) -> str:
+    """Fold ``messages`` into the running summary with one Converse call"""
+    transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+    if summary:
+        transcript = f"Existing summary:\n{summary}\n\nNew messages:\n{transcript}"
+
+    response = get_client('bedrock-runtime').converse(
+        modelId=SESSION_SUMMARY_MODEL_ID,
+        system=[{'text': SUMMARY_PROMPT}],
+        messages=[{'role': 'user', 'content': [{'text': transcript}]}],
+        inferenceConfig={'maxTokens': SESSION_SUMMARY_MAX_TOKENS, 'temperature': 0.0}
+    )
+    content = response['output']['message']['content']
+    return ''.join(block['text'] for block in content if 'text' in block).strip()
+
+
+def update_summary(session: Session) -> bool:
+    """
+    Roll the messages older than the verbatim window into the stored summary
+
+    Runs in the background, overlapping the request's model call. The update
+    is conditional on summarized_until, so concurrent requests of the same
+    session can't move the summary backwards.
+
+    Returns:
+        True if the summary was updated
+    """
+    overflow = session.overflow()
+    if not overflow:
+        return False
+
+    with _summarizing_lock:
+        if session.session_id in _summarizing:
+            return False
+        _summarizing.add(session.session_id)
+    try:
+        summary = summarize_messages(session.summary, overflow)
+        until = overflow[-1]['timestamp']
+        get_table(SESSIONS_TABLE).update_item(
+            Key={'session_id': session.session_id},
+            UpdateExpression='SET summary = :summary, summarized_until = :until',
+            ConditionExpression='attribute_not_exists(summarized_until) OR summarized_until < :until',
+            ExpressionAttributeValues={':summary': summary, ':until': until}
+        )
+        print(f"[INFO] Session summary updated: {len(overflow)} messages folded in, {len(summary)} chars")
+        return True
+    except Exception as e:
+        # The messages stay unsummarized and are retried with the next request
+        print(f"[WARNING] Session summary update failed: {str(e)}")
+        return False
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(session.session_id)
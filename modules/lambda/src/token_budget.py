@@ -0,0 +1,117 @@
+"""
+Prompt token budgeting
+Estimates prompt size and trims conversation history / retrieved context to fit a budget
+"""
+
+import os
+import math
+from typing import List, Dict, Tuple, Callable
+
+# Configuration
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '8000'))
+MIN_HISTORY_MESSAGES = int(os.environ.get('MIN_HISTORY_MESSAGES', '4'))  # kept before dropping context
+
+# Rough tokenizer-free estimate: ~4 characters per token for English/German prose,
+# plus a few tokens of framing per message
+CHARS_PER_TOKEN = 4.0
+MESSAGE_OVERHEAD_TOKENS = 4
+DOCUMENT_OVERHEAD_TOKENS = 10  # "[Document n] (Distance: ...)" header, Source/Section labels
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """Estimate the token count of a message list"""
+    return sum(estimate_tokens(m.get('content', '')) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def estimate_document_tokens(document: Dict) -> int:
+    """Estimate the tokens a retrieved document adds to the context"""
+    return (estimate_tokens(document.get('text', '')) + estimate_tokens(document.get('source', ''))
+            + estimate_tokens(document.get('section') or '') + DOCUMENT_OVERHEAD_TOKENS)
+
+
+def _drop_oldest_turn(messages: List[Dict]) -> List[Dict]:
+    """
+    Remove the oldest non-system message (and a now-leading assistant reply)
+
+    The last message is never removed, and the conversation always starts
+    with a user turn afterwards (Bedrock Converse requirement).
+
+    Returns:
+        The removed messages (empty if nothing could be removed)
+    """
+    turns = [i for i, m in enumerate(messages) if m['role'] != 'system']
+    if len(turns) <= 1:
+        return []
+
+    removed = [messages.pop(turns[0])]
+    while True:
+        turns = [i for i, m in enumerate(messages) if m['role'] != 'system']
+        if len(turns) <= 1 or messages[turns[0]]['role'] == 'user':
+            return removed
+        removed.append(messages.pop(turns[0]))
+
+
+def fit_to_budget(messages: List[Dict], documents: List[Dict],
+                  render_prompt: Callable[[List[Dict], List[Dict]], List[Dict]],
+                  budget: int = PROMPT_TOKEN_BUDGET,
+                  min_history: int = MIN_HISTORY_MESSAGES) -> Tuple[List[Dict], List[Dict], Dict[str, int]]:
+    """
+    Trim conversation history and context documents until the prompt fits the budget
+
+    Order of trimming:
+        1. Oldest turns, down to ``min_history`` non-system messages
+        2. Lowest-ranked context documents (documents are ordered best first)
+        3. Remaining older turns (the latest user message is always kept)
+
+    Args:
+        messages: OpenAI-format conversation (not modified)
+        documents: Retrieved documents, best first (not modified)
+        render_prompt: Builds the final message list from (messages, documents);
+            called once up front (and once more if every document is dropped) -
+            trimming subtracts per-message / per-document estimates instead of
+            re-rendering the prompt
+        budget: Max estimated prompt tokens
+
+    Returns:
+        (messages, documents, stats) - trimmed copies plus 'prompt_tokens',
+        'trimmed_messages' and 'trimmed_documents'
+    """
+    messages = list(messages)
+    documents = list(documents)
+    original_messages, original_documents = len(messages), len(documents)
+
+    def drop_oldest_turn() -> bool:
+        nonlocal tokens
+        removed = _drop_oldest_turn(messages)
+        tokens -= estimate_messages_tokens(removed)
+        return bool(removed)
+
+    tokens = estimate_messages_tokens(render_prompt(messages, documents))
+
+    while tokens > budget and sum(1 for m in messages if m['role'] != 'system') > min_history:
+        if not drop_oldest_turn():
+            break
+
+    while tokens > budget and documents:
+        tokens -= estimate_document_tokens(documents.pop())
+        if not documents:
+            # Without documents the context instructions are left out as well
+            tokens = estimate_messages_tokens(render_prompt(messages, documents))
+
+    while tokens > budget and drop_oldest_turn():
+        pass
+
+    stats = {
+        'prompt_tokens': tokens,
+        'trimmed_messages': original_messages - len(messages),
+        'trimmed_documents': original_documents - len(documents)
+    }
+    if stats['trimmed_messages'] or stats['trimmed_documents']:
+        print(f"[INFO] Trimmed prompt to ~{tokens} tokens (budget {budget}): "
+              f"-{stats['trimmed_messages']} messages, -{stats['trimmed_documents']} documents")
+    return messages, documents, stats
@@ -0,0 +1,166 @@
+"""
+Warmup path for new execution environments
+Opens AWS connections and fills caches/indexes without calling the LLM
+
+Triggered by a warmup event (EventBridge schedule or manual invoke with
+{"warmup": true}) or at init time under provisioned concurrency.
+"""
+
+import os
+import json
+import time
+from typing import Dict, List, Any, Callable
+
+from aws_clients import get_client, get_table, created_services
+from s3_vectors_retriever import (
+    get_query_embedding, retrieve_documents, embedding_provider,
+    RETRIEVAL_MODE, VECTOR_BACKEND, VECTOR_BUCKET
+)
+from reranker import RERANK_MODE
+from index_pointer import get_active_index
+from response_cache import get_response_cache, RESPONSE_CACHE_TABLE
+from embedding_cache import EMBEDDING_CACHE_TABLE
+from sessions import SESSIONS_TABLE, MESSAGES_TABLE
+
+# Configuration
+WARMUP_QUERIES = os.environ.get('WARMUP_QUERIES', '[]')  # JSON list of hot queries
+WARMUP_ON_INIT = os.environ.get('WARMUP_ON_INIT', 'true').lower() == 'true'
+WARMUP_MAX_QUERIES = int(os.environ.get('WARMUP_MAX_QUERIES', '20'))
+ANALYTICS_TABLE = os.environ.get('ANALYTICS_TABLE', '')
+
+_warmed = False
+
+
+def is_warmup_event(event: Any) -> bool:
+    """
+    Warmup events: {"warmup": true} (EventBridge target input / manual invoke)
+    or a plain EventBridge scheduled event
+    """
+    if not isinstance(event, dict):
+        return False
+    if event.get('warmup') is True:
+        return True
+    return event.get('source') == 'aws.events' and event.get('detail-type') == 'Scheduled Event'
+
+
+def valid_queries(queries: Any) -> List[str]:
+    """Non-empty strings of a query list (anything else is logged and ignored)"""
+    if not isinstance(queries, list):
+        print(f"[WARNING] Warmup queries must be a list of strings, got {type(queries).__name__}")
+        return []
+    return [q for q in queries if isinstance(q, str) and q.strip()]
+
+
+def configured_queries() -> List[str]:
+    """Hot queries from WARMUP_QUERIES (invalid JSON is logged and ignored)"""
+    try:
+        queries = json.loads(WARMUP_QUERIES or '[]')
+    except json.JSONDecodeError as e:
+        print(f"[WARNING] WARMUP_QUERIES is not valid JSON: {e}")
+        return []
+    return valid_queries(queries)
+
+
+def configured_tables() -> List[str]:
+    """DynamoDB tables the handler uses (sessions, analytics, shared caches)"""
+    tables = [SESSIONS_TABLE, MESSAGES_TABLE, ANALYTICS_TABLE, EMBEDDING_CACHE_TABLE, RESPONSE_CACHE_TABLE]
+    return sorted({table for table in tables if table})
+
+
+def open_connections(errors: List[str]) -> List[str]:
+    """
+    One cheap real call per configured service, so the TLS handshakes happen
+    here and not in the first user request
+
+    - a short Titan embedding (the bedrock-runtime connection Converse reuses)
+    - GetIndex on the active S3 Vectors index (the pointer is read first)
+    - DescribeTable on every configured DynamoDB table
+
+    The bedrock-agent-runtime client (RERANK_MODE=bedrock) is only created:
+    a Rerank call is billed per query.
+
+    Returns:
+        The warmed targets, e.g. ['bedrock-runtime', 's3vectors', 'dynamodb:sessions']
+    """
+    targets = []
+
+    def warm(target: str, fn: Callable[[], Any]):
+        try:
+            fn()
+            targets.append(target)
+        except Exception as e:
+            errors.append(f"{target}: {e}")
+            print(f"[WARNING] Warmup of {target} failed: {e}")
+
+    warm('bedrock-runtime', lambda: embedding_provider.embed('warmup'))
+    if VECTOR_BACKEND != 'local':
+        warm('s3vectors', lambda: get_client('s3vectors').get_index(vectorBucketName=VECTOR_BUCKET,
+                                                                     indexName=get_active_index().name()))
+    for table in configured_tables():
+        warm(f"dynamodb:{table}", lambda table=table: get_table(table).load())
+    if RERANK_MODE == 'bedrock':
+        get_client('bedrock-agent-runtime')
+    return targets
+
+
+def preload_cached_answers(errors: List[str]) -> int:
+    """Load answers from the shared response cache (RESPONSE_CACHE_TABLE) into this environment"""
+    cache = get_response_cache()
+    if not cache:
+        return 0
+    try:
+        return cache.preload()
+    except Exception as e:
+        errors.append(f"response cache: {e}")
+        print(f"[WARNING] Response cache preload failed: {e}")
+        return 0
+
+
+def run_warmup(queries: Any = None) -> Dict[str, Any]:
+    """
+    Prepare this execution environment for user traffic
+
+    - opens the AWS connections (open_connections)
+    - embeds the hot queries (fills the embedding cache) and runs retrieval
+      for them (loads the local vector / BM25 indexes when configured)
+    - preloads cached answers from the shared response cache
+
+    Args:
+        queries: Hot queries (the warmup event's "queries"); WARMUP_QUERIES if None
+
+    Failures are logged and reported, never raised.
+
+    Returns:
+        Summary with 'queries', 'errors', 'duration_ms', 'connections',
+        'preloaded_answers', 'clients' and 'first_warmup'
+    """
+    global _warmed
+    start = time.perf_counter()
+    queries = (valid_queries(queries) if queries is not None else configured_queries())[:WARMUP_MAX_QUERIES]
+    errors = []
+
+    connections = open_connections(errors)
+
+    for query in queries:
+        try:
+            embedding = get_query_embedding(query)
+            retrieve_documents(query, query_embedding=embedding)
+        except Exception as e:
+            errors.append(str(e))
+            print(f"[WARNING] Warmup query failed: {e}")
+
+    preloaded = preload_cached_answers(errors)
+
+    summary = {
+        'queries': len(queries),
+        'errors': len(errors),
+        'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+        'connections': connections,
+        'preloaded_answers': preloaded,
+        'clients': created_services(),
+        'retrieval_mode': RETRIEVAL_MODE,
+        'first_warmup': not _warmed
+    }
+    _warmed = True
+    print(f"[INFO] Warmup done: {json.dumps(summary)}")
+    return summary
@@ -20,6 +20,23 @@ variable "bedrock_embed_model" {
   default     = "amazon.titan-embed-text-v2:0"
 }
 
+variable "embedding_provider" {
+  description = "Query embedding provider: bedrock or hashing (offline stand-in, tests only) - must match the index build"
+  type        = string
+  default     = "bedrock"
+
+  validation {
+    condition     = contains(["bedrock", "hashing"], var.embedding_provider)
+    error_message = "embedding_provider must be 'bedrock' or 'hashing'."
+  }
+}
+
+variable "embedding_dimensions" {
+  description = "Embedding size (Titan v2: 256, 512 or 1024; 0 = model default) - must match the index build"
+  type        = number
+  default     = 0
+}
+
 variable "model_id" {
   description = "Bedrock Model ID"
   type        = string
@@ -41,6 +58,253 @@ variable "analytics_table_name" {
   type        = string
 }
 
+variable "vector_backend" {
+  description = "Retrieval backend: s3vectors or local (NumPy index in local_index_dir, needs numpy in the image)"
+  type        = string
+  default     = "s3vectors"
+
+  validation {
+    condition     = contains(["s3vectors", "local"], var.vector_backend)
+    error_message = "vector_backend must be 's3vectors' or 'local'."
+  }
+}
+
+variable "local_index_dir" {
+  description = "Path of the local vector index inside the function (VECTOR_BACKEND=local)"
+  type        = string
+  default     = ""
+}
+
+variable "local_index_storage" {
+  description = "Scan format of the local index: float32, float16 or int8 (compact scan + float32 rescoring); empty = as built"
+  type        = string
+  default     = ""
+
+  validation {
+    condition     = contains(["", "float32", "float16", "int8"], var.local_index_storage)
+    error_message = "local_index_storage must be '', 'float32', 'float16' or 'int8'."
+  }
+}
+
+variable "local_rescore_factor" {
+  description = "Rows rescored in float32 per result with float16/int8 local storage (shortlist = top_k x factor)"
+  type        = number
+  default     = 4
+}
+
+variable "retrieval_mode" {
+  description = "Retrieval mode: vector, or hybrid (vector + BM25 keyword search fused with RRF, needs bm25_index_path)"
+  type        = string
+  default     = "vector"
+
+  validation {
+    condition     = contains(["vector", "hybrid"], var.retrieval_mode)
+    error_message = "retrieval_mode must be 'vector' or 'hybrid'."
+  }
+}
+
+variable "multi_query_retrieval" {
+  description = "Retrieve with one concurrent sub-query per recent user turn instead of one combined conversation query"
+  type        = bool
+  default     = false
+}
+
+variable "max_sub_queries" {
+  description = "Max concurrent sub-queries in multi-query retrieval"
+  type        = number
+  default     = 3
+}
+
+variable "bm25_index_path" {
+  description = "Path of the BM25 keyword index inside the function (build with --bm25-index src/kb_bm25.json.gz)"
+  type        = string
+  default     = ""
+}
+
+variable "index_pointer_type" {
+  description = "Blue/green index pointer holding the active index version: none (query s3_vectors_index_name), ssm, dynamodb or file"
+  type        = string
+  default     = "none"
+
+  validation {
+    condition     = contains(["none", "ssm", "dynamodb", "file"], var.index_pointer_type)
+    error_message = "index_pointer_type must be none, ssm, dynamodb or file."
+  }
+}
+
+variable "index_pointer_name" {
+  description = "SSM parameter name, DynamoDB table name (add its ARN to dynamodb_table_arns) or file path of the index pointer"
+  type        = string
+  default     = ""
+}
+
+variable "index_pointer_ttl" {
+  description = "Seconds the active index name is cached before the pointer is read again"
+  type        = number
+  default     = 60
+}
+
+variable "tenant_indexes" {
+  description = "Tenants with their own S3 Vectors index (tenant => index name); other tenants are filtered in the shared index"
+  type        = map(string)
+  default     = {}
+}
+
+variable "tenant_header" {
+  description = "Request header naming the tenant when no authorizer tenant is present (empty = body filters only)"
+  type        = string
+  default     = "x-tenant-id"
+}
+
+variable "require_tenant" {
+  description = "Reject chat requests without a tenant (filters.tenant, authorizer context or tenant header)"
+  type        = bool
+  default     = false
+}
+
+variable "rerank_mode" {
+  description = "Re-rank over-fetched candidates: off, bedrock (Bedrock rerank model) or local (BM25 / RERANK_SCORER)"
+  type        = string
+  default     = "off"
+
+  validation {
+    condition     = contains(["off", "bedrock", "local"], var.rerank_mode)
+    error_message = "rerank_mode must be off, bedrock or local."
+  }
+}
+
+variable "rerank_model_id" {
+  description = "Bedrock rerank model (rerank_mode = bedrock)"
+  type        = string
+  default     = "amazon.rerank-v1:0"
+}
+
+variable "rerank_candidates" {
+  description = "Candidates retrieved for re-ranking"
+  type        = number
+  default     = 30
+}
+
+variable "rerank_top_n" {
+  description = "Candidates kept after re-ranking (input of context assembly)"
+  type        = number
+  default     = 8
+}
+
+variable "rerank_timeout_ms" {
+  description = "Time budget for re-ranking; retrieval order is kept when exceeded"
+  type        = number
+  default     = 800
+}
+
+variable "sessions_enabled" {
+  description = "Server-side conversation memory for requests with a session_id (stores message text in the messages table)"
+  type        = bool
+  default     = false
+}
+
+variable "session_history_messages" {
+  description = "Stored messages kept verbatim in the prompt; older ones are rolled into a running summary"
+  type        = number
+  default     = 10
+}
+
+variable "session_summary_model_id" {
+  description = "Bedrock model for session summaries (empty = model_id)"
+  type        = string
+  default     = ""
+}
+
+variable "session_ttl_days" {
+  description = "Days until stored session messages expire (DynamoDB TTL)"
+  type        = number
+  default     = 7
+}
+
+variable "embedding_cache_table_name" {
+  description = "DynamoDB table for the shared query embedding cache (empty = in-process cache only)"
+  type        = string
+  default     = ""
+}
+
+variable "embedding_cache_size" {
+  description = "Max query embeddings kept in the in-process LRU cache"
+  type        = number
+  default     = 1024
+}
+
+variable "embedding_cache_ttl" {
+  description = "Query embedding cache TTL in seconds"
+  type        = number
+  default     = 86400
+}
+
+variable "response_cache_enabled" {
+  description = "Enable the semantic response cache for near-duplicate questions"
+  type        = bool
+  default     = false
+}
+
+variable "response_cache_threshold" {
+  description = "Minimum cosine similarity for a semantic response cache hit"
+  type        = number
+  default     = 0.95
+}
+
+variable "response_cache_size" {
+  description = "Max answers kept in the semantic response cache"
+  type        = number
+  default     = 256
+}
+
+variable "response_cache_table_name" {
+  description = "DynamoDB table sharing cached answers between instances, preloaded on warmup (empty = in-process only; must be in dynamodb_table_arns)"
+  type        = string
+  default     = ""
+}
+
+variable "response_cache_ttl" {
+  description = "Semantic response cache TTL in seconds"
+  type        = number
+  default     = 3600
+}
+
+variable "analytics_max_buffered" {
+  description = "Analytics items buffered before a background batch write (1 = each request writes its own item; >1 batches across invocations and may lose items of reaped environments)"
+  type        = number
+  default     = 1
+}
+
+variable "context_max_distance" {
+  description = "Retrieved chunks above this cosine distance are not used as context (2.0 = no cutoff)"
+  type        = number
+  default     = 0.8
+}
+
+variable "context_max_documents" {
+  description = "Max context documents selected (MMR) per request, before adjacent chunks are merged"
+  type        = number
+  default     = 5
+}
+
+variable "prompt_token_budget" {
+  description = "Max estimated prompt tokens; older turns and lower-ranked context are trimmed to fit"
+  type        = number
+  default     = 8000
+}
+
+variable "metrics_mode" {
+  description = "Per-request metrics output: emf (CloudWatch Embedded Metric Format), debug or off"
+  type        = string
+  default     = "emf"
+}
+
+variable "metrics_namespace" {
+  description = "CloudWatch namespace for the handler's EMF metrics"
+  type        = string
+  default     = "BedrockRAG"
+}
+
 variable "dynamodb_table_arns" {
   description = "List of DynamoDB table ARNs for IAM policy"
   type        = list(string)
@@ -82,8 +346,31 @@ variable "use_container_image" {
   default     = false
 }
 
+variable "handler" {
+  description = "Lambda entry point: lambda_function.lambda_handler, or async_handler.lambda_handler for the asyncio pipeline"
+  type        = string
+  default     = "lambda_function.lambda_handler"
+
+  validation {
+    condition     = contains(["lambda_function.lambda_handler", "async_handler.lambda_handler"], var.handler)
+    error_message = "handler must be 'lambda_function.lambda_handler' or 'async_handler.lambda_handler'."
+  }
+}
+
 variable "kb_version" {
   description = "Knowledge Base version for tracking updates"
   type        = string
   default     = "unknown"
 }
+
+variable "warmup_schedule" {
+  description = "EventBridge schedule for warmup invocations, e.g. \"rate(5 minutes)\" (empty = no schedule)"
+  type        = string
+  default     = ""
+}
+
+variable "warmup_queries" {
+  description = "Hot queries embedded and retrieved during warmup (fills caches, opens connections)"
+  type        = list(string)
+  default     = []
+}
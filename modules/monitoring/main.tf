@@ -162,3 +162,90 @@ resource "aws_cloudwatch_metric_alarm" "dynamodb_read_throttles" {
     Name = "${var.project_name}-dynamodb-read-throttles"
   }
 }
+
+# Per-stage latency dashboard (from the handler's EMF log lines)
+locals {
+  stage_latency_metrics = [
+    "TotalLatency",
+    "SessionLoadLatency",
+    "CacheLookupLatency",
+    "EmbedLatency",
+    "VectorQueryLatency",
+    "KeywordQueryLatency",
+    "RerankLatency",
+    "ContextBuildLatency",
+    "ModelLatency",
+    "FirstTokenLatency",
+    "AnalyticsWriteLatency",
+    "SessionWriteLatency"
+  ]
+}
+
+resource "aws_cloudwatch_dashboard" "pipeline" {
+  dashboard_name = "${var.project_name}-pipeline"
+
+  dashboard_body = jsonencode({
+    widgets = concat(
+      [
+        for i, stat in ["p50", "p99"] : {
+          type   = "metric"
+          x      = i * 12
+          y      = 0
+          width  = 12
+          height = 8
+          properties = {
+            title  = "Stage latency ${stat} (ms)"
+            region = data.aws_region.current.name
+            stat   = stat
+            period = 300
+            view   = "timeSeries"
+            metrics = [
+              for name in local.stage_latency_metrics :
+              [var.metrics_namespace, name, "FunctionName", var.lambda_function_name]
+            ]
+          }
+        }
+      ],
+      [
+        {
+          type   = "metric"
+          x      = 0
+          y      = 8
+          width  = 12
+          height = 6
+          properties = {
+            title  = "Tokens per 5 min"
+            region = data.aws_region.current.name
+            stat   = "Sum"
+            period = 300
+            view   = "timeSeries"
+            metrics = [
+              [var.metrics_namespace, "InputTokens", "FunctionName", var.lambda_function_name],
+              [var.metrics_namespace, "OutputTokens", "FunctionName", var.lambda_function_name]
+            ]
+          }
+        },
+        {
+          type   = "metric"
+          x      = 12
+          y      = 8
+          width  = 12
+          height = 6
+          properties = {
+            title  = "Cache hit rate"
+            region = data.aws_region.current.name
+            stat   = "Average"
+            period = 300
+            view   = "timeSeries"
+            metrics = [
+              [var.metrics_namespace, "EmbeddingCacheHit", "FunctionName", var.lambda_function_name],
+              [var.metrics_namespace, "ResponseCacheHit", "FunctionName", var.lambda_function_name]
+            ]
+          }
+        }
+      ]
+    )
+  })
+}
+
+data "aws_region" "current" {}
@@ -12,3 +12,8 @@ output "lambda_latency_alarm_arn" {
   description = "Lambda latency alarm ARN"
   value       = aws_cloudwatch_metric_alarm.lambda_latency.arn
 }
+
+output "pipeline_dashboard_name" {
+  description = "CloudWatch dashboard with per-stage latency percentiles"
+  value       = aws_cloudwatch_dashboard.pipeline.dashboard_name
+}
@@ -25,3 +25,9 @@ variable "alarm_email" {
   type        = string
   default     = ""
 }
+
+variable "metrics_namespace" {
+  description = "CloudWatch namespace of the handler's EMF metrics (must match the Lambda module)"
+  type        = string
+  default     = "BedrockRAG"
+}